@@ -7,6 +7,7 @@ from collections import OrderedDict
 # 正则校验
 # -------------------------------------------------------------
 ABC_NAME_PATTERN = re.compile(r'xform_(\d+)_material_(\d+)')
+ABC_OBJECT_PATH_PATTERN = re.compile(r'/xform_(\d+)_material_(\d+)/mesh_(\d+)_material_(\d+)')
 PMX_NAME_PATTERN = re.compile(r'(?P<prefix>[0-9A-Z]{3}_)(?P<name>.*?)(?P<suffix>\.\d{3})?$')
 RIGID_BODY_PREFIX_REGEXP = re.compile(r'(?P<prefix>[0-9A-Z]{3}_)(?P<name>.*)')
 CONVERT_NAME_TO_L_REGEXP = re.compile('^(.*)左(.*)$')
@@ -23,6 +24,19 @@ INVALID_CHARS = '<>:"/\\|?*'
 MAX_RETRIES = 5
 # 临时集合名称
 TMP_COLLECTION_NAME = "KAFEI临时集合"
+# 读取abc文件信息时使用的临时数据名称
+ABC_PROBE_NAME = "KAFEI_ABC_PROBE"
+# 批量任务清单文件名称（位于批量处理的目录中）
+BATCH_MANIFEST_NAME = "kafei_batch_manifest.json"
+# 贴图迁移记录文件名称（位于贴图文件夹中），记录 原贴图相对pmx目录的路径 -> 贴图文件夹中的文件名称
+TEXTURE_RELOCATION_MAP_NAME = "kafei_relocated_textures.json"
+# 批量渲染预览图时，多视图所用的视图及相机名称前缀
+PREVIEW_VIEW_NAME = "KAFEI_PREVIEW_VIEW"
+# 预览图集的文件名称（不含扩展名），以及每张图集的行列数上限
+PREVIEW_ATLAS_NAME = "kafei_preview_atlas"
+PREVIEW_ATLAS_GRID = 32
+# 计算材质签名时忽略的mmd_material参数（不影响渲染结果）
+MATERIAL_SIGNATURE_IGNORED_PROPS = ("name_j", "name_e", "material_id", "comment")
 # 默认精度
 PRECISION = 0.0001
 # 文件类型与扩展名的map，value相同可能会造成一些问题但几率太低这里不考虑
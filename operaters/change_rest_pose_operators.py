@@ -1,4 +1,5 @@
 import mathutils
+import numpy as np
 
 from ..tools.ApplyModifierForObjectWithShapeKeys import applyModifierForObjectWithShapeKeys
 from ..utils import *
@@ -305,6 +306,8 @@ class ChangeRestPoseEnd2Operator(bpy.types.Operator):
         armature = find_pmx_armature(root)
         objs = find_pmx_objects(armature)
         force_apply = props.force_apply
+        # 是否回退到了逐形态键应用修改器的方式（会产生大量需要清理的数据块）
+        fallback = False
 
         for obj in objs:
             deselect_all_objects()
@@ -312,6 +315,10 @@ class ChangeRestPoseEnd2Operator(bpy.types.Operator):
             select_and_activate(obj)
 
             if force_apply:
+                # 直接计算骨架形变并写入所有形态键
+                if bake_armature_deform(obj, armature):
+                    continue
+                fallback = True
                 # 记录修改器显示状态并隐藏修改器
                 mod_map = {}
                 for mod in obj.modifiers:
@@ -350,7 +357,7 @@ class ChangeRestPoseEnd2Operator(bpy.types.Operator):
         bpy.ops.object.mode_set(mode='OBJECT')
 
         # 清理数据块，释放文件体积
-        if force_apply:
+        if fallback:
             bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
 
     def create_armature_mod(self, obj, armature):
@@ -455,6 +462,75 @@ class ChangeRestPoseEnd2Operator(bpy.types.Operator):
 #             rigidbody.rotation_mode = original_mode
 
 
+def bake_armature_deform(obj, armature):
+    """以线性混合蒙皮计算当前姿态对网格的形变，直接写入网格及所有形态键，效果等同于将首位的骨架修改器应用到带形态键的网格
+    每个顶点的形变矩阵只计算一次（骨骼形变矩阵按权重加权平均），再作用于各形态键的坐标，无需为每个形态键复制物体
+    存在B-Bone（段数大于1）的形变骨骼时不支持，返回False，由调用方回退到逐形态键应用修改器的方式
+    """
+    start_time = time.time()
+    mesh = obj.data
+    vertex_count = len(mesh.vertices)
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    pose_bones = armature.evaluated_get(depsgraph).pose.bones
+    bones = armature.data.bones
+
+    # 顶点组索引 -> 骨骼形变矩阵（物体局部空间），与骨架修改器一致，只有形变骨骼同名的顶点组参与形变
+    to_object = obj.matrix_world.inverted() @ armature.matrix_world
+    to_armature = to_object.inverted()
+    vg_count = len(obj.vertex_groups)
+    matrices = np.zeros((vg_count + 1, 4, 4), dtype=np.float64)
+    is_deform = np.zeros(vg_count + 1, dtype=bool)
+    for vg in obj.vertex_groups:
+        bone = bones.get(vg.name)
+        if bone is None or not bone.use_deform:
+            continue
+        if bone.bbone_segments > 1:
+            return False
+        deform_matrix = pose_bones[bone.name].matrix @ bone.matrix_local.inverted()
+        matrices[vg.index] = np.array(to_object @ deform_matrix @ to_armature, dtype=np.float64)
+        is_deform[vg.index] = True
+
+    vert_indexes = []
+    group_indexes = []
+    weights = []
+    for vert in mesh.vertices:
+        for group_element in vert.groups:
+            vert_indexes.append(vert.index)
+            group_indexes.append(group_element.group)
+            weights.append(group_element.weight)
+    vert_indexes = np.array(vert_indexes, dtype=np.int64)
+    group_indexes = np.minimum(np.array(group_indexes, dtype=np.int64), vg_count)
+    weights = np.array(weights, dtype=np.float64)
+    keep = is_deform[group_indexes] & (weights > 0)
+    vert_indexes, group_indexes, weights = vert_indexes[keep], group_indexes[keep], weights[keep]
+
+    # 加权平均得到每个顶点的形变矩阵，权重总和过小的顶点不受影响
+    blend = np.zeros((vertex_count, 4, 4), dtype=np.float64)
+    np.add.at(blend, vert_indexes, weights[:, None, None] * matrices[group_indexes])
+    contrib = np.bincount(vert_indexes, weights=weights, minlength=vertex_count)
+    deformed = contrib > 0.0001
+    blend[deformed] /= contrib[deformed, None, None]
+    blend[~deformed] = np.identity(4)
+    linear = blend[:, :3, :3]
+    offset = blend[:, :3, 3]
+
+    def deform(collection):
+        co = np.empty(vertex_count * 3, dtype=np.float32)
+        collection.foreach_get("co", co)
+        co = np.einsum('nij,nj->ni', linear, co.reshape(-1, 3).astype(np.float64)) + offset
+        collection.foreach_set("co", co.astype(np.float32).ravel())
+
+    deform(mesh.vertices)
+    key_count = 0
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            deform(key_block.data)
+            key_count += 1
+    mesh.update()
+    print(f"\"{obj.name}\" 应用姿态完成，形态键{key_count}个，耗时{time.time() - start_time:.6f}秒")
+    return True
+
+
 def modify_root_trans_lock(obj, lock):
     # 上锁 防止编辑root
     ancestor = obj.parent
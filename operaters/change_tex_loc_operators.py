@@ -1,4 +1,5 @@
 import shutil
+import struct
 
 from ..utils import *
 
@@ -33,109 +34,363 @@ class ChangeTexLocOperator(bpy.types.Operator):
         props = scene.mmd_kafei_tools_change_tex_loc
         if not self.check_props(props):
             return
-        batch_process(do_change_tex_loc, props, f_flag=True)
+        # 后台进程中只会分配到需要导入导出的文件
+        if not props.direct or is_batch_worker():
+            batch_process(do_change_tex_loc, props, f_flag=True, operator=self)
+            return
+        pmd_list = change_tex_loc_direct(props)
+        # pmd文件仍需通过导入导出转换为pmx
+        if pmd_list:
+            batch_process(do_change_tex_loc, props, f_flag=True, operator=self, file_list=pmd_list)
 
 
 def do_change_tex_loc(pmx_root, props, filepath):
     new_folder = props.new_folder
     new_folder = new_folder.strip()
     remove_empty = props.remove_empty
-    # 修改纹理和球体纹理路径（sph）
-    change_texture_filepaths(pmx_root, filepath, new_folder)
-    # 修改卡通纹理路径（toon）
-    change_toon_texture_filepaths(pmx_root,filepath, new_folder)
-    # 移动pmx目录下所有图像文件到指定目录中
-    move_tex(filepath, new_folder)
+    # 将模型材质引用的贴图移动到指定目录中，并修改纹理、球体纹理（sph）及卡通纹理（toon）的路径
+    relocate_textures(pmx_root, filepath, new_folder)
     # 循环内删除空文件夹，不含递归，将删除空文件夹的操作范围限定在pmx目录中
     if remove_empty:
         delete_empty_folders(os.path.dirname(filepath))
 
 
-def change_texture_filepaths(pmx_root, pmx_file, new_folder):
-    pmx_path = os.path.dirname(pmx_file)
+def relocate_textures(pmx_root, pmx_file, new_folder):
+    """只处理模型材质实际引用的贴图（纹理、球体纹理、卡通纹理），且贴图需位于pmx目录中
+    按内容哈希去重：贴图文件夹中已有相同内容的贴图时直接引用，不再保留重复的副本
+    同一模型中重名但内容不同的贴图均以 名称_哈希前8位 命名，结果与该模型中贴图的处理顺序无关
+    与贴图文件夹中已有的贴图（如同目录下先处理的模型）重名但内容不同时，同样以 名称_哈希前8位 命名
+    """
+    pmx_path = os.path.normpath(os.path.dirname(pmx_file))
     tex_folder = os.path.join(pmx_path, new_folder)
+    if not os.path.exists(tex_folder):
+        os.makedirs(tex_folder)
+
+    image_refs, toon_refs = collect_texture_references(pmx_root, pmx_path)
+    src_paths = sorted(set(image_refs) | set(toon_refs))
+    folder_index = get_folder_index(tex_folder)
+    colliding_names = get_colliding_names(src_paths, pmx_path, tex_folder)
+    relocation_map = load_relocation_map(tex_folder)
+
+    new_paths = {}
+    try:
+        for src_path in src_paths:
+            new_path = relocate_texture(src_path, pmx_path, tex_folder, folder_index, colliding_names,
+                                        relocation_map)
+            if new_path:
+                new_paths[src_path] = new_path
+    finally:
+        save_relocation_map(tex_folder, relocation_map)
+
+    for src_path, images in image_refs.items():
+        if src_path in new_paths:
+            for image in images:
+                image.filepath = new_paths[src_path]
+    for src_path, materials in toon_refs.items():
+        if src_path in new_paths:
+            for material in materials:
+                material.mmd_material.toon_texture = new_paths[src_path]
+
 
+def collect_texture_references(pmx_root, pmx_path):
+    """获取模型材质引用的贴图，返回 贴图绝对路径 -> 图像列表，贴图绝对路径 -> 材质列表（卡通纹理）"""
     armature = find_pmx_armature(pmx_root)
     objs = find_pmx_objects(armature)
 
-    images = []
+    image_refs = {}
+    toon_refs = {}
     for obj in objs:
         for slot in obj.material_slots:
             material = slot.material
             if not material:  # 有材质槽但无材质
                 continue
 
+            toon_texture = material.mmd_material.toon_texture
+            if toon_texture is not None and toon_texture.strip() != '':
+                toon_path = os.path.normpath(os.path.join(pmx_path, bpy.path.abspath(toon_texture)))
+                materials = toon_refs.setdefault(toon_path, [])
+                if material not in materials:
+                    materials.append(material)
+
             node_tree = material.node_tree
             if not node_tree:  # 有材质但无节点树
                 continue
 
-            nodes = node_tree.nodes
-            if not nodes:  # 有节点树但无节点
-                continue
-
-            for node in nodes:
+            for node in node_tree.nodes:
                 if node.type != 'TEX_IMAGE':
                     continue
                 if node.name not in ['mmd_base_tex', 'mmd_sphere_tex']:
                     continue
-                # 获取纹理图像的路径
                 image = node.image
-                if image:
+                if not image or not image.filepath:
+                    continue
+                image_path = os.path.normpath(os.path.join(pmx_path, bpy.path.abspath(image.filepath)))
+                images = image_refs.setdefault(image_path, [])
+                if image not in images:
                     images.append(image)
+    return image_refs, toon_refs
 
-    for img in images:
-        directory, filename = os.path.split(img.filepath)
-        new_filepath = os.path.join(tex_folder, filename)
-        img.filepath = new_filepath
 
+def relocate_texture(src_path, pmx_path, tex_folder, folder_index, colliding_names, relocation_map):
+    """将贴图移动到贴图文件夹中，返回新路径，无需修改路径时返回None"""
+    relative_path = get_relocation_key(src_path, pmx_path)
+    if not os.path.exists(src_path):
+        # 已被同目录下的其它模型移动（含之前的批量处理）
+        filename = relocation_map.get(relative_path)
+        if filename is not None and os.path.exists(os.path.join(tex_folder, filename)):
+            return os.path.join(tex_folder, filename)
+        # 与此前的处理方式一致，贴图文件夹中存在同名文件时引用该文件
+        fallback_path = os.path.join(tex_folder, os.path.basename(src_path))
+        return fallback_path if os.path.exists(fallback_path) else None
+    # 不移动pmx目录以外的贴图（可能被其它模型使用）
+    if not is_in_folder(src_path, pmx_path):
+        return None
+    if os.path.normcase(os.path.dirname(src_path)) == os.path.normcase(os.path.normpath(tex_folder)):
+        return src_path
 
-def change_toon_texture_filepaths(pmx_root,pmx_file, new_folder):
-    pmx_path = os.path.dirname(pmx_file)
-    tex_folder = os.path.join(pmx_path, new_folder)
+    file_hash = get_file_hash(src_path)
+    filename = folder_index.get(file_hash)
+    if filename is not None:
+        # 内容相同的贴图已存在，移除重复的副本，其它模型可通过迁移记录找到该贴图
+        os.remove(src_path)
+    else:
+        filename = os.path.basename(src_path)
+        if os.path.normcase(filename) in colliding_names or os.path.exists(os.path.join(tex_folder, filename)):
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}_{file_hash[:8]}{ext}"
+        shutil.move(src_path, os.path.join(tex_folder, filename))
+        set_file_hash(os.path.join(tex_folder, filename), file_hash)
+        folder_index[file_hash] = filename
+    relocation_map[relative_path] = filename
+    return os.path.join(tex_folder, filename)
 
-    armature = find_pmx_armature(pmx_root)
-    objs = find_pmx_objects(armature)
-    for obj in objs:
-        for slot in obj.material_slots:
-            material = slot.material
-            if not material:
+
+def get_colliding_names(src_paths, pmx_path, tex_folder):
+    """需要移动的贴图中，名称相同但内容不同的贴图名称（normcase）"""
+    name_hashes = {}
+    for src_path in src_paths:
+        if not os.path.exists(src_path) or not is_in_folder(src_path, pmx_path):
+            continue
+        if os.path.normcase(os.path.dirname(src_path)) == os.path.normcase(os.path.normpath(tex_folder)):
+            continue
+        name_hashes.setdefault(os.path.normcase(os.path.basename(src_path)), set()).add(get_file_hash(src_path))
+    return {name for name, hashes in name_hashes.items() if len(hashes) > 1}
+
+
+def is_in_folder(path, folder):
+    """path是否位于folder中（含子目录）"""
+    return os.path.commonpath([os.path.normcase(path), os.path.normcase(folder)]) == os.path.normcase(folder)
+
+
+def get_relocation_key(src_path, pmx_path):
+    """迁移记录中贴图的键，为相对pmx目录的路径，分隔符统一为斜杠"""
+    return os.path.normcase(os.path.relpath(src_path, pmx_path)).replace(os.sep, "/")
+
+
+def load_relocation_map(tex_folder):
+    """读取贴图文件夹中的迁移记录，使之后处理同目录下其它模型时，仍能找到已被移动或去重的贴图"""
+    map_path = os.path.join(tex_folder, TEXTURE_RELOCATION_MAP_NAME)
+    if not os.path.exists(map_path):
+        return {}
+    try:
+        with open(map_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_relocation_map(tex_folder, relocation_map):
+    """保存贴图文件夹中的迁移记录"""
+    if not relocation_map:
+        return
+    with open(os.path.join(tex_folder, TEXTURE_RELOCATION_MAP_NAME), "w", encoding="utf-8") as f:
+        json.dump(relocation_map, f, ensure_ascii=False, indent=2)
+
+
+def get_folder_index(tex_folder):
+    """贴图文件夹中已有贴图的内容哈希 -> 文件名称"""
+    folder_index = {}
+    for entry in os.scandir(tex_folder):
+        if entry.is_file() and is_image_file(entry.name):
+            folder_index.setdefault(get_file_hash(entry.path), entry.name)
+    return folder_index
+
+
+def change_tex_loc_direct(props):
+    """直接读写pmx文件中的贴图表，不经过导入导出，返回需要通过导入导出处理的pmd文件"""
+    batch = props.batch
+    abs_path = bpy.path.abspath(batch.directory)
+    suffix = batch.suffix
+    new_folder = props.new_folder.strip()
+    remove_empty = props.remove_empty
+    start_time = time.time()
+    manifest = BatchManifest(abs_path, props)
+    # 边遍历边处理，pmd文件留到遍历完成后处理
+    pmd_list = []
+
+    def iter_pmx_files():
+        for path in iter_recursive_search(abs_path, suffix, batch.threshold, batch.search_strategy,
+                                          batch.conflict_strategy):
+            if os.path.splitext(path)[1].lower() != ".pmx":
+                pmd_list.append(path)
                 continue
+            yield path
 
-            toon_texture = material.mmd_material.toon_texture
-            if toon_texture is not None and toon_texture.strip() != '':
-                directory, filename = os.path.split(material.mmd_material.toon_texture)
-                new_filepath = os.path.join(tex_folder, filename)
-                material.mmd_material.toon_texture = new_filepath
+    for index, filepath in enumerate(manifest.iter_pending(iter_pmx_files())):
+        curr_time = time.time()
+        manifest.start(filepath)
+        try:
+            change_pmx_texture_paths(filepath, get_batch_output_path(filepath, suffix), new_folder)
+            if remove_empty:
+                delete_empty_folders(os.path.dirname(filepath))
+        except Exception as e:
+            manifest.finish(filepath, time.time() - curr_time, str(e))
+            raise
+        manifest.finish(filepath, time.time() - curr_time)
+        print(
+            f"文件 \"{os.path.basename(filepath)}\" 处理完成，进度{get_progress_text(index)}，耗时{time.time() - curr_time:.6f}秒，总耗时: {time.time() - start_time:.6f} 秒")
+    print(f"目录\"{abs_path}\" 处理完成，总耗时: {time.time() - start_time:.6f} 秒")
+    manifest.print_summary()
+    return pmd_list
 
 
-def move_tex(pmx_file, new_folder):
-    # pmx文件所在目录
-    pmx_path = os.path.dirname(pmx_file)
-    # 创建存储图片的文件夹
+def change_pmx_texture_paths(pmx_file, new_filepath, new_folder):
+    """将pmx文件中材质引用的贴图移动到指定目录中，并修改贴图表中的路径，输出到new_filepath"""
+    pmx_path = os.path.normpath(os.path.dirname(pmx_file))
     tex_folder = os.path.join(pmx_path, new_folder)
     if not os.path.exists(tex_folder):
         os.makedirs(tex_folder)
 
-    # 图片文件的扩展名列表
-    image_extensions = set(IMG_TYPE_EXT_MAP.values())
+    pmx = PmxTextureTable(pmx_file)
+    textures = list(pmx.textures)
+    # pmx中的贴图路径相对于pmx文件所在目录，分隔符一般为反斜杠
+    src_paths = {texture_index: os.path.normpath(
+        os.path.join(pmx_path, textures[texture_index].replace("\\", os.sep).replace("/", os.sep)))
+        for texture_index in sorted(pmx.referenced) if 0 <= texture_index < len(textures)}
+    folder_index = get_folder_index(tex_folder)
+    colliding_names = get_colliding_names(src_paths.values(), pmx_path, tex_folder)
+    relocation_map = load_relocation_map(tex_folder)
+    try:
+        for texture_index, src_path in src_paths.items():
+            texture = textures[texture_index]
+            new_path = relocate_texture(src_path, pmx_path, tex_folder, folder_index, colliding_names,
+                                        relocation_map)
+            if new_path:
+                separator = "/" if "/" in texture and "\\" not in texture else "\\"
+                textures[texture_index] = os.path.relpath(new_path, os.path.dirname(new_filepath)).replace(os.sep,
+                                                                                                          separator)
+    finally:
+        save_relocation_map(tex_folder, relocation_map)
+    pmx.save(new_filepath, textures)
 
-    # 递归遍历文件夹中的所有文件
-    for root, dirs, files in os.walk(pmx_path):
-        for file in files:
-            # 检查文件扩展名是否是图片格式，不区分大小写
-            if os.path.splitext(file)[1].lower() in image_extensions:
-                # 获取图片的绝对路径
-                src_path = os.path.join(root, file)
-                # 目标路径
-                dest_path = os.path.join(tex_folder, file)
-                # 如果不存在，则移动过去，如果存在，则让用户自己处理（文件可能是只读的；文件虽然同名但内容不同），稳妥一些
-                if not os.path.exists(dest_path):
-                    shutil.move(src_path, dest_path)
+
+class PmxTextureTable:
+    """读取pmx文件的头部、贴图表及材质，只用于修改贴图路径
+    顶点、面只计算长度后跳过，保存时贴图表以外的部分原样写出（PMX 2.0/2.1）
+    """
+
+    def __init__(self, filepath):
+        with open(filepath, "rb") as f:
+            self.data = f.read()
+        self.offset = 0
+        if self.read(4) != b"PMX ":
+            raise Exception(f"不是pmx文件：{filepath}")
+        self.version = self.unpack("<f")
+        globals_count = self.unpack("<B")
+        header_globals = self.read(globals_count)
+        self.encoding = "utf-16-le" if header_globals[0] == 0 else "utf-8"
+        additional_uv_count = header_globals[1]
+        vertex_index_size = header_globals[2]
+        texture_index_size = header_globals[3]
+        bone_index_size = header_globals[5]
+
+        # 模型名称、英文名称、注释、英文注释
+        for _ in range(4):
+            self.read_text()
+
+        # 顶点：位置、法线、UV、追加UV、变形方式、权重、边缘倍率
+        weight_sizes = {
+            0: bone_index_size,  # BDEF1
+            1: bone_index_size * 2 + 4,  # BDEF2
+            2: bone_index_size * 4 + 16,  # BDEF4
+            3: bone_index_size * 2 + 4 + 36,  # SDEF
+            4: bone_index_size * 4 + 16,  # QDEF
+        }
+        vertex_base_size = 32 + 16 * additional_uv_count
+        for _ in range(self.unpack("<i")):
+            self.offset += vertex_base_size
+            deform_type = self.unpack("<B")
+            self.offset += weight_sizes[deform_type] + 4
+
+        # 面
+        face_vertex_count = self.unpack("<i")
+        self.offset += face_vertex_count * vertex_index_size
+
+        # 贴图
+        self.texture_start = self.offset
+        self.textures = [self.read_text() for _ in range(self.unpack("<i"))]
+        self.texture_end = self.offset
+
+        # 材质中引用的贴图（纹理、球体纹理、非共享的卡通纹理）
+        index_format = {1: "<b", 2: "<h", 4: "<i"}[texture_index_size]
+        self.referenced = set()
+        for _ in range(self.unpack("<i")):
+            # 名称、英文名称
+            self.read_text()
+            self.read_text()
+            # 漫反射、镜面反射、镜面反射强度、环境色、绘制标志、边缘颜色、边缘大小
+            self.offset += 65
+            self.referenced.add(self.unpack(index_format))
+            self.referenced.add(self.unpack(index_format))
+            # 球体纹理模式
+            self.offset += 1
+            shared_toon = self.unpack("<B")
+            if shared_toon == 0:
+                self.referenced.add(self.unpack(index_format))
+            else:
+                self.offset += 1
+            # 备注、面数
+            self.read_text()
+            self.offset += 4
+        self.referenced.discard(-1)
+
+    def read(self, size):
+        if self.offset + size > len(self.data):
+            raise Exception("pmx文件不完整")
+        value = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return value
+
+    def unpack(self, fmt):
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+
+    def read_text(self):
+        return self.read(self.unpack("<i")).decode(self.encoding)
+
+    def save(self, filepath, textures):
+        """写出修改贴图表后的文件，先写入临时文件再替换（输出路径可能与输入相同）"""
+        table = [struct.pack("<i", len(textures))]
+        for texture in textures:
+            encoded = texture.encode(self.encoding)
+            table.append(struct.pack("<i", len(encoded)))
+            table.append(encoded)
+        tmp_path = filepath + ".tmp"
+        data = memoryview(self.data)
+        with open(tmp_path, "wb") as f:
+            f.write(data[:self.texture_start])
+            f.write(b"".join(table))
+            f.write(data[self.texture_end:])
+        os.replace(tmp_path, filepath)
+
+
+def is_image_file(filename):
+    # 检查文件扩展名是否是图片格式，不区分大小写
+    return os.path.splitext(filename)[1].lower() in set(IMG_TYPE_EXT_MAP.values())
 
 
 def delete_empty_folders(folder_path):
-    # 遍历文件夹中的所有文件和子文件夹
-    for root, dirs, files in os.walk(folder_path, topdown=False):
+    # 遍历文件夹中的所有文件和子文件夹，逆序处理（子文件夹总在其父文件夹之前）
+    for root, dirs, files, _ in reversed(list(scan_directory(folder_path))):
         for file in files:
             # 如果存在Thumbs.db文件（缩略图缓存），删除它
             if file.lower() == "thumbs.db":
@@ -145,6 +400,14 @@ def delete_empty_folders(folder_path):
         for d in dirs:
             dir_path = os.path.join(root, d)
             # 检查文件夹是否为空
-            if not os.listdir(dir_path):
+            if is_empty_folder(dir_path):
                 # 删除空文件夹
                 os.rmdir(dir_path)
+
+
+def is_empty_folder(folder_path):
+    try:
+        with os.scandir(folder_path) as it:
+            return next(it, None) is None
+    except OSError:
+        return False
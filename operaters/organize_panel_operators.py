@@ -18,7 +18,7 @@ class OrganizePanelOperator(bpy.types.Operator):
         props = scene.mmd_kafei_tools_organize_panel
         if not self.check_props(props):
             return
-        batch_process(organize_panel, props, f_flag=False)
+        batch_process(organize_panel, props, f_flag=False, operator=self)
 
     def check_props(self, props):
         batch = props.batch
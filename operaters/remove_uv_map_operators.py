@@ -17,7 +17,7 @@ class RemoveUvMapOperator(bpy.types.Operator):
         if not self.check_props(props):
             return
 
-        batch_process(self.do_remove, props, f_flag=False)
+        batch_process(self.do_remove, props, f_flag=False, operator=self)
 
     def check_props(self, props):
         batch = props.batch
@@ -1,4 +1,8 @@
+import shutil
+import tempfile
+
 import mathutils
+import numpy as np
 
 from ..utils import *
 
@@ -94,13 +98,15 @@ class LoadRenderPresetOperator(bpy.types.Operator):
         bpy.context.scene.render.use_overwrite = True
         bpy.context.scene.render.image_settings.color_management = 'FOLLOW_SCENE'
 
-        # 其他项
-        # 显示叠加层
-        bpy.context.space_data.overlay.show_overlays = False
-        # 着色方式 渲染
-        bpy.context.space_data.shading.type = 'RENDERED'
+        # 其他项（后台模式下没有3D视图，跳过）
+        space_data = bpy.context.space_data
+        if space_data and space_data.type == 'VIEW_3D':
+            # 显示叠加层
+            space_data.overlay.show_overlays = False
+            # 着色方式 渲染
+            space_data.shading.type = 'RENDERED'
         # 关闭透视模式 https://blender.stackexchange.com/questions/159525/how-to-toggle-xray-in-viewport-with-python
-        views3d = [a for a in bpy.context.screen.areas if a.type == 'VIEW_3D']
+        views3d = [a for a in bpy.context.screen.areas if a.type == 'VIEW_3D'] if bpy.context.screen else []
         for a in views3d:
             shading = a.spaces.active.shading
             shading.show_xray = False
@@ -187,6 +193,7 @@ class GenPreviewCameraOperator(bpy.types.Operator):
         scene = context.scene
         props = scene.mmd_kafei_tools_render_preview
         camera_to_view_selected(props)
+        view_through_camera()
         return {'FINISHED'}  # 让Blender知道操作已成功完成
 
     def check_props(self):
@@ -197,11 +204,47 @@ class GenPreviewCameraOperator(bpy.types.Operator):
 
 
 class RenderPreviewOperator(bpy.types.Operator):
+    """渲染预览图
+    以下参数供脚本调用，可在后台模式下批量渲染（面板中调用时均为默认值），例如：
+    blender -b 渲染场景.blend --python-exit-code 1 --python-expr "import bpy;
+    bpy.ops.mmd_kafei_tools.render_preview(directory='D:/models', engine='EEVEE', load_preset=True,
+    log_path='D:/render_log.tsv')"
+    """
     bl_idname = "mmd_kafei_tools.render_preview"
     bl_label = "渲染"
     bl_description = "渲染预览图"
     bl_options = {'REGISTER', 'UNDO'}
 
+    engine: bpy.props.EnumProperty(
+        name="渲染方式",
+        items=[
+            ("VIEWPORT", "跟随视图", "3D视图的着色方式为渲染时使用渲染引擎渲染，否则视图渲染。没有3D视图（后台模式）时使用渲染引擎渲染"),
+            ("EEVEE", "EEVEE", "使用EEVEE渲染"),
+            ("CYCLES", "Cycles", "使用Cycles渲染"),
+            ("WORKBENCH", "工作台", "使用工作台渲染"),
+        ],
+        default="VIEWPORT",
+        options={'SKIP_SAVE'}
+    )
+    directory: bpy.props.StringProperty(
+        name="模型目录",
+        description="不为空时，批量渲染该目录中的模型（覆盖面板中的批量设置）",
+        subtype='DIR_PATH',
+        options={'SKIP_SAVE'}
+    )
+    load_preset: bpy.props.BoolProperty(
+        name="加载渲染预设",
+        description="渲染前加载渲染预设",
+        default=False,
+        options={'SKIP_SAVE'}
+    )
+    log_path: bpy.props.StringProperty(
+        name="耗时日志",
+        description="不为空时，将每个模型的渲染耗时追加到该文件中",
+        subtype='FILE_PATH',
+        options={'SKIP_SAVE'}
+    )
+
     def execute(self, context):
         self.main(context)
         return {'FINISHED'}  # 让Blender知道操作已成功完成
@@ -209,6 +252,15 @@ class RenderPreviewOperator(bpy.types.Operator):
     def main(self, context):
         scene = context.scene
         props = scene.mmd_kafei_tools_render_preview
+        if self.directory:
+            props.batch.flag = True
+            props.batch.directory = self.directory
+        if self.load_preset:
+            bpy.ops.mmd_kafei_tools.load_render_preset()
+        if self.engine != "VIEWPORT":
+            scene.render.engine = get_render_engine(self.engine)
+        # 指定了渲染引擎或者没有3D视图时，使用渲染引擎渲染
+        use_render_engine = self.engine != "VIEWPORT" or not is_view3d_context()
         if not self.check_render_preview_props(props):
             return
         batch = props.batch
@@ -229,51 +281,90 @@ class RenderPreviewOperator(bpy.types.Operator):
             # 批量渲染
             start_time = time.time()
             # 同一文件夹下出现"角色的多个pmx差分"或者"角色武器放在一起"很常见，所以搜索到的每个符合条件的pmx文件都会被渲染
-            file_list = recursive_search_img(abs_path, suffix, threshold, search_strategy, conflict_strategy,
-                                             IMG_TYPE_EXT_MAP[output_format])
-            file_count = len(file_list)
+            # 边遍历目录树边渲染，无需等待遍历完成，跳过批量任务清单中已完成的文件
+            manifest = BatchManifest(abs_path, props, bpy.path.abspath(self.log_path) if self.log_path else None)
+            file_list = manifest.iter_pending(
+                iter_recursive_search_img(abs_path, suffix, threshold, search_strategy, conflict_strategy,
+                                          IMG_TYPE_EXT_MAP[output_format]))
+            # 一次渲染多个模型，分摊渲染启动与着色器编译的开销
+            batch_size = props.batch_size
+            # 签名相同的材质只转换一次
+            material_cache = MaterialConvertCache()
+            # 根据渲染结果输出多级缩略图，结束后生成图集
+            thumbnail_writer = PreviewThumbnailWriter(abs_path, parse_thumbnail_sizes(props.thumbnail_sizes))
+            if batch_size > 1:
+                finished_count = 0
+                for filepaths in iter_chunks(file_list, batch_size):
+                    curr_time = time.time()
+                    finished_count += len(filepaths)
+                    render_models_in_one_pass(props, filepaths, suffix, IMG_TYPE_EXT_MAP[output_format], manifest,
+                                              material_cache, use_render_engine, thumbnail_writer)
+                    print(
+                        f"{[os.path.basename(filepath) for filepath in filepaths]} 渲染完成，进度{finished_count}，耗时{time.time() - curr_time}秒，总耗时: {time.time() - start_time} 秒")
+                material_cache.release()
+                thumbnail_writer.write_contact_sheets()
+                print(f"目录\"{abs_path}\" 渲染完成，总耗时: {time.time() - start_time} 秒")
+                manifest.print_summary()
+                return
             for index, filepath in enumerate(file_list):
+                # 记录处理前的数据块，渲染完成后只移除本次新建的数据块
+                snapshot = snapshot_data()
                 # 获取临时集合
                 get_collection(TMP_COLLECTION_NAME)
                 file_base_name = os.path.basename(filepath)
                 new_filepath = os.path.splitext(filepath)[0] + suffix + IMG_TYPE_EXT_MAP[output_format]
                 curr_time = time.time()
-                import_pmx(filepath)
-                print(f"\"{file_base_name}\"导入完成")
-                pmx_root = bpy.context.active_object
-                pmx_armature = find_pmx_armature(pmx_root)
-                convert_materials(pmx_armature, force_center)
-                print(f"\"{file_base_name}\"材质转换完成")
-
-                # 相机对准角色
-                show_object(pmx_root)
-                hide_object(pmx_armature)
-                select_and_activate(pmx_root)
-                camera_to_view_selected(props)
-                print(f"\"{file_base_name}\"对准完成")
-
-                # 隐藏可能会对渲染结果造成影响的物体
-                hide_object(pmx_root)
-                deselect_all_objects()
-
+                manifest.start(filepath)
                 # 备份原始输出路径
                 original_output_path = bpy.context.scene.render.filepath
-                # 渲染
-                bpy.context.scene.render.filepath = new_filepath
-                render(False)
+                try:
+                    import_pmx(filepath)
+                    imported_uids = {id_data.session_uid for id_data in get_new_data(snapshot)}
+                    print(f"\"{file_base_name}\"导入完成")
+                    pmx_root = bpy.context.active_object
+                    pmx_armature = find_pmx_armature(pmx_root)
+                    convert_materials(pmx_armature, force_center, material_cache)
+                    # 缓存的材质及其贴图需要保留给后续模型使用
+                    imported_uids -= material_cache.get_uids()
+                    print(f"\"{file_base_name}\"材质转换完成")
+
+                    # 相机对准角色
+                    show_object(pmx_root)
+                    hide_object(pmx_armature)
+                    select_and_activate(pmx_root)
+                    camera_to_view_selected(props)
+                    print(f"\"{file_base_name}\"对准完成")
+
+                    # 隐藏可能会对渲染结果造成影响的物体
+                    hide_object(pmx_root)
+                    deselect_all_objects()
 
-                # 恢复原始输出路径
-                bpy.context.scene.render.filepath = original_output_path
+                    # 渲染
+                    bpy.context.scene.render.filepath = new_filepath
+                    render(False, use_render_engine)
+                    thumbnail_writer.write(new_filepath)
+                except Exception as e:
+                    manifest.finish(filepath, time.time() - curr_time, str(e))
+                    material_cache.release()
+                    raise
+                finally:
+                    # 恢复原始输出路径
+                    bpy.context.scene.render.filepath = original_output_path
 
-                clean_scene()
+                clean_batch_data(snapshot, imported_uids)
+                manifest.finish(filepath, time.time() - curr_time)
                 print(
-                    f"\"{file_base_name}\" 渲染完成，进度{index + 1}/{file_count}，耗时{time.time() - curr_time}秒，总耗时: {time.time() - start_time} 秒")
+                    f"\"{file_base_name}\" 渲染完成，进度{get_progress_text(index)}，耗时{time.time() - curr_time}秒，总耗时: {time.time() - start_time} 秒")
+            material_cache.release()
+            thumbnail_writer.write_contact_sheets()
             print(f"目录\"{abs_path}\" 渲染完成，总耗时: {time.time() - start_time} 秒")
+            manifest.print_summary()
         else:
             objs = bpy.context.selected_objects
             if len(objs) != 0:
                 camera_to_view_selected(props)
-            render(True)
+                view_through_camera()
+            render(True, use_render_engine)
 
     def check_render_preview_props(self, props):
         batch = props.batch
@@ -285,6 +376,9 @@ class RenderPreviewOperator(bpy.types.Operator):
             if output_format not in IMG_TYPE_EXT_MAP.keys():
                 self.report(type={'ERROR'}, message=f'输出文件格式不正确，请更改为图像类型格式！')
                 return False
+            if parse_thumbnail_sizes(props.thumbnail_sizes) is None:
+                self.report(type={'ERROR'}, message=f'缩略图尺寸不正确，请输入以逗号分隔的正整数！')
+                return False
         else:
             objs = bpy.context.selected_objects
             if len(objs) == 0:
@@ -293,61 +387,63 @@ class RenderPreviewOperator(bpy.types.Operator):
         return True
 
 
-def convert_materials(pmx_armature, force_center):
+def convert_materials(pmx_armature, force_center, material_cache=None):
+    """将模型的MMD材质转换为blender材质
+    传入material_cache时，签名与已转换材质相同的材质直接替换为已转换的材质，所有材质都命中缓存的物体不再执行转换
+    """
     pmx_objects = find_pmx_objects(pmx_armature)
     if not pmx_objects:
         return
 
-    # 材质名称与MMDShaderDev的alpha值的映射
+    # 材质名称与MMDShaderDev的alpha值的映射，材质名称与材质签名的映射（需要在转换前获取）
     material_alpha_map = {}
+    material_signature_map = {}
     for obj in pmx_objects:
-        if not obj.material_slots:  # 材质槽为空
-            continue
         for slot in obj.material_slots:
             material = slot.material
-            if not material:  # 有材质槽但无材质
+            if not material or material.name in material_alpha_map:  # 有材质槽但无材质
                 continue
-            material_alpha_map[material.name] = 1  # 默认1
+            material_alpha_map[material.name] = get_mmd_shader_alpha(material)
+            if material_cache is not None:
+                material_signature_map[material.name] = material_cache.get_signature(material)
 
-        for material_name, alpha in material_alpha_map.items():
-            material = bpy.data.materials.get(material_name)
-            node_tree = material.node_tree
-            if not node_tree:  # 有材质但无节点树
+    # 原材质名称与转换后所用材质的映射
+    converted_material_map = {}
+    for obj in pmx_objects:
+        if not obj.material_slots:  # 材质槽为空
+            continue
+        need_convert = False
+        for slot in obj.material_slots:
+            material = slot.material
+            if not material or material.name in converted_material_map:
                 continue
+            if material_cache is None or material_cache.get(material_signature_map[material.name]) is None:
+                need_convert = True
+        if need_convert:
+            # 选中并转换为blender材质
+            deselect_all_objects()
+            select_and_activate(obj)
+            bpy.ops.mmd_tools.convert_materials()
 
-            nodes = node_tree.nodes
-            if not nodes:  # 有节点树但无节点
+        for slot in obj.material_slots:
+            material = slot.material
+            if not material:
                 continue
-            # 预先存储原始alpha值以供后续修改
-            for node in nodes:
-                if node.type == 'GROUP' and node.node_tree.name == "MMDShaderDev":
-                    mmd_shader_dev = node
-                    for input_node in mmd_shader_dev.inputs:
-                        if "Alpha" == input_node.name:
-                            material_alpha_map[material.name] = input_node.default_value
-        # 选中并转换为blender材质
-        select_and_activate(obj)
-        bpy.ops.mmd_tools.convert_materials()
-
-    # 将当前材质的不透明度恢复为材质转换前的不透明度
-    for material_name, alpha in material_alpha_map.items():
-        material = bpy.data.materials.get(material_name)
-        node_tree = material.node_tree
-        nodes = node_tree.nodes
-        for node in nodes:
-            if node.type == 'BSDF_PRINCIPLED':
-                if bpy.app.version < (4, 0, 0):
-                    specular_node = node.inputs['Specular']
-                else:
-                    specular_node = node.inputs['Specular IOR Level']
-                specular_node.default_value = 0
-                if alpha == 1:
-                    continue
-                alpha_node = node.inputs['Alpha']
-                for link in material.node_tree.links:
-                    if link.to_node == node and link.to_socket == alpha_node:
-                        material.node_tree.links.remove(link)
-                alpha_node.default_value = alpha
+            converted_material = converted_material_map.get(material.name)
+            if converted_material is None:
+                alpha = material_alpha_map[material.name]
+                signature = material_signature_map.get(material.name)
+                converted_material = material_cache.get(signature) if material_cache is not None else None
+                if converted_material is None:
+                    # 将当前材质的不透明度恢复为材质转换前的不透明度
+                    restore_material_alpha(material, alpha)
+                    converted_material = material
+                    if material_cache is not None:
+                        material_cache.put(signature, material)
+                material_alpha_map[converted_material.name] = alpha
+                converted_material_map[material.name] = converted_material
+            if converted_material != material:
+                slot.material = converted_material
 
     # 如果强制居中，则按材质分开，删除不透明度为0的物体
     if force_center:
@@ -370,34 +466,279 @@ def convert_materials(pmx_armature, force_center):
             bpy.data.objects.remove(obj_to_remove, do_unlink=True)
 
 
+def parse_thumbnail_sizes(text):
+    """解析缩略图尺寸（逗号分隔），按从大到小排列并去重，格式不正确时返回None"""
+    sizes = set()
+    for item in text.replace("，", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.isdigit() or int(item) <= 0:
+            return None
+        sizes.add(int(item))
+    return sorted(sizes, reverse=True)
+
+
+class PreviewThumbnailWriter:
+    """根据预览图输出多级缩略图（预览图名称_尺寸.png，尺寸为长边像素数），
+    批量渲染结束后将本次生成的最小一级的缩略图拼接为图集，并生成记录各缩略图位置的JSON索引，
+    供资源浏览器一次加载，无需读取大量原图
+    """
+
+    def __init__(self, directory, sizes):
+        self.directory = directory
+        self.sizes = sizes or []
+        # 本次生成的最小一级缩略图的路径 -> 像素，拼接图集时无需重新读取
+        self.thumbnails = {}
+
+    def get_thumbnail_path(self, image_path, size):
+        return os.path.splitext(image_path)[0] + f"_{size}.png"
+
+    def write(self, image_path):
+        """读取刚输出的预览图，逐级缩小并保存"""
+        if not self.sizes:
+            return
+        # 渲染结果（Render Result）的像素无法通过Python获取，所以读取刚写入的文件（仍在系统缓存中）
+        pixels, width, height = load_image_pixels(image_path)
+        for size in self.sizes:
+            scale = size / max(width, height)
+            if scale < 1:
+                # 每级都由上一级缩小得到
+                new_width, new_height = max(round(width * scale), 1), max(round(height * scale), 1)
+                pixels = resize_pixels(pixels, new_width, new_height)
+                width, height = new_width, new_height
+            thumbnail_path = self.get_thumbnail_path(image_path, size)
+            save_image_pixels(thumbnail_path, pixels)
+        self.thumbnails[os.path.normpath(self.get_thumbnail_path(image_path, self.sizes[-1]))] = pixels
+
+    def write_contact_sheets(self):
+        """将本次生成的最小一级的缩略图拼接为图集，每张图集最多PREVIEW_ATLAS_GRID×PREVIEW_ATLAS_GRID个
+        不重新遍历目录，之前批量渲染遗留的缩略图（对应的模型可能已被删除或修改）不会被拼接
+        """
+        if not self.sizes or not self.thumbnails:
+            return
+        cell = self.sizes[-1]
+        thumbnail_paths = sorted(self.thumbnails)
+
+        page_capacity = PREVIEW_ATLAS_GRID * PREVIEW_ATLAS_GRID
+        index = {"cell_size": cell, "pages": [], "items": {}}
+        for page, start in enumerate(range(0, len(thumbnail_paths), page_capacity)):
+            page_paths = thumbnail_paths[start:start + page_capacity]
+            columns = min(len(page_paths), PREVIEW_ATLAS_GRID)
+            rows = (len(page_paths) + columns - 1) // columns
+            atlas = np.zeros((rows * cell, columns * cell, 4), dtype=np.float32)
+            atlas_name = f"{PREVIEW_ATLAS_NAME}_{page}.png"
+            for i, thumbnail_path in enumerate(page_paths):
+                pixels = self.thumbnails[thumbnail_path]
+                height, width = pixels.shape[:2]
+                row, column = divmod(i, columns)
+                # 居中放入单元格，索引中的坐标以左上角为原点；blender图像的像素按从下到上的顺序存储
+                x = column * cell + (cell - width) // 2
+                y = row * cell + (cell - height) // 2
+                bottom = atlas.shape[0] - y - height
+                atlas[bottom:bottom + height, x:x + width] = pixels
+                key = os.path.relpath(thumbnail_path, self.directory).replace(os.sep, "/")
+                index["items"][key] = {"page": page, "x": x, "y": y, "width": width, "height": height}
+            save_image_pixels(os.path.join(self.directory, atlas_name), atlas)
+            index["pages"].append(atlas_name)
+        with open(os.path.join(self.directory, PREVIEW_ATLAS_NAME + ".json"), "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        print(f"已生成{len(index['pages'])}张预览图集，共{len(thumbnail_paths)}个缩略图")
+
+
+def load_image_pixels(image_path):
+    """读取图像的像素（高×宽×4，按从下到上的顺序），返回像素、宽、高"""
+    image = bpy.data.images.load(image_path, check_existing=False)
+    try:
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels.reshape(height, width, 4), width, height
+
+
+def save_image_pixels(image_path, pixels):
+    """将像素（高×宽×4）保存为png"""
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(os.path.basename(image_path), width, height, alpha=True)
+    try:
+        image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+        image.filepath_raw = image_path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+
+
+def resize_pixels(pixels, width, height):
+    """按面积平均缩小图像，颜色按alpha预乘后再平均，避免透明边缘发黑。行、列分别缩小，内存占用与像素数成正比"""
+    rgb = pixels[..., :3] * pixels[..., 3:]
+    premultiplied = np.concatenate((rgb, pixels[..., 3:]), axis=2)
+    resized = resize_axis(resize_axis(premultiplied, height, 0), width, 1)
+    alpha = resized[..., 3:]
+    resized[..., :3] = np.divide(resized[..., :3], alpha, out=np.zeros_like(resized[..., :3]), where=alpha > 0)
+    return resized.astype(np.float32)
+
+
+def resize_axis(data, target_size, axis):
+    """沿指定轴按面积平均缩小。整数倍时直接分块求平均，否则通过前缀和计算每个目标像素覆盖区间内的平均值"""
+    source_size = data.shape[axis]
+    if source_size % target_size == 0:
+        factor = source_size // target_size
+        shape = data.shape[:axis] + (target_size, factor) + data.shape[axis + 1:]
+        return data.reshape(shape).mean(axis=axis + 1)
+    data = np.moveaxis(data, axis, 0).astype(np.float64)
+    prefix = np.concatenate((np.zeros((1,) + data.shape[1:]), np.cumsum(data, axis=0)))
+    # 目标像素的边界在源像素中的位置，边界处的源像素按覆盖的比例计入
+    edges = np.arange(target_size + 1) * source_size / target_size
+    index = np.minimum(np.floor(edges).astype(np.int64), source_size - 1)
+    fraction = (edges - index).reshape((-1,) + (1,) * (data.ndim - 1))
+    coverage = prefix[index] + data[index] * fraction
+    resized = (coverage[1:] - coverage[:-1]) * (target_size / source_size)
+    return np.moveaxis(resized, 0, axis)
+
+
+def get_mmd_shader_alpha(material):
+    """获取材质中MMDShaderDev的alpha值，默认为1"""
+    alpha = 1
+    node_tree = material.node_tree
+    if not node_tree:  # 有材质但无节点树
+        return alpha
+    for node in node_tree.nodes:
+        if node.type == 'GROUP' and node.node_tree and node.node_tree.name == "MMDShaderDev":
+            for input_node in node.inputs:
+                if "Alpha" == input_node.name:
+                    alpha = input_node.default_value
+    return alpha
+
+
+def restore_material_alpha(material, alpha):
+    """关闭转换后材质的高光，并将不透明度恢复为转换前的不透明度"""
+    node_tree = material.node_tree
+    if not node_tree:
+        return
+    for node in node_tree.nodes:
+        if node.type == 'BSDF_PRINCIPLED':
+            if bpy.app.version < (4, 0, 0):
+                specular_node = node.inputs['Specular']
+            else:
+                specular_node = node.inputs['Specular IOR Level']
+            specular_node.default_value = 0
+            if alpha == 1:
+                continue
+            alpha_node = node.inputs['Alpha']
+            for link in node_tree.links:
+                if link.to_node == node and link.to_socket == alpha_node:
+                    node_tree.links.remove(link)
+            alpha_node.default_value = alpha
+
+
+class MaterialConvertCache:
+    """批量渲染时的材质转换缓存
+    以材质签名（贴图路径、mmd_material参数、MMDShaderDev输入值）为键记录已转换的材质，
+    签名相同的材质直接使用已转换的材质，省去转换操作，多个模型共用同一材质时EEVEE也只需编译一次着色器
+    """
+
+    def __init__(self):
+        # 材质签名 -> 已转换的材质
+        self.materials = {}
+        # 已转换的材质所引用的贴图及节点组
+        self.dependencies = []
+
+    def get_signature(self, material):
+        """获取转换前材质的签名，无法确定签名（如贴图已打包）时返回None"""
+        node_tree = material.node_tree
+        if not node_tree or not hasattr(material, "mmd_material"):
+            return None
+        textures = []
+        shader_inputs = []
+        for node in node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image:
+                image = node.image
+                if image.packed_file or not image.filepath:
+                    return None
+                image_path = os.path.normcase(os.path.abspath(bpy.path.abspath(image.filepath, library=image.library)))
+                textures.append([node.name, image_path])
+            elif node.type == 'GROUP' and node.node_tree and node.node_tree.name == "MMDShaderDev":
+                for input_node in node.inputs:
+                    if not hasattr(input_node, "default_value"):
+                        continue
+                    value = input_node.default_value
+                    shader_inputs.append([input_node.name, list(value) if hasattr(value, "__len__") else value])
+        mmd_values = get_property_values(material.mmd_material)
+        # 名称、序号等参数不影响渲染结果
+        for identifier in MATERIAL_SIGNATURE_IGNORED_PROPS:
+            mmd_values.pop(identifier, None)
+        return json.dumps([sorted(textures), shader_inputs, mmd_values], sort_keys=True)
+
+    def get(self, signature):
+        """获取签名对应的已转换材质，不存在时返回None"""
+        if signature is None:
+            return None
+        material = self.materials.get(signature)
+        if material is not None and not is_valid_data(material):
+            del self.materials[signature]
+            return None
+        return material
+
+    def put(self, signature, material):
+        """记录已转换的材质，添加伪用户以免在清理模型时被移除"""
+        if signature is None:
+            return
+        material.use_fake_user = True
+        self.materials[signature] = material
+        for node in material.node_tree.nodes:
+            if node.type == 'TEX_IMAGE' and node.image:
+                self.dependencies.append(node.image)
+            elif node.type == 'GROUP' and node.node_tree:
+                self.dependencies.append(node.node_tree)
+
+    def get_uids(self):
+        """缓存的材质及其贴图、节点组的session_uid"""
+        return {id_data.session_uid for id_data in list(self.materials.values()) + self.dependencies
+                if is_valid_data(id_data)}
+
+    def release(self):
+        """批量处理结束后释放缓存，移除已无人使用的材质及其贴图、节点组"""
+        materials = [material for material in self.materials.values() if is_valid_data(material)]
+        for material in materials:
+            material.use_fake_user = False
+        bpy.data.batch_remove([material for material in materials if material.users == 0])
+        dependencies = {id_data.session_uid: id_data for id_data in self.dependencies
+                        if is_valid_data(id_data) and id_data.users == 0}
+        bpy.data.batch_remove(list(dependencies.values()))
+        self.materials.clear()
+        self.dependencies.clear()
+
+
+def is_valid_data(id_data):
+    """数据块是否仍然存在（已被移除的数据块访问属性时会抛出ReferenceError）"""
+    try:
+        id_data.name
+    except ReferenceError:
+        return False
+    return True
+
+
 def camera_to_view_selected(props):
+    """使预览相机对准选中物体，返回该相机
+    根据选中物体所在模型中可见物体的顶点直接计算相机位置（及正交比例），不依赖3D视图，可在后台模式下运行
+    """
     camera = gen_preview_camera(props)
 
-    # 备份当前选中和激活的对象
-    active_object = bpy.context.active_object
-    objs = bpy.context.selected_objects
-
     # 获取选中物体最外层祖先的孩子set
     ancestors = set()
     children = set()
-    for obj in objs:
+    for obj in bpy.context.selected_objects:
         ancestor = find_ancestor(obj)
         ancestors.add(ancestor)
     for ancestor in ancestors:
         children.update(find_children(ancestor))
-    for child in children:
-        select_and_activate(child)
 
     align = props.align
     # 随便选择一个ancestor
     ancestor = next(iter(ancestors))
-    if align:
-        # 获取 ancestor 的坐标
-        ancestor_location = ancestor.location.copy()
-        # 将 ancestor 移动到 (0, 0, 0) 原点位置
-        ancestor.location = mathutils.Vector((0, 0, 0))
-        # 计算坐标差值
-        delta = ancestor_location - mathutils.Vector((0, 0, 0))
 
     # 修改相机参数
     camera.rotation_mode = 'XYZ'
@@ -422,37 +763,14 @@ def camera_to_view_selected(props):
     # 激活该相机
     bpy.context.scene.camera = camera
 
-    if align:
-        constraint = camera.constraints.new(type='LIMIT_LOCATION')
-        # 设置局部X轴的最小值和最大值
-        constraint.use_min_x = True
-        constraint.use_max_x = True
-        constraint.min_x = 0.0
-        constraint.max_x = 0.0
-        # 设置约束为局部空间
-        constraint.owner_space = 'LOCAL'
-        # 将这个约束放到首位
-        camera.constraints.move(len(camera.constraints) - 1, 0)
-
     # 对准选中物体
-    bpy.ops.view3d.camera_to_view_selected()
-    # 切换下视图（确保view_camera执行后肯定在相应视图）
-    bpy.ops.view3d.view_axis(type='FRONT')
-    # 视图 - 摄像机 对应快捷键0
-    bpy.ops.view3d.view_camera()
-    # 摄像机边界框 对应快捷键home
-    bpy.ops.view3d.view_center_camera()
+    points = get_display_points([child for child in children if child.visible_get()])
+    if len(points) > 0:
+        fit_camera_to_points(camera, points)
 
     if align:
-        # 这里要选中后才能应用
-        # 如果存在约束，用户调整相机角度时会受到限制拖拽不动，所以这里应用掉
-        select_and_activate(camera)
-        constraint = camera.constraints[0]
-        bpy.ops.constraint.apply(constraint=constraint.name, owner='OBJECT')
-
-        # 将 ancestor 移动回原来的位置
-        ancestor.location = ancestor_location
-        camera.location += delta
+        # 使相机的X坐标与 ancestor 保持一致，让角色处于画面中心
+        camera.location.x = ancestor.matrix_world.translation.x
 
     # 调整边距
     if camera_type == "PERSPECTIVE":
@@ -463,11 +781,196 @@ def camera_to_view_selected(props):
     else:
         pass
 
-    # 恢复默认选中
-    deselect_all_objects()
+    return camera
+
+
+def get_display_points(objs):
+    """获取物体在视图中显示的点的世界坐标（N×3），网格物体取求值后的顶点，其它物体取原点"""
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    points = []
     for obj in objs:
-        select_and_activate(obj)
-    select_and_activate(active_object)
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        if obj.type == 'MESH':
+            mesh = obj.evaluated_get(depsgraph).data
+            coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+            mesh.vertices.foreach_get("co", coords)
+            coords = coords.reshape(-1, 3)
+            points.append(coords @ matrix[:3, :3].T + matrix[:3, 3])
+        else:
+            points.append(matrix[:3, 3].reshape(1, 3))
+    if not points:
+        return np.empty((0, 3), dtype=np.float64)
+    return np.concatenate(points)
+
+
+def fit_camera_to_points(camera, points):
+    """保持相机旋转不变，移动相机（正交相机同时修改正交比例）使所有点恰好处于画面中，效果等同于“相机对准选中物体”
+    """
+    scene = bpy.context.scene
+    rotation = np.array(camera.rotation_euler.to_matrix(), dtype=np.float64)
+    # 转换到相机的旋转坐标系中，相机朝向-Z
+    local_points = points @ rotation
+    xs, ys, zs = local_points[:, 0], local_points[:, 1], local_points[:, 2]
+    # 画面四个角在相机局部坐标系中的位置（已考虑传感器适配、分辨率比例及移位）
+    frame = camera.data.view_frame(scene=scene)
+    left = min(v.x for v in frame)
+    right = max(v.x for v in frame)
+    bottom = min(v.y for v in frame)
+    top = max(v.y for v in frame)
+
+    if camera.data.type == 'ORTHO':
+        # 按需缩放正交比例，使点的范围恰好充满画面
+        factor = max((xs.max() - xs.min()) / (right - left), (ys.max() - ys.min()) / (top - bottom))
+        if factor > 0:
+            camera.data.ortho_scale *= factor
+        else:
+            factor = 1
+        center_x = (xs.max() + xs.min()) / 2 - (right + left) / 2 * factor
+        center_y = (ys.max() + ys.min()) / 2 - (top + bottom) / 2 * factor
+        # 放在最近的点前方，距离为深度范围，避免裁剪
+        center_z = zs.max() + max(zs.max() - zs.min(), camera.data.clip_start)
+    else:
+        # 换算为深度为1时画面边缘的偏移量
+        depth = -frame[0].z
+        left, right, bottom, top = left / depth, right / depth, bottom / depth, top / depth
+        # 相机位于c时，每个点需满足 left*(cz-z) <= x-cx <= right*(cz-z)，上下方向同理
+        # 分别求出恰好容纳所有点的左右边缘平面与上下边缘平面的交线，取离得更远的深度
+        max_x, min_x = (xs + right * zs).max(), (xs + left * zs).min()
+        max_y, min_y = (ys + top * zs).max(), (ys + bottom * zs).min()
+        center_z = max((max_x - min_x) / (right - left), (max_y - min_y) / (top - bottom))
+        # 另一方向存在余量时保持居中
+        center_x = (max_x - right * center_z + min_x - left * center_z) / 2
+        center_y = (max_y - top * center_z + min_y - bottom * center_z) / 2
+    camera.location = mathutils.Vector(rotation @ np.array((center_x, center_y, center_z)))
+
+
+def view_through_camera():
+    """在3D视图中切换到相机视角并使相机边界框充满视图，不在3D视图中时跳过"""
+    if not is_view3d_context():
+        return
+    space_data = bpy.context.space_data
+    # 视图 - 摄像机 对应快捷键0
+    space_data.region_3d.view_perspective = 'CAMERA'
+    # 摄像机边界框 对应快捷键home
+    bpy.ops.view3d.view_center_camera()
+
+
+def render_models_in_one_pass(props, filepaths, suffix, ext, manifest, material_cache=None, use_render_engine=False,
+                              thumbnail_writer=None):
+    """在同一场景中导入多个模型，沿相机局部X轴错开排列，并为每个模型生成对准该模型的相机
+    借助多视图渲染（每个视图对应一个相机），一次渲染输出所有模型的预览图，再移动到各模型目录中
+    每个视图使用与单个模型渲染时相同的相机参数，渲染结果与逐个渲染一致
+    """
+    scene = bpy.context.scene
+    render_settings = scene.render
+    force_center = props.force_center
+    start_time = time.time()
+    snapshot = snapshot_data()
+    collection = get_collection(TMP_COLLECTION_NAME)
+    for filepath in filepaths:
+        manifest.start(filepath)
+
+    # 备份渲染设置
+    original_output_path = render_settings.filepath
+    original_camera = scene.camera
+    original_use_multiview = render_settings.use_multiview
+    original_views_format = render_settings.views_format
+    original_image_views_format = render_settings.image_settings.views_format
+    original_view_uses = {view.name: view.use for view in render_settings.views}
+    added_views = []
+    imported_uids = set()
+    output_dir = tempfile.mkdtemp(prefix="kafei_preview_")
+    try:
+        pmx_roots = []
+        for filepath in filepaths:
+            deselect_all_objects()
+            import_pmx(filepath)
+            pmx_roots.append(bpy.context.active_object)
+            print(f"\"{os.path.basename(filepath)}\"导入完成")
+        imported_uids = {id_data.session_uid for id_data in get_new_data(snapshot)}
+        for pmx_root in pmx_roots:
+            convert_materials(find_pmx_armature(pmx_root), force_center, material_cache)
+        if material_cache is not None:
+            # 缓存的材质及其贴图需要保留给后续模型使用
+            imported_uids -= material_cache.get_uids()
+
+        # 沿相机局部X轴错开排列，间距远大于模型尺寸，使各相机的画面中只有对应的模型
+        rotation_y = 0 if props.align else props.rotation_euler_y
+        camera_rotation = mathutils.Euler((props.rotation_euler_x, rotation_y, props.rotation_euler_z), 'XYZ')
+        offset_axis = camera_rotation.to_matrix() @ mathutils.Vector((1, 0, 0))
+        max_size = max((max(obj.dimensions) for pmx_root in pmx_roots
+                        for obj in find_children(pmx_root, ['MESH'])), default=1.0)
+        spacing = max(max_size, 1.0) * 10
+        for index, pmx_root in enumerate(pmx_roots):
+            pmx_root.location += offset_axis * spacing * index
+
+        # 为每个模型生成相机，名称后缀与视图的相机后缀对应
+        view_cameras = []
+        for index, pmx_root in enumerate(pmx_roots):
+            pmx_armature = find_pmx_armature(pmx_root)
+            deselect_all_objects()
+            show_object(pmx_root)
+            hide_object(pmx_armature)
+            select_and_activate(pmx_root)
+            camera = camera_to_view_selected(props)
+            # 隐藏可能会对渲染结果造成影响的物体
+            hide_object(pmx_root)
+            deselect_all_objects()
+
+            view_camera = camera.copy()
+            view_camera.data = camera.data.copy()
+            view_camera.name = f"{PREVIEW_VIEW_NAME}_{index}"
+            collection.objects.link(view_camera)
+            view_cameras.append(view_camera)
+
+        # 启用多视图，只渲染本次添加的视图
+        render_settings.use_multiview = True
+        render_settings.views_format = 'MULTIVIEW'
+        for view in render_settings.views:
+            view.use = False
+        for index, view_camera in enumerate(view_cameras):
+            view = render_settings.views.new(view_camera.name)
+            view.camera_suffix = f"_{index}"
+            view.use = True
+            added_views.append(view.name)
+        render_settings.image_settings.views_format = 'INDIVIDUAL'
+        scene.camera = view_cameras[0]
+
+        # 各视图的图像以 文件名_相机后缀 的形式分别输出
+        render_settings.filepath = os.path.join(output_dir, "preview" + ext)
+        render(False, use_render_engine)
+        for index, filepath in enumerate(filepaths):
+            view_filepath = os.path.join(output_dir, f"preview_{index}{ext}")
+            if not os.path.exists(view_filepath):
+                raise Exception(f'未找到视图的渲染结果：{view_filepath}')
+            new_filepath = os.path.splitext(filepath)[0] + suffix + ext
+            shutil.move(view_filepath, new_filepath)
+            if thumbnail_writer is not None:
+                thumbnail_writer.write(new_filepath)
+    except Exception as e:
+        duration = (time.time() - start_time) / len(filepaths)
+        for filepath in filepaths:
+            manifest.finish(filepath, duration, str(e))
+        if material_cache is not None:
+            material_cache.release()
+        raise
+    finally:
+        # 恢复渲染设置
+        for view_name in added_views:
+            render_settings.views.remove(render_settings.views[view_name])
+        for view_name, use in original_view_uses.items():
+            render_settings.views[view_name].use = use
+        render_settings.use_multiview = original_use_multiview
+        render_settings.views_format = original_views_format
+        render_settings.image_settings.views_format = original_image_views_format
+        render_settings.filepath = original_output_path
+        scene.camera = original_camera
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    clean_batch_data(snapshot, imported_uids)
+    duration = (time.time() - start_time) / len(filepaths)
+    for filepath in filepaths:
+        manifest.finish(filepath, duration)
 
 
 def gen_preview_camera(props):
@@ -507,9 +1010,9 @@ def gen_preview_camera(props):
     return camera
 
 
-def render(view_show):
-    shading_type = bpy.context.space_data.shading.type
-    if shading_type == 'RENDERED':
+def render(view_show, use_render_engine=False):
+    """渲染，use_render_engine为False时按3D视图的着色方式决定使用渲染引擎渲染还是视图渲染"""
+    if use_render_engine or not is_view3d_context() or bpy.context.space_data.shading.type == 'RENDERED':
         if view_show:
             bpy.ops.render.render("INVOKE_DEFAULT")
             bpy.ops.render.view_show()
@@ -521,3 +1024,19 @@ def render(view_show):
             bpy.ops.render.view_show()
         else:
             bpy.ops.render.opengl(write_still=True)
+
+
+def get_render_engine(engine):
+    """渲染方式对应的渲染引擎"""
+    if engine == "EEVEE":
+        return 'BLENDER_EEVEE' if bpy.app.version < (4, 2, 0) else 'BLENDER_EEVEE_NEXT'
+    elif engine == "CYCLES":
+        return 'CYCLES'
+    else:
+        return 'BLENDER_WORKBENCH'
+
+
+def is_view3d_context():
+    """当前上下文是否位于3D视图中（后台模式下没有3D视图）"""
+    space_data = bpy.context.space_data
+    return space_data is not None and space_data.type == 'VIEW_3D'
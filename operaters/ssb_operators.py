@@ -23,6 +23,219 @@ class SsbResult:
         self.message = message
 
 
+# 不属于骨骼权重的顶点组
+# mmd_edge_scale 轮廓倍率，一般值均为1
+# mmd_vertex_order 取值为i/vertex_count，记录了pmx模型顶点的顺序。
+NON_BONE_VG_NAMES = ('mmd_edge_scale', 'mmd_vertex_order')
+
+
+class WeightMatrix:
+    """追加ssb期间，pmx模型网格对象的顶点权重矩阵
+    每个物体只遍历一次顶点来构建，期间权重的读取与修改都在矩阵上完成，最后由commit统一写回顶点组。
+    矩阵的一行对应一个顶点，按vertex.groups的顺序存放（顶点组索引, 权重），空位的顶点组索引为-1。
+    移除时将最后一个权重移动到被移除的位置（同BKE_defvert_remove_group），新增的权重追加到末尾，ADD时权重上限为1。
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        mesh = obj.data
+        vertex_count = len(mesh.vertices)
+        co = np.empty(vertex_count * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        self.coords = co.reshape(-1, 3).astype(np.float64)
+
+        vert_indexes = []
+        group_indexes = []
+        weights = []
+        for vert in mesh.vertices:
+            for group_element in vert.groups:
+                vert_indexes.append(vert.index)
+                group_indexes.append(group_element.group)
+                weights.append(group_element.weight)
+        vert_indexes = np.array(vert_indexes, dtype=np.int64)
+        counts = np.bincount(vert_indexes, minlength=vertex_count)
+        width = max(int(counts.max()) if vertex_count else 0, 1)
+        slots = np.arange(len(vert_indexes)) - np.repeat(np.cumsum(counts) - counts, counts)
+        self.groups = np.full((vertex_count, width), -1, dtype=np.int32)
+        self.weights = np.zeros((vertex_count, width), dtype=np.float32)
+        self.groups[vert_indexes, slots] = group_indexes
+        self.weights[vert_indexes, slots] = weights
+        # 构建时的权重，commit时用于比较
+        self.original_groups = self.groups.copy()
+        self.original_weights = self.weights.copy()
+        # 权重被修改过的顶点
+        self.dirty = np.zeros(vertex_count, dtype=bool)
+
+    def get_group_flags(self, predicate):
+        """按顶点组索引获取顶点组名称是否满足条件，末尾额外的False对应空位（-1）"""
+        return np.array([predicate(vg.name) for vg in self.obj.vertex_groups] + [False], dtype=bool)
+
+    def get_group_mask(self, name):
+        """权重矩阵中属于指定顶点组的位置"""
+        index = self.obj.vertex_groups.find(name)
+        if index == -1:
+            return np.zeros(self.groups.shape, dtype=bool)
+        return self.groups == index
+
+    def get_contains_mask(self, names):
+        """拥有指定顶点组（任意一个）权重的顶点"""
+        indexes = [index for index in (self.obj.vertex_groups.find(name) for name in names) if index != -1]
+        return np.isin(self.groups, indexes).any(axis=1)
+
+    def get_weights(self, name):
+        """各顶点在指定顶点组上的权重，不属于该顶点组的为0"""
+        return np.where(self.get_group_mask(name), self.weights, 0).sum(axis=1)
+
+    def get_dedicated_mask(self, bone_name, threshold=1.0):
+        """指定骨骼的权重占比超过阈值的顶点"""
+        is_bone = self.get_group_flags(lambda name: name in bl_jp_map.keys())[self.groups]
+        is_counted = self.get_group_flags(lambda name: name not in NON_BONE_VG_NAMES)[self.groups]
+        target = self.get_group_mask(bone_name)
+        # 在MMD中，一个顶点最多和4个骨骼相关联，第4个骨骼之后的权重不参与计算
+        processed = (np.cumsum(is_bone, axis=1) - is_bone) < 4
+        summation = np.zeros(len(self.groups), dtype=np.float64)
+        total = np.zeros(len(self.groups), dtype=np.float64)
+        # 按列累加，与逐个权重累加的结果保持一致
+        for slot in range(self.groups.shape[1]):
+            weights = self.weights[:, slot].astype(np.float64)
+            summation += np.where(target[:, slot] & processed[:, slot], weights, 0.0)
+            total += np.where(is_counted[:, slot] & processed[:, slot], weights, 0.0)
+        ratio = np.divide(summation, total, out=np.zeros_like(total), where=total != 0)
+        return (total != 0) & (ratio > threshold)
+
+    def add(self, name, rows, weights, mode='ADD'):
+        """同vertex_group.add，weights可以是单个值或与rows等长的数组"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        index = self.obj.vertex_groups[name].index
+        weights = np.clip(np.broadcast_to(np.asarray(weights, dtype=np.float32), rows.shape), 0.0, 1.0)
+        match = self.groups[rows] == index
+        exists = match.any(axis=1)
+        # 已拥有该顶点组权重的顶点，原地修改
+        existing_rows = rows[exists]
+        existing_slots = match[exists].argmax(axis=1)
+        if mode == 'ADD':
+            self.weights[existing_rows, existing_slots] = np.minimum(
+                self.weights[existing_rows, existing_slots] + weights[exists], 1.0)
+        else:
+            self.weights[existing_rows, existing_slots] = weights[exists]
+        # 未拥有该顶点组权重的顶点，追加到末尾
+        append_rows = rows[~exists]
+        if len(append_rows):
+            append_slots = (self.groups[append_rows] != -1).sum(axis=1)
+            if append_slots.max() >= self.groups.shape[1]:
+                self.groups = np.pad(self.groups, ((0, 0), (0, 1)), constant_values=-1)
+                self.weights = np.pad(self.weights, ((0, 0), (0, 1)))
+            self.groups[append_rows, append_slots] = index
+            self.weights[append_rows, append_slots] = weights[~exists]
+        self.dirty[rows] = True
+
+    def remove(self, name, rows):
+        """同vertex_group.remove"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        index = self.obj.vertex_groups[name].index
+        self.remove_entries(rows, self.groups[rows] == index)
+
+    def remove_bone_weights(self, rows):
+        """移除顶点权重（排除对'mmd_edge_scale', 'mmd_vertex_order'的影响）"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        is_removable = self.get_group_flags(lambda name: name not in NON_BONE_VG_NAMES)
+        self.remove_entries(rows, is_removable[self.groups[rows]])
+
+    def remove_entries(self, rows, mask):
+        """移除rows中mask对应位置的权重，按位置倒序逐个移除，每次将最后一个权重移动到被移除的位置"""
+        groups = self.groups[rows]
+        weights = self.weights[rows]
+        counts = (groups != -1).sum(axis=1)
+        for slot in reversed(range(groups.shape[1])):
+            # 倒序处理时，当前位置之前的权重尚未移动过，mask仍然对应原有的权重
+            selected = np.flatnonzero(mask[:, slot])
+            if len(selected) == 0:
+                continue
+            last = counts[selected] - 1
+            groups[selected, slot] = groups[selected, last]
+            weights[selected, slot] = weights[selected, last]
+            groups[selected, last] = -1
+            weights[selected, last] = 0
+            counts[selected] = last
+        self.groups[rows] = groups
+        self.weights[rows] = weights
+        self.dirty[rows] = True
+
+    def transfer(self, name_map):
+        """将顶点在源顶点组上的权重转移到目标顶点组上（移除源顶点组权重，以ADD的方式添加到目标顶点组）
+        按权重位置倒序逐个处理
+        """
+        indexes = {self.obj.vertex_groups.find(source): target for source, target in name_map.items()}
+        indexes.pop(-1, None)
+        for slot in reversed(range(self.groups.shape[1])):
+            for index, target in indexes.items():
+                rows = np.flatnonzero(self.groups[:, slot] == index)
+                if len(rows) == 0:
+                    continue
+                weights = self.weights[rows, slot]
+                self.remove_entries(rows, self.groups[rows] == index)
+                self.add(target, rows, weights)
+
+    def commit(self):
+        """将修改过的权重写回顶点组
+        顶点组相同的前缀部分原地替换有变化的权重，之后的部分先移除再按顺序重新添加，以保证vertex.groups的顺序与矩阵一致
+        vertex_group.add每次只能指定一个权重值，这里按（顶点组, 权重）分组调用
+        """
+        rows = np.flatnonzero(self.dirty)
+        if len(rows) == 0:
+            return
+        width = self.groups.shape[1]
+        padding = ((0, 0), (0, width - self.original_groups.shape[1]))
+        groups = self.groups[rows]
+        weights = self.weights[rows]
+        original_groups = np.pad(self.original_groups[rows], padding, constant_values=-1)
+        original_weights = np.pad(self.original_weights[rows], padding)
+
+        different = groups != original_groups
+        prefix = np.where(different.any(axis=1), different.argmax(axis=1), width)
+        in_suffix = np.arange(width) >= prefix[:, None]
+        vertex_groups = self.obj.vertex_groups
+        # 移除原有的后缀部分
+        removal = in_suffix & (original_groups != -1)
+        for index in np.unique(original_groups[removal]):
+            removal_rows = rows[(removal & (original_groups == index)).any(axis=1)]
+            vertex_groups[int(index)].remove(removal_rows.tolist())
+        # 逐列写入，保证追加的顺序
+        writing = ((~in_suffix & (weights != original_weights)) | in_suffix) & (groups != -1)
+        for slot in range(width):
+            column_mask = writing[:, slot]
+            if not column_mask.any():
+                continue
+            column_rows = rows[column_mask]
+            column_groups = groups[column_mask, slot]
+            column_weights = weights[column_mask, slot]
+            order = np.lexsort((column_weights, column_groups))
+            column_rows = column_rows[order]
+            column_groups = column_groups[order]
+            column_weights = column_weights[order]
+            boundaries = np.flatnonzero(
+                (column_groups[1:] != column_groups[:-1]) | (column_weights[1:] != column_weights[:-1])) + 1
+            for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(column_rows)]):
+                vertex_groups[int(column_groups[start])].add(column_rows[start:end].tolist(),
+                                                             float(column_weights[start]), 'REPLACE')
+        self.original_groups = self.groups.copy()
+        self.original_weights = self.weights.copy()
+        self.dirty[:] = False
+
+
+def get_weight_matrix(weight_matrices, obj):
+    """获取物体的权重矩阵，不存在则新建"""
+    if obj not in weight_matrices:
+        weight_matrices[obj] = WeightMatrix(obj)
+    return weight_matrices[obj]
+
+
 class SelectAllSsbOperator(bpy.types.Operator):
     bl_idname = "mmd_kafei_tools.select_all_ssb"
     bl_label = "全部选择"
@@ -323,7 +536,7 @@ class AddSsbOperator(bpy.types.Operator):
         pmx_root = find_pmx_root_with_child(pmx_armature)
 
         if batch_flag:
-            batch_process(self.create_ssb, props)
+            batch_process(self.create_ssb, props, operator=self)
         else:
             results = self.create_ssb(pmx_root, props)
             duration = time.time() - start_time
@@ -360,6 +573,8 @@ class AddSsbOperator(bpy.types.Operator):
         # 这里通过预先创建的方式维护一组tmp bone，需要时直接从中获取，并进行相应属性的赋予即可，从而达到创建ssb过程中始终保持EDIT模式
         # 补充说明：如果对edit bone改名，如果不切换模式，bone的hide属性失效（虽然能够获取bone）；mmd插件的调用也应该移动到后面防止意料外问题发生
         create_tmp_bones(armature)
+        # 顶点权重矩阵，各物体在首次用到时构建，期间的权重修改统一在最后写回
+        weight_matrices = {}
 
         # 进入编辑模式，并确保添加ssb期间不涉及模式切换
         if armature.mode != 'EDIT':
@@ -367,17 +582,17 @@ class AddSsbOperator(bpy.types.Operator):
             bpy.ops.object.mode_set(mode='EDIT')
 
         # 腕弯曲骨骼
-        create_arm_twist_bone(armature, props, results)
+        create_arm_twist_bone(armature, props, results, weight_matrices)
         # 手弯曲骨骼
-        create_wrist_twist_bone(armature, props, results)
+        create_wrist_twist_bone(armature, props, results, weight_matrices)
         # 上半身2
-        create_upper_body2_bone(armature, props, results)
+        create_upper_body2_bone(armature, props, results, weight_matrices)
         # 腰骨骼
         create_waist_bone(armature, props, results)
         # 足IK親
         create_ik_p_bone(armature, props, results)
         # 足先EX
-        create_ex_bone(armature, props, results)
+        create_ex_bone(armature, props, results, weight_matrices)
         # 手持骨
         create_dummy_bone(armature, props, results)
         # グルーブ骨
@@ -385,11 +600,14 @@ class AddSsbOperator(bpy.types.Operator):
         # 肩P
         create_shoulder_p_bone(armature, props, results)
         # 大拇指０骨骼
-        create_thumb0_bone(armature, props, results)
+        create_thumb0_bone(armature, props, results, weight_matrices)
         # 全ての親
         create_root_bone(armature, props, results)
         # 操作中心
         create_view_center_bone(armature, props, results)
+        # 写回权重（需要在移除顶点组之前进行）
+        for weight_matrix in weight_matrices.values():
+            weight_matrix.commit()
         # 移除名称为ssb且骨架中不含该骨骼的顶点组
         post_set_panel_order(armature)
         # 移除多余的临时骨骼
@@ -483,7 +701,7 @@ def get_ssb_to_add(props):
     return bones
 
 
-def create_ex_bone(armature, props, results):
+def create_ex_bone(armature, props, results, weight_matrices):
     base_props = props.base
     if not base_props.ex_checked:
         return
@@ -555,27 +773,16 @@ def create_ex_bone(armature, props, results):
 
         # 权重分配
         for obj in objs:
-            for vertex in obj.data.vertices:
-                if is_vertex_dedicated_by_bone(obj, vertex, ankle_bl, threshold=0.97):
-                    center = (vertex.co.y - ankle_eb.head.y) / (ex_eb.head.y - ankle_eb.head.y)
-                    weight = np.clip((center - 0.75) * 2.0, 0.0, 1.0)
-                    remove_vertex_weight(obj, vertex)
-                    obj.vertex_groups[ex_bl].add([vertex.index], weight, 'ADD')
-                    obj.vertex_groups[ankle_bl].add([vertex.index], 1 - weight, 'ADD')
+            weight_matrix = get_weight_matrix(weight_matrices, obj)
+            rows = np.flatnonzero(weight_matrix.get_dedicated_mask(ankle_bl, threshold=0.97))
+            center = (weight_matrix.coords[rows, 1] - ankle_eb.head.y) / (ex_eb.head.y - ankle_eb.head.y)
+            weight = np.clip((center - 0.75) * 2.0, 0.0, 1.0)
+            weight_matrix.remove_bone_weights(rows)
+            weight_matrix.add(ex_bl, rows, weight)
+            weight_matrix.add(ankle_bl, rows, 1 - weight)
         for obj in objs:
-            for vertex in obj.data.vertices:
-                for vg in reversed(vertex.groups):
-                    group_name = obj.vertex_groups[vg.group].name
-                    weight = vg.weight
-                    if group_name == leg_bl:
-                        obj.vertex_groups[leg_bl].remove([vertex.index])
-                        obj.vertex_groups[leg_d_bl].add([vertex.index], weight, 'ADD')
-                    if group_name == knee_bl:
-                        obj.vertex_groups[knee_bl].remove([vertex.index])
-                        obj.vertex_groups[knee_d_bl].add([vertex.index], weight, 'ADD')
-                    if group_name == ankle_bl:
-                        obj.vertex_groups[ankle_bl].remove([vertex.index])
-                        obj.vertex_groups[ankle_d_bl].add([vertex.index], weight, 'ADD')
+            weight_matrix = get_weight_matrix(weight_matrices, obj)
+            weight_matrix.transfer({leg_bl: leg_d_bl, knee_bl: knee_d_bl, ankle_bl: ankle_d_bl})
 
         # 足骨刚体移动到足D骨
         pmx_root = find_pmx_root_with_child(armature)
@@ -599,17 +806,6 @@ def create_ex_bone(armature, props, results):
             SsbResult(status=SsbStatus.SUCCESS, result=[ex_jp, leg_d_jp, knee_d_jp, ankle_d_jp]))
 
 
-def remove_vertex_weight(obj, vertex):
-    """移除顶点权重（排除对'mmd_edge_scale', 'mmd_vertex_order'的影响）
-    mmd_edge_scale 轮廓倍率，一般值均为1
-    mmd_vertex_order 取值为i/vertex_count，记录了pmx模型顶点的顺序。
-    """
-    for group in reversed(vertex.groups):
-        group_name = obj.vertex_groups[group.group].name
-        if group_name not in ['mmd_edge_scale', 'mmd_vertex_order']:
-            obj.vertex_groups[group.group].remove([vertex.index])
-
-
 def create_d_bone(armature, scale, source_jp, controllable):
     edit_bones = armature.data.edit_bones
     pose_bones = armature.pose.bones
@@ -662,7 +858,7 @@ def create_d_bone(armature, scale, source_jp, controllable):
     return target_jp, target_bl, target_eb
 
 
-def create_thumb0_bone(armature, props, results):
+def create_thumb0_bone(armature, props, results, weight_matrices):
     base_props = props.base
     if not base_props.thumb0_checked:
         return
@@ -734,63 +930,59 @@ def create_thumb0_bone(armature, props, results):
 
         # 权重分配
         length = Vector(thumb1_eb.head - thumb0_eb.head).length
+        center = np.array((thumb0_eb.head + thumb1_eb.head) * 0.5)
+        direction_array = np.array(direction)
         for obj in objs:
-            for vertex in obj.data.vertices:
-                if not contains_vg(obj, vertex, [wrist_bl, thumb1_bl]):
-                    continue
-                # 顶点 与 亲指0和亲指1中点 的距离（向量）
-                distance = Vector(vertex.co) - Vector((thumb0_eb.head + thumb1_eb.head) * 0.5)
-                # distance 在 direction 上面的投影长度（及方向）
-                projection = distance.dot(direction) * direction
-                # 计算权重
-                weight = Vector(distance - projection).length
-                weight /= length * 1.4
-                if weight < 1.0:
-                    # 将权重限定在0-1之间
-                    weight = np.clip((1.0 - weight) * 1.3, 0.0, 1.0)
-                    # 如果顶点受手首影响（阈值0.97）
-                    if is_vertex_dedicated_by_bone(obj, vertex, wrist_bl, threshold=0.97):
-                        remove_vertex_weight(obj, vertex)
-                        obj.vertex_groups[thumb0_bl].add([vertex.index], weight, 'ADD')
-                        obj.vertex_groups[wrist_bl].add([vertex.index], 1 - weight, 'ADD')
-                    # 如果顶点受亲指1影响（阈值0.97）
-                    elif is_vertex_dedicated_by_bone(obj, vertex, thumb1_bl, threshold=0.97):
-                        remove_vertex_weight(obj, vertex)
-                        obj.vertex_groups[thumb0_bl].add([vertex.index], weight, 'ADD')
-                        obj.vertex_groups[thumb1_bl].add([vertex.index], 1 - weight, 'ADD')
-                    # 其他情况分配权重
-                    else:
-                        vg_count = 0
-                        vgs = [vg for vg in vertex.groups if
-                               obj.vertex_groups[vg.group].name in bl_jp_map.keys() and
-                               obj.vertex_groups[vg.group].name not in ('mmd_edge_scale', 'mmd_vertex_order')]
-                        for vg in vgs:  # vgs是独立副本，所以正序
-                            vg_count += 1
-                            if vg_count > 4:
-                                break
-                            group_name = obj.vertex_groups[vg.group].name
-                            if group_name == wrist_bl:
-                                bone_weight = vg.weight
-                                # 将顶点在手首上的权重转移到亲指0上面
-                                obj.vertex_groups[wrist_bl].remove([vertex.index])
-                                obj.vertex_groups[thumb0_bl].add([vertex.index], bone_weight, 'ADD')
-                                if bone_weight < weight:
-                                    obj.vertex_groups[thumb0_bl].remove([vertex.index])
-                                    obj.vertex_groups[thumb0_bl].add([vertex.index], weight, 'ADD')
-                                    weight_sum = 0
-                                    for other_vg in vgs:
-                                        if vg.group == other_vg.group:
-                                            continue
-                                        weight_sum = other_vg.weight
-                                    if weight_sum > 0:
-                                        for other_vg in vgs:
-                                            if vg.group == other_vg.group:
-                                                continue
-                                            other_vg_name = obj.vertex_groups[other_vg.group].name
-                                            other_group_weight = other_vg.weight
-                                            obj.vertex_groups[other_vg_name].remove([vertex.index])
-                                            obj.vertex_groups[other_vg_name].add([vertex.index], other_group_weight * (
-                                                    1 - weight) / weight_sum, 'ADD')
+            weight_matrix = get_weight_matrix(weight_matrices, obj)
+            # 顶点 与 亲指0和亲指1中点 的距离（向量）
+            distance = weight_matrix.coords - center
+            # distance 在 direction 上面的投影长度（及方向）
+            projection = (distance @ direction_array)[:, None] * direction_array
+            # 计算权重
+            weight = np.linalg.norm(distance - projection, axis=1)
+            weight /= length * 1.4
+            candidates = weight_matrix.get_contains_mask([wrist_bl, thumb1_bl]) & (weight < 1.0)
+            # 将权重限定在0-1之间
+            weight = np.clip((1.0 - weight) * 1.3, 0.0, 1.0)
+            # 如果顶点受手首影响（阈值0.97）
+            wrist_mask = candidates & weight_matrix.get_dedicated_mask(wrist_bl, threshold=0.97)
+            # 如果顶点受亲指1影响（阈值0.97）
+            thumb1_mask = candidates & ~wrist_mask & weight_matrix.get_dedicated_mask(thumb1_bl, threshold=0.97)
+            # 其他情况分配权重
+            other_rows = np.flatnonzero(candidates & ~wrist_mask & ~thumb1_mask)
+            for mask, bone_bl in ((wrist_mask, wrist_bl), (thumb1_mask, thumb1_bl)):
+                rows = np.flatnonzero(mask)
+                weight_matrix.remove_bone_weights(rows)
+                weight_matrix.add(thumb0_bl, rows, weight[rows])
+                weight_matrix.add(bone_bl, rows, 1 - weight[rows])
+
+            # 其他情况的顶点数量较少，逐个处理
+            is_bone = weight_matrix.get_group_flags(
+                lambda name: name in bl_jp_map.keys() and name not in NON_BONE_VG_NAMES)
+            wrist_index = obj.vertex_groups.find(wrist_bl)
+            for row in other_rows:
+                rows = [row]
+                vertex_weight = weight[row]
+                vgs = [(group, group_weight) for group, group_weight in
+                       zip(weight_matrix.groups[row].tolist(), weight_matrix.weights[row].tolist()) if is_bone[group]]
+                for group, bone_weight in vgs[:4]:
+                    if group != wrist_index:
+                        continue
+                    # 将顶点在手首上的权重转移到亲指0上面
+                    weight_matrix.remove(wrist_bl, rows)
+                    weight_matrix.add(thumb0_bl, rows, bone_weight)
+                    if bone_weight < vertex_weight:
+                        weight_matrix.remove(thumb0_bl, rows)
+                        weight_matrix.add(thumb0_bl, rows, vertex_weight)
+                        other_vgs = [(other_group, other_weight) for other_group, other_weight in vgs if
+                                     other_group != group]
+                        weight_sum = other_vgs[-1][1] if other_vgs else 0
+                        if weight_sum > 0:
+                            for other_group, other_group_weight in other_vgs:
+                                other_vg_name = obj.vertex_groups[other_group].name
+                                weight_matrix.remove(other_vg_name, rows)
+                                weight_matrix.add(other_vg_name, rows,
+                                                  other_group_weight * (1 - vertex_weight) / weight_sum)
         # 设置显示枠
         if base_props.enable_gen_frame_checked:
             add_item_before(armature, thumb0_bl, thumb1_bl)
@@ -840,15 +1032,7 @@ def set_local_axes(armature, bone_name, x, z):
     mmd_bone.local_axis_z = z
 
 
-def contains_vg(obj, vertex, names):
-    for group in vertex.groups:
-        group_name = obj.vertex_groups[group.group].name
-        if group_name in names:
-            return True
-    return False
-
-
-def create_arm_twist_bone(armature, props, results):
+def create_arm_twist_bone(armature, props, results, weight_matrices):
     base_props = props.base
     if not base_props.arm_twist_checked:
         return
@@ -858,11 +1042,11 @@ def create_arm_twist_bone(armature, props, results):
         ("左腕捩", "arm twist_L", "左腕", "左ひじ")
     ]
     for info in arm_twist_infos:
-        result = create_twist_bone(armature, props, info, True)
+        result = create_twist_bone(armature, props, info, True, weight_matrices)
         results.append(result)
 
 
-def create_wrist_twist_bone(armature, props, results):
+def create_wrist_twist_bone(armature, props, results, weight_matrices):
     base_props = props.base
     if not base_props.wrist_twist_checked:
         return
@@ -872,11 +1056,11 @@ def create_wrist_twist_bone(armature, props, results):
         ("左手捩", "wrist twist_L", "左ひじ", "左手首")
     ]
     for info in arm_twist_infos:
-        result = create_twist_bone(armature, props, info, False)
+        result = create_twist_bone(armature, props, info, False, weight_matrices)
         results.append(result)
 
 
-def create_twist_bone(armature, props, info, has_elbow_offset):
+def create_twist_bone(armature, props, info, has_elbow_offset, weight_matrices):
     # 基本名称信息
     twist_jp = info[0]
     twist_en = info[1]
@@ -915,10 +1099,10 @@ def create_twist_bone(armature, props, info, has_elbow_offset):
         v_count = 0.0
         loc_y_sum = 0.0
         for obj in objs:
-            for vertex in obj.data.vertices:
-                if is_vertex_dedicated_by_bone(obj, vertex, twist_parent_bl, threshold=0.6):
-                    loc_y_sum += vertex.co.y / scale
-                    v_count = v_count + 1.0
+            weight_matrix = get_weight_matrix(weight_matrices, obj)
+            mask = weight_matrix.get_dedicated_mask(twist_parent_bl, threshold=0.6)
+            loc_y_sum += float(np.sum(weight_matrix.coords[mask, 1] / scale))
+            v_count = v_count + float(np.count_nonzero(mask))
         if v_count > 0.0:
             offset = (loc_y_sum / v_count * scale - twist_child_eb_head.y) * 0.75
             twist_child_eb_head.y += offset
@@ -948,25 +1132,26 @@ def create_twist_bone(armature, props, info, has_elbow_offset):
     FnBone.update_auto_bone_roll(twist_eb)
     twist_child_eb.parent = twist_eb
 
+    # 物体 → 完全归亲骨（含阈值）所有的顶点
     twist_parent_eb_dedicated_vertices = {}
+    twist_eb_head = np.array(twist_eb.head)
+    axis = np.array(fixed_axis.xzy)
     twist_parent_eb_dot = Vector(twist_parent_eb.head - twist_eb.head).dot(fixed_axis.xzy) * 0.8
     twist_child_eb_dot = Vector(twist_child_eb_head - twist_eb.head).dot(fixed_axis.xzy) * 0.8
     for obj in objs:
-        for vertex in obj.data.vertices:
-            v_twist_eb_dot = Vector(Vector(vertex.co) - twist_eb.head).dot(fixed_axis.xzy)
-            if is_vertex_dedicated_by_bone(obj, vertex, twist_parent_bl, threshold=0.97):
-                twist_parent_eb_dot = min(twist_parent_eb_dot, v_twist_eb_dot)
-                twist_child_eb_dot = max(twist_child_eb_dot, v_twist_eb_dot)
-                twist_parent_eb_dedicated_vertices[vertex] = obj
-            elif v_twist_eb_dot > 0.0:
-                for group in vertex.groups:  # 删除一次即break，所以正序
-                    if obj.vertex_groups[group.group].name == twist_parent_bl:
-                        index = obj.vertex_groups.find(twist_bl)
-                        if index != -1:
-                            obj.vertex_groups[index].add([vertex.index], group.weight, 'ADD')
-                        # 移除操作放到最后
-                        obj.vertex_groups[group.group].remove([vertex.index])
-                        break
+        weight_matrix = get_weight_matrix(weight_matrices, obj)
+        v_twist_eb_dots = (weight_matrix.coords - twist_eb_head) @ axis
+        dedicated_mask = weight_matrix.get_dedicated_mask(twist_parent_bl, threshold=0.97)
+        if dedicated_mask.any():
+            twist_parent_eb_dot = min(twist_parent_eb_dot, float(v_twist_eb_dots[dedicated_mask].min()))
+            twist_child_eb_dot = max(twist_child_eb_dot, float(v_twist_eb_dots[dedicated_mask].max()))
+            twist_parent_eb_dedicated_vertices[obj] = np.flatnonzero(dedicated_mask)
+        rows = np.flatnonzero(~dedicated_mask & (v_twist_eb_dots > 0.0) &
+                              weight_matrix.get_contains_mask([twist_parent_bl]))
+        if obj.vertex_groups.find(twist_bl) != -1:
+            weight_matrix.add(twist_bl, rows, weight_matrix.get_weights(twist_parent_bl)[rows])
+        # 移除操作放到最后
+        weight_matrix.remove(twist_parent_bl, rows)
     part_twists = []
     part_twist_jp_list = []
     for i in range(3):
@@ -979,7 +1164,7 @@ def create_twist_bone(armature, props, info, has_elbow_offset):
 
         # 先决条件校验
         if part_twist_jp in jp_bl_map:
-            remove_bone(armature, objs, part_twist_bl)
+            remove_bone(armature, objs, part_twist_bl, weight_matrices)
 
         # 创建剩余捩骨
         part_twist_eb = create_bone_with_mmd_info(armature, part_twist_bl, part_twist_jp, "")
@@ -1000,28 +1185,19 @@ def create_twist_bone(armature, props, info, has_elbow_offset):
         mmd_bone.additional_transform_bone = twist_bl
         # 设置尖端骨骼
         pose_bones[part_twist_bl].mmd_bone.is_tip = True
-    for vertex, obj in twist_parent_eb_dedicated_vertices.items():
-        vertex_twist_bone_dot = Vector(Vector(vertex.co) - twist_eb.head).dot(fixed_axis.xzy)
-        delta = ((vertex_twist_bone_dot - twist_parent_eb_dot) / (twist_child_eb_dot - twist_parent_eb_dot)) * 4.0
-        weight = (int(100.0 * delta) % 100) / 100.0
-        remove_vertex_weight(obj, vertex)
-        if int(delta) == 0:
-            obj.vertex_groups[part_twists[0]].add([vertex.index], weight, 'ADD')
-            obj.vertex_groups[twist_parent_bl].add([vertex.index], 1.0 - weight, 'ADD')
-        elif int(delta) == 1:
-            obj.vertex_groups[part_twists[1]].add([vertex.index], weight, 'ADD')
-            obj.vertex_groups[part_twists[0]].add([vertex.index], 1.0 - weight, 'ADD')
-        elif int(delta) == 2:
-            obj.vertex_groups[part_twists[2]].add([vertex.index], weight, 'ADD')
-            obj.vertex_groups[part_twists[1]].add([vertex.index], 1.0 - weight, 'ADD')
-        elif int(delta) == 3:
-            obj.vertex_groups[twist_bl].add([vertex.index], weight, 'ADD')
-            obj.vertex_groups[part_twists[2]].add([vertex.index], 1.0 - weight, 'ADD')
-        elif int(delta) == 4:
-            obj.vertex_groups[twist_child_bl].add([vertex.index], weight, 'ADD')
-            obj.vertex_groups[twist_bl].add([vertex.index], 1.0 - weight, 'ADD')
-        else:
-            pass
+    # 按delta的整数部分，在相邻的两根骨骼之间分配权重
+    segment_bones = [twist_parent_bl] + part_twists + [twist_bl, twist_child_bl]
+    for obj, rows in twist_parent_eb_dedicated_vertices.items():
+        weight_matrix = get_weight_matrix(weight_matrices, obj)
+        vertex_twist_bone_dots = (weight_matrix.coords[rows] - twist_eb_head) @ axis
+        delta = ((vertex_twist_bone_dots - twist_parent_eb_dot) / (twist_child_eb_dot - twist_parent_eb_dot)) * 4.0
+        weight = (np.trunc(100.0 * delta).astype(np.int64) % 100) / 100.0
+        segments = np.trunc(delta).astype(np.int64)
+        weight_matrix.remove_bone_weights(rows)
+        for segment in range(len(segment_bones) - 1):
+            segment_mask = segments == segment
+            weight_matrix.add(segment_bones[segment + 1], rows[segment_mask], weight[segment_mask])
+            weight_matrix.add(segment_bones[segment], rows[segment_mask], 1.0 - weight[segment_mask])
     if base_props.enable_gen_frame_checked:
         add_item_after(armature, twist_bl, twist_parent_bl)
     return SsbResult(status=SsbStatus.SUCCESS, result=[twist_jp] + part_twist_jp_list)
@@ -1145,7 +1321,7 @@ def create_waist_bone(armature, props, results):
     results.append(SsbResult(status=SsbStatus.SUCCESS, result=[waist_jp] + waist_c_jp_list))
 
 
-def remove_bone(armature, objs, bone_name):
+def remove_bone(armature, objs, bone_name, weight_matrices):
     edit_bones = armature.data.edit_bones
     eb = edit_bones.get(bone_name)
     parent_eb = eb.parent
@@ -1165,12 +1341,11 @@ def remove_bone(armature, objs, bone_name):
             parent_vg = obj.vertex_groups.get(parent_eb.name)
         if not vg:
             continue
-        for vert in obj.data.vertices:
-            for group in vert.groups:
-                if group.group == vg.index:
-                    if parent_vg is not None:
-                        obj.vertex_groups[parent_vg.name].add([vert.index], group.weight, 'ADD')
-                    obj.vertex_groups[vg.name].add([vert.index], 0, 'REPLACE')
+        weight_matrix = get_weight_matrix(weight_matrices, obj)
+        rows = np.flatnonzero(weight_matrix.get_contains_mask([vg.name]))
+        if parent_vg is not None:
+            weight_matrix.add(parent_vg.name, rows, weight_matrix.get_weights(vg.name)[rows])
+        weight_matrix.add(vg.name, rows, 0, 'REPLACE')
 
     # 移除骨骼
     armature.data.edit_bones.remove(eb)
@@ -1323,7 +1498,7 @@ def create_bone_with_mmd_info(armature, name_bl, name_jp, name_en):
     return eb
 
 
-def create_upper_body2_bone(armature, props, results):
+def create_upper_body2_bone(armature, props, results, weight_matrices):
     base_props = props.base
     if not base_props.upper_body2_checked:
         return
@@ -1389,51 +1564,34 @@ def create_upper_body2_bone(armature, props, results):
         if parent_eb and parent_eb.name == spine_bl and KAFEI_TMP_BONE_NAME not in eb.name:
             eb.parent = upper_body2_eb
     # 权重转移
+    upper_body2_head = np.array(upper_body2_eb.head)
     for obj in objs:
-        upper_body2_vg_index = -1
-        upper_body_vg_index = -1
-        neck_vg_index = -1
-        for vg in obj.vertex_groups:
-            if vg.name == upper_body2_bl:
-                upper_body2_vg_index = vg.index
-            if vg.name == spine_bl:
-                upper_body_vg_index = vg.index
-            if vg.name == neck_bl:
-                neck_vg_index = vg.index
-
-        spine_vertices = []
-        # 遍历顶点
-        for vertex in obj.data.vertices:
-            if is_vertex_dedicated_by_bone(obj, vertex, spine_jp, threshold=0.97):
-                spine_vertices.append(vertex)
-            elif vertex.co.z > upper_body2_eb.head.z:
-                # 将不完全归上半身（含阈值）所有的顶点所对应的权重，转移到上半身2上面
-                for group in vertex.groups:  # 删除一次即break，所以正序
-                    if obj.vertex_groups[group.group].name == spine_jp:
-                        index = obj.vertex_groups.find(upper_body2_bl)
-                        if index != -1:
-                            obj.vertex_groups[index].add([vertex.index], group.weight, 'ADD')
-                        # 移除操作放到最后
-                        obj.vertex_groups[group.group].remove([vertex.index])
-                        break
+        weight_matrix = get_weight_matrix(weight_matrices, obj)
+        spine_mask = weight_matrix.get_dedicated_mask(spine_jp, threshold=0.97)
+        # 将不完全归上半身（含阈值）所有的顶点所对应的权重，转移到上半身2上面
+        rows = np.flatnonzero(~spine_mask & (weight_matrix.coords[:, 2] > upper_body2_eb.head.z) &
+                              weight_matrix.get_contains_mask([spine_jp]))
+        if obj.vertex_groups.find(upper_body2_bl) != -1:
+            weight_matrix.add(upper_body2_bl, rows, weight_matrix.get_weights(spine_jp)[rows])
+        # 移除操作放到最后
+        weight_matrix.remove(spine_jp, rows)
+
         # 将完全归上半身（含阈值）的顶点所对应的权重，转移到上半身2上面
-        for spine_vertex in spine_vertices:
-            remove_vertex_weight(obj, spine_vertex)
-
-            # 获取上半身顶点和上半身2的head的距离
-            distance = spine_vertex.co - upper_body2_eb.head
-            if distance.y > 0:
-                distance.z += distance.y * 0.5
-            # distance在上半身和首之间的比例
-            per = distance.z / (neck_eb.head.z - upper_body2_eb.head.z)
-            if per < -0.35:
-                obj.vertex_groups[upper_body_vg_index].add([spine_vertex.index], 1, 'ADD')
-            elif per > 0.35:
-                obj.vertex_groups[upper_body2_vg_index].add([spine_vertex.index], 1, 'ADD')
-            else:
-                weight = int(((per + 0.35) / 0.7) * 100.0) * 0.01
-                obj.vertex_groups[upper_body2_vg_index].add([spine_vertex.index], weight, 'ADD')
-                obj.vertex_groups[upper_body_vg_index].add([spine_vertex.index], 1 - weight, 'ADD')
+        rows = np.flatnonzero(spine_mask)
+        weight_matrix.remove_bone_weights(rows)
+        # 获取上半身顶点和上半身2的head的距离
+        distance = weight_matrix.coords[rows] - upper_body2_head
+        distance[:, 2] += np.where(distance[:, 1] > 0, distance[:, 1] * 0.5, 0.0)
+        # distance在上半身和首之间的比例
+        per = distance[:, 2] / (neck_eb.head.z - upper_body2_eb.head.z)
+        lower_mask = per < -0.35
+        upper_mask = per > 0.35
+        middle_mask = ~lower_mask & ~upper_mask
+        weight_matrix.add(spine_bl, rows[lower_mask], 1)
+        weight_matrix.add(upper_body2_bl, rows[upper_mask], 1)
+        weight = np.trunc(((per[middle_mask] + 0.35) / 0.7) * 100.0) * 0.01
+        weight_matrix.add(upper_body2_bl, rows[middle_mask], weight)
+        weight_matrix.add(spine_bl, rows[middle_mask], 1 - weight)
     # 如果刚体关联的是上半身，则改为上半身2
     pmx_root = find_pmx_root_with_child(armature)
     rigid_group = find_rigid_body_parent(pmx_root)
@@ -1447,29 +1605,6 @@ def create_upper_body2_bone(armature, props, results):
     results.append(SsbResult(status=SsbStatus.SUCCESS, result=[upper_body2_jp]))
 
 
-def is_vertex_dedicated_by_bone(obj, vertex, bone_name, threshold=1.0):
-    summation = 0.0
-    total = 0.0
-    count = 1
-    # 获取顶点权重
-    for group in vertex.groups:
-        # 在MMD中，一个顶点最多和4个骨骼相关联
-        if count > 4:
-            break
-        weight = group.weight
-        group_name = obj.vertex_groups[group.group].name
-        if group_name in bl_jp_map.keys():
-            count = count + 1
-        if group_name == bone_name:
-            summation += weight
-        if group_name not in ['mmd_edge_scale', 'mmd_vertex_order']:
-            total += weight
-    if total != 0:
-        return (summation / total) > threshold
-    else:
-        return 0
-
-
 def add_frame(armature, assignee, base, after=True):
     pmx_root = find_pmx_root_with_child(armature)
     mmd_root = pmx_root.mmd_root
@@ -1,4 +1,9 @@
+import hashlib
+import json
+
 import bmesh
+import numpy as np
+from bpy.app.handlers import persistent
 
 from ..utils import *
 
@@ -13,18 +18,31 @@ class TransferPresetOperator(bpy.types.Operator):
         main(self, context)
         return {'FINISHED'}  # 让Blender知道操作已成功完成
 
+    @staticmethod
+    def register():
+        bpy.app.handlers.depsgraph_update_post.append(invalidate_geometry_cache)
+        bpy.app.handlers.load_post.append(clear_geometry_cache)
+
+    @staticmethod
+    def unregister():
+        bpy.app.handlers.load_post.remove(clear_geometry_cache)
+        bpy.app.handlers.depsgraph_update_post.remove(invalidate_geometry_cache)
+
 
-def process_locator(operator, mapping, face_locator, auto_face_location, face_object, face_vg):
+def process_locator(operator, mapping, face_locator, auto_face_location, face_object, face_vg,
+                    coordinate_indexes=None):
     """处理定位头部的物体，将其由骨架转移到脸部顶点组上面（顶点父级）
        abc描边宽度一般为pmx描边宽度的12.5倍，但是描边宽度实现方式不同（如几何节点、实体化），这里暂不处理
     """
+    if coordinate_indexes is None:
+        coordinate_indexes = {}
     # 手动吸管输入
     locator = face_locator
     vg_name = locator.parent_bone
 
     face_obj = None
-    # 备选三点父级位置（source）
-    source_face_vert_location = {}
+    # 备选三点父级位置（source），由属于面部顶点组且权重为1的顶点构建的索引
+    source_face_index = None
     if auto_face_location is False:
         for source, target in mapping.items():
             if source.name == face_object.name:
@@ -33,31 +51,9 @@ def process_locator(operator, mapping, face_locator, auto_face_location, face_ob
         if face_obj is None:
             raise Exception(f"在pmx模型中找不到名称为{face_object.name}的物体。")
 
-        group_names = {v.index: v.name for v in face_object.vertex_groups}
-        bm = bmesh.new()
-        bm.from_mesh(face_object.data)
-        # 获取顶点的变形权重层
-        dvert_lay = bm.verts.layers.deform.active
-        count = 0
-        for vert in bm.verts:
-            dvert = vert[dvert_lay]
-            for group_index, weight in dvert.items():
-                group_name = group_names[group_index]
-                if group_name == face_vg and weight == 1.0:
-                    count += 1
-                    # 备选三点父级位置
-                    for i in range(-1, 2):
-                        for j in range(-1, 2):
-                            for k in range(-1, 2):
-                                key = (
-                                    truncate(vert.co.x) + i * 1,
-                                    truncate(vert.co.y) + j * 1,
-                                    truncate(vert.co.z) + k * 1)
-                                if key not in source_face_vert_location:
-                                    source_face_vert_location[key] = 1
-                                else:
-                                    source_face_vert_location[key] = source_face_vert_location[key] + 1
-        if count < 3:
+        source_face_index, face_vert_indexes = get_coordinate_index(coordinate_indexes, face_object).get_group_index(
+            face_vg, 1.0)
+        if len(face_vert_indexes) < 3:
             raise Exception(f"在{face_object.name}中未找到属于顶点组{face_vg}且权重为1的至少三个非重合顶点。")
 
     else:
@@ -74,47 +70,16 @@ def process_locator(operator, mapping, face_locator, auto_face_location, face_ob
         # 拥有局部z值最小的顶点的源物体所对应的目标物体
         face_min_z_obj = None
         for source, target in mapping.items():
-            current_min_z = float('inf')
-            current_min_z_obj = None
-            # 符合条件的顶点数量
-            count = 0
-            # 符合条件的顶点位置 -> 出现次数，次数大于1表明存在重合点
-            vert_location = {}
-            # 顶点组索引 -> 顶点组名称
-            group_names = {v.index: v.name for v in source.vertex_groups}
-
-            bm = bmesh.new()
-            bm.from_mesh(source.data)
-            # 获取顶点的变形权重层
-            dvert_lay = bm.verts.layers.deform.active
-            for vert in bm.verts:
-                dvert = vert[dvert_lay]
-                for group_index, weight in dvert.items():
-                    group_name = group_names[group_index]
-                    if group_name == vg_name and weight == 1.0:
-                        count += 1
-                        if vert.co.z < current_min_z:
-                            current_min_z = vert.co.z
-                            current_min_z_obj = target
-                        # 备选三点父级位置
-                        for i in range(-1, 2):
-                            for j in range(-1, 2):
-                                for k in range(-1, 2):
-                                    key = (
-                                        truncate(vert.co.x) + i * 1,
-                                        truncate(vert.co.y) + j * 1,
-                                        truncate(vert.co.z) + k * 1)
-                                    if key not in vert_location:
-                                        vert_location[key] = 1
-                                    else:
-                                        vert_location[key] = vert_location[key] + 1
-            if count >= 3:  # 3点父级
-                if current_min_z < face_min_z:
-                    face_flag = True
-                    source_face_vert_location = vert_location
-                    face_min_z = current_min_z
-                    face_min_z_obj = current_min_z_obj
-            bm.free()
+            group_index, vert_indexes = get_coordinate_index(coordinate_indexes, source).get_group_index(vg_name, 1.0)
+            # 符合条件的顶点数量不少于3（3点父级）
+            if len(vert_indexes) < 3:
+                continue
+            current_min_z = get_vertex_coords(source)[vert_indexes, 2].min()
+            if current_min_z < face_min_z:
+                face_flag = True
+                source_face_index = group_index
+                face_min_z = current_min_z
+                face_min_z_obj = target
 
         if face_flag:
             face_obj = face_min_z_obj
@@ -129,19 +94,11 @@ def process_locator(operator, mapping, face_locator, auto_face_location, face_ob
 
     bm = bmesh.new()
     bm.from_mesh(face_obj.data)
+    bm.verts.ensure_lookup_table()
     # 根据备选三点父级位置（source）获取备选三点父级位置（target）
-    # 这个过程会去除重合点对最终结果的影响（如焊接修改器）
-    target_face_vert_location = []
-    for vert in bm.verts:
-        key = (
-            truncate(vert.co.x * 0.08, ),
-            truncate(vert.co.y * 0.08),
-            truncate(vert.co.z * 0.08))
-        if key in source_face_vert_location:
-            v_count = source_face_vert_location[key]
-            if v_count > 1:
-                continue
-            target_face_vert_location.append(vert)
+    # 这个过程会去除重合点对最终结果的影响（如焊接修改器），即误差范围内仅存在一个源顶点的目标顶点才会作为备选
+    source_counts = source_face_index.count(quantize_coords(get_vertex_coords(face_obj), get_key_scale("ABC")))
+    target_face_vert_location = [bm.verts[index] for index in np.flatnonzero(source_counts == 1).tolist()]
 
     # 面部松散块
     islands = [island for island in get_islands(bm, verts=target_face_vert_location)["islands"]]
@@ -294,25 +251,28 @@ def get_mesh_stats(obj):
     return vert_count, edge_count, face_count, loop_count
 
 
-def matching(sources, targets, direction, tolerance=0):
+def matching(sources, targets, direction, tolerance=0, coordinate_indexes=None):
     """尽可能的对物体配对
-        4w面  循环80w次  耗时0.7秒
-        13w面 循环230w次 耗时2.3秒 20w面应该是常用模型的较大值了
-        50w面 循环800w次 耗时10秒
+        每个物体的顶点坐标仅通过foreach_get读取一次，每个源物体仅构建一次有序索引，之后每个目标物体均通过向量化查询进行校验
+        （旧实现在每一组source/target中都要重新构建27邻域字典，50w面约耗时10秒）
     """
     start_time = time.time()
+    if coordinate_indexes is None:
+        coordinate_indexes = {}
     source_targets_map = {}
 
     target_flag_map = {}
     for target in targets:
         target_flag_map[target] = False
 
-    set_source_targets_map(direction, sources, targets, source_targets_map, target_flag_map)
+    set_source_targets_map(direction, sources, targets, source_targets_map, target_flag_map,
+                           coordinate_indexes=coordinate_indexes)
 
     for target, flag in target_flag_map.items():
         if flag:
             continue
-        set_source_targets_map(direction, sources, [target], source_targets_map, target_flag_map, tolerance=tolerance)
+        set_source_targets_map(direction, sources, [target], source_targets_map, target_flag_map, tolerance=tolerance,
+                               coordinate_indexes=coordinate_indexes)
 
     # 遍历source_target_maps，如果key存在多个target（如发+、衣+等内容和发、衣校验的结果是一模一样的），则对这些内容进行二次校验
     # 如果key和value的名称相同，才进行配对，放入source_target_map（PMX2PMX的情况下）
@@ -338,7 +298,11 @@ def matching(sources, targets, direction, tolerance=0):
     return source_target_map
 
 
-def set_source_targets_map(direction, sources, targets, source_targets_map, target_flag_map, tolerance=0):
+def set_source_targets_map(direction, sources, targets, source_targets_map, target_flag_map, tolerance=0,
+                           coordinate_indexes=None):
+    if coordinate_indexes is None:
+        coordinate_indexes = {}
+    target_scale = get_key_scale(direction[-3:])
     for source in sources:
         for target in targets:
 
@@ -352,25 +316,16 @@ def set_source_targets_map(direction, sources, targets, source_targets_map, targ
                 if abs(source_v_count - target_v_count) / max(abs(source_v_count), abs(target_v_count)) > tolerance:
                     continue
 
-            vertices = {}
-            for vert in source.data.vertices:
-                for i in range(-1, 2):
-                    for j in range(-1, 2):
-                        for k in range(-1, 2):
-                            key = (
-                                truncate(vert.co.x) + i * 1,
-                                truncate(vert.co.y) + j * 1,
-                                truncate(vert.co.z) + k * 1)
-                            if key not in vertices:
-                                vertices[key] = 1
-                            else:
-                                vertices[key] = vertices[key] + 1
-
-            match_count = 0
-            for vert in target.data.vertices:
-                key = gen_key(vert, direction[-3:])
-                if key in vertices:
-                    match_count += 1
+            # 先比较指纹，指纹不兼容的直接排除，指纹完全一致的直接配对，都无法判断时再进行逐顶点的查询
+            source_fingerprint = get_fingerprint(source, 1.0)
+            target_fingerprint = get_fingerprint(target, target_scale)
+            if not source_fingerprint.is_compatible(target_fingerprint, tolerance):
+                continue
+            if source_fingerprint.is_identical(target_fingerprint):
+                match_count = target_v_count
+            else:
+                source_index = get_coordinate_index(coordinate_indexes, source)
+                match_count = int(np.count_nonzero(source_index.match_vertices(get_vertex_keys(target, target_scale))))
             if (tolerance == 0 and match_count / len(target.data.vertices) == 1) or (
                     tolerance != 0 and match_count / len(target.data.vertices) >= (1 - tolerance)):
                 target_flag_map[target] = True
@@ -378,6 +333,151 @@ def set_source_targets_map(direction, sources, targets, source_targets_map, targ
                 source_targets_map.setdefault(source, []).append(target)
 
 
+# 网格session_uid -> 该网格的几何缓存（统计信息、量化坐标、指纹、坐标索引等），网格被编辑后由depsgraph回调清除
+geometry_cache = {}
+
+
+def get_cached_geometry(obj, name, func):
+    """获取物体网格的几何缓存项，不存在则通过func计算。网格统计信息发生变化时，该网格的缓存整体失效"""
+    mesh = obj.data
+    stats = get_mesh_stats(obj)
+    entry = geometry_cache.get(mesh.session_uid)
+    if entry is None or entry['STATS'] != stats:
+        entry = {'STATS': stats}
+        geometry_cache[mesh.session_uid] = entry
+    if name not in entry:
+        entry[name] = func()
+    return entry[name]
+
+
+def get_vertex_keys(obj, scale=1.0):
+    """获取物体全部顶点的量化坐标（缓存）"""
+    return get_cached_geometry(obj, ('KEYS', scale), lambda: quantize_coords(get_vertex_coords(obj), scale))
+
+
+def get_face_keys(obj, scale=1.0):
+    """获取物体全部面质心的量化坐标（缓存）"""
+    return get_cached_geometry(obj, ('FACE_KEYS', scale), lambda: quantize_coords(get_face_center_coords(obj), scale))
+
+
+def get_fingerprint(obj, scale=1.0):
+    """获取物体网格的几何指纹（缓存）"""
+    return get_cached_geometry(obj, ('FINGERPRINT', scale),
+                               lambda: MeshFingerprint(get_mesh_stats(obj), get_vertex_keys(obj, scale)))
+
+
+@persistent
+def invalidate_geometry_cache(scene, depsgraph):
+    """网格几何数据被修改后，清除其几何缓存"""
+    if not geometry_cache:
+        return
+    for update in depsgraph.updates:
+        if not update.is_updated_geometry:
+            continue
+        id_data = update.id.original
+        if isinstance(id_data, bpy.types.Mesh):
+            geometry_cache.pop(id_data.session_uid, None)
+
+
+@persistent
+def clear_geometry_cache(*args):
+    """打开新文件时清空几何缓存"""
+    geometry_cache.clear()
+
+
+class CoordinateIndex:
+    """源物体的坐标索引，在一次main()执行中被配对、多材质、顶点组权重、面部定位器等各个阶段共用
+
+    顶点、面质心的索引保存在几何缓存中（网格编辑后失效），顶点权重及顶点组索引仅在本次执行中缓存
+    """
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.weights = None
+        # (顶点组名称, 权重) -> (索引, 顶点索引数组)
+        self.group_indexes = {}
+
+    @property
+    def vertex_index(self):
+        return get_cached_geometry(self.obj, 'INDEX', lambda: QuantizedKeyIndex(get_vertex_keys(self.obj)))
+
+    @property
+    def face_index(self):
+        return get_cached_geometry(self.obj, 'FACE_INDEX', lambda: QuantizedKeyIndex(get_face_keys(self.obj)))
+
+    def match_vertices(self, keys):
+        """各个key的误差范围内是否存在源顶点"""
+        return self.vertex_index.contains(keys)
+
+    def find_vertex_pairs(self, keys):
+        """返回所有（key索引, 源顶点索引）配对"""
+        return self.vertex_index.find_pairs(keys)
+
+    def find_faces(self, keys):
+        """返回各个key的误差范围内索引最大的源面索引，不存在则为-1"""
+        return self.face_index.find_last(keys)
+
+    def get_vertex_weights(self):
+        """源物体的顶点权重信息，见get_vertex_weights"""
+        if self.weights is None:
+            self.weights = get_vertex_weights(self.obj)
+        return self.weights
+
+    def get_group_index(self, group_name, weight=None):
+        """由属于指定顶点组（且权重为指定值）的顶点构建的索引，返回（索引, 顶点索引数组）"""
+        key = (group_name, weight)
+        if key not in self.group_indexes:
+            vert_indexes, group_indexes, weights = self.get_vertex_weights()
+            mask = group_indexes == self.obj.vertex_groups.find(group_name)
+            if weight is not None:
+                mask &= weights == weight
+            members = vert_indexes[mask]
+            self.group_indexes[key] = (QuantizedKeyIndex(get_vertex_keys(self.obj)[members]), members)
+        return self.group_indexes[key]
+
+
+def get_coordinate_index(coordinate_indexes, obj):
+    """获取物体的坐标索引，不存在则新建"""
+    if obj not in coordinate_indexes:
+        coordinate_indexes[obj] = CoordinateIndex(obj)
+    return coordinate_indexes[obj]
+
+
+class MeshFingerprint:
+    """网格的多级几何指纹：统计信息、量化坐标包围盒、量化质心、排序后量化坐标的哈希值"""
+
+    def __init__(self, stats, keys):
+        self.stats = stats
+        self.empty = len(keys) == 0
+        if self.empty:
+            return
+        self.bbox_min = keys.min(axis=0)
+        self.bbox_max = keys.max(axis=0)
+        self.centroid = np.floor(keys.mean(axis=0)).astype(np.int64)
+        sorted_keys = np.ascontiguousarray(keys[np.lexsort(keys.T[::-1])])
+        self.position_hash = hashlib.blake2b(sorted_keys.tobytes(), digest_size=16).digest()
+
+    def is_compatible(self, target, tolerance=0):
+        """target能否与self配对。仅排除必然无法配对的情况"""
+        if self.empty or target.empty:
+            return True
+        if tolerance == 0:
+            # 每个目标顶点都要落在某个源顶点的±1范围内，所以目标的包围盒不会超出源包围盒±1的范围
+            if np.any(target.bbox_min < self.bbox_min - 1) or np.any(target.bbox_max > self.bbox_max + 1):
+                return False
+        return True
+
+    def is_identical(self, target):
+        """量化坐标完全一致（顶点顺序可不同）"""
+        if self.empty or target.empty:
+            return False
+        return (self.stats[0] == target.stats[0]
+                and np.array_equal(self.bbox_min, target.bbox_min)
+                and np.array_equal(self.bbox_max, target.bbox_max)
+                and np.array_equal(self.centroid, target.centroid)
+                and self.position_hash == target.position_hash)
+
+
 def gen_key(vert, object_type):
     if object_type == "PMX":
         return (
@@ -391,6 +491,161 @@ def gen_key(vert, object_type):
             truncate(vert.co.z * 0.08))
 
 
+def get_key_scale(object_type):
+    """计算坐标key时，坐标值需要乘上的缩放比例（abc坐标为pmx坐标的12.5倍）"""
+    return 0.08 if object_type == "ABC" else 1.0
+
+
+def get_vertex_coords(obj):
+    """通过foreach_get一次性读取网格全部顶点的局部坐标，返回(n, 3)的数组"""
+    mesh = obj.data
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+    # 转为双精度后再计算，与truncate(vert.co.x)的计算结果保持一致
+    return coords.reshape(-1, 3).astype(np.float64)
+
+
+def get_face_center_coords(obj):
+    """通过foreach_get一次性读取网格全部面的质心坐标（局部），返回(n, 3)的数组"""
+    mesh = obj.data
+    coords = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", coords)
+    return coords.reshape(-1, 3).astype(np.float64)
+
+
+def quantize_coords(coords, scale=1.0):
+    """truncate的批量版本，对坐标值（×缩放比例）÷精度后的结果进行截断，返回(n, 3)的整数数组"""
+    if scale != 1.0:
+        coords = coords * scale
+    return np.floor(coords / PRECISION).astype(np.int64)
+
+
+class QuantizedKeyIndex:
+    """由源物体量化坐标构建的有序索引，查询时每个轴允许±1的误差，等价于之前逐顶点构建的27邻域字典
+
+    三个轴的量化坐标以源坐标最小值为原点压缩到一个int64中，排序去重后通过searchsorted进行查询，
+    源物体构建一次即可被任意数量的目标物体复用。坐标跨度过大无法压缩时退化为字典查询。
+    """
+    # 27邻域偏移
+    NEIGHBOR_OFFSETS = np.array([(i, j, k) for i in range(-1, 2) for j in range(-1, 2) for k in range(-1, 2)],
+                                dtype=np.int64)
+    # 单次查询的最大数量，限制27邻域展开后的内存占用
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, keys):
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+        self.source_count = len(keys)
+        self.lookup = None
+        if self.source_count == 0:
+            self.keys = np.empty(0, dtype=np.int64)
+            return
+
+        # 原点与每个轴的长度各预留2，保证合法查询的邻域不会越过压缩后的位边界
+        self.origin = keys.min(axis=0) - 2
+        self.extent = keys.max(axis=0) - self.origin + 3
+        self.bits = [int(extent - 1).bit_length() for extent in self.extent]
+        if sum(self.bits) > 62:
+            # key -> 源元素索引列表（升序）
+            self.lookup = {}
+            for index, key in enumerate(map(tuple, keys.tolist())):
+                self.lookup.setdefault(key, []).append(index)
+            return
+
+        self.shifts = np.array([self.bits[1] + self.bits[2], self.bits[2], 0], dtype=np.int64)
+        self.keys, inverse, self.counts = np.unique(self.pack(keys - self.origin), return_inverse=True,
+                                                    return_counts=True)
+        # 按key分组后的源元素索引，每组内升序
+        self.order = np.argsort(inverse.reshape(-1), kind='stable')
+        self.starts = np.cumsum(self.counts) - self.counts
+        # 相同key的源元素中，取索引最大的一个（与字典按顺序覆盖写入的结果一致）
+        self.last = self.order[self.starts + self.counts - 1]
+        self.neighbor_offsets = self.pack(self.NEIGHBOR_OFFSETS)
+
+    def pack(self, relative_keys):
+        return (relative_keys << self.shifts).sum(axis=-1)
+
+    def contains(self, keys):
+        """各个key的27邻域内是否存在源元素"""
+        return self.find_last(keys) >= 0
+
+    def find_last(self, keys):
+        """返回各个key的27邻域内索引最大的源元素索引，不存在则为-1"""
+        return self.query(keys, lambda hit, pos: np.where(hit, self.last[pos], -1).max(axis=0),
+                          lambda found: max((indexes[-1] for indexes in found), default=-1), -1)
+
+    def count(self, keys):
+        """返回各个key的27邻域内源元素的数量"""
+        return self.query(keys, lambda hit, pos: np.where(hit, self.counts[pos], 0).sum(axis=0),
+                          lambda found: sum(len(indexes) for indexes in found), 0)
+
+    def find_pairs(self, keys):
+        """返回所有（key索引, 源元素索引）配对，即各个key的27邻域内的全部源元素"""
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+        query_indexes = []
+        source_indexes = []
+        if self.source_count == 0 or len(keys) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        if self.lookup is not None:
+            for index, key in enumerate(map(tuple, keys.tolist())):
+                for neighbor in self.iter_neighbors(key):
+                    for source_index in self.lookup.get(neighbor, ()):
+                        query_indexes.append(index)
+                        source_indexes.append(source_index)
+            return np.array(query_indexes, dtype=np.int64), np.array(source_indexes, dtype=np.int64)
+
+        for chunk_indexes, hit, pos in self.iter_probes(keys):
+            probe_rows, probe_cols = np.nonzero(hit)
+            hit_pos = pos[probe_rows, probe_cols]
+            query_indexes.append(np.repeat(chunk_indexes[probe_cols], self.counts[hit_pos]))
+            source_indexes.append(self.order[concat_ranges(self.starts[hit_pos], self.counts[hit_pos])])
+        if not query_indexes:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(query_indexes), np.concatenate(source_indexes)
+
+    def query(self, keys, reduce_func, fallback_reduce_func, default):
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, 3)
+        result = np.full(len(keys), default, dtype=np.int64)
+        if self.source_count == 0 or len(keys) == 0:
+            return result
+
+        if self.lookup is not None:
+            for index, key in enumerate(map(tuple, keys.tolist())):
+                found = [self.lookup[neighbor] for neighbor in self.iter_neighbors(key) if neighbor in self.lookup]
+                result[index] = fallback_reduce_func(found)
+            return result
+
+        for chunk_indexes, hit, pos in self.iter_probes(keys):
+            result[chunk_indexes] = reduce_func(hit, pos)
+        return result
+
+    def iter_neighbors(self, key):
+        for i, j, k in self.NEIGHBOR_OFFSETS.tolist():
+            yield key[0] + i, key[1] + j, key[2] + k
+
+    def iter_probes(self, keys):
+        """分块查询各个key的27邻域，返回（key索引, 是否命中, 命中位置），后两者的形状为(27, 块大小)"""
+        # 超出源坐标范围的key不可能匹配，直接排除
+        relative_keys = keys - self.origin
+        valid = np.all((relative_keys >= 1) & (relative_keys <= self.extent - 2), axis=1)
+        valid_indexes = np.flatnonzero(valid)
+        packed = self.pack(relative_keys[valid_indexes])
+        for start in range(0, len(packed), self.CHUNK_SIZE):
+            probes = packed[start:start + self.CHUNK_SIZE][None, :] + self.neighbor_offsets[:, None]
+            pos = np.minimum(np.searchsorted(self.keys, probes), len(self.keys) - 1)
+            yield valid_indexes[start:start + self.CHUNK_SIZE], self.keys[pos] == probes, pos
+
+
+def concat_ranges(starts, counts):
+    """拼接多个连续区间[start, start + count)，返回一维索引数组"""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.cumsum(counts)
+    return np.arange(total, dtype=np.int64) - np.repeat(ends - counts, counts) + np.repeat(starts, counts)
+
+
 def link_normal(mapping, direction):
     """
     传递源物体的自定义拆边法向信息到目标物体身上。
@@ -521,24 +776,51 @@ def reset_cache_param(abc_filepath, selected_only, operator):
     # 目标角色 -> 角色信息 map
     target_character_map, obj_info_map, target_obj_flag_map, non_compliant_list = get_character_map(target_objs)
 
-    # 导入abc文件
-    source_objs = import_abc_file(abc_filepath)
-    source_character_map, _, _, _ = get_character_map(source_objs)
+    # 不导入abc文件，仅读取其中各个网格的路径与顶点数。读取失败时再退回到导入abc文件的方式
+    source_objs = []
+    try:
+        source_character_map = get_abc_character_map(abc_filepath)
+    except Exception as e:
+        print(f"缓存文件读取失败，改为导入abc文件：{e}")
+        source_character_map = {}
+    if not source_character_map:
+        source_objs = import_abc_file(abc_filepath)
+        source_character_map, _, _, _ = get_character_map(source_objs)
+
+    # 角色 -> （网格number -> 网格信息列表）
+    source_indexes = {character: index_infos(infos) for character, infos in source_character_map.items()}
+    target_indexes = {character: index_infos(infos) for character, infos in target_character_map.items()}
+    # 顶点数签名 -> 目标角色列表，网格完全一致的角色可直接通过签名配对
+    target_signature_map = {}
+    for target_character, target_index in target_indexes.items():
+        target_signature_map.setdefault(get_info_signature(target_index), []).append(target_character)
 
     source_target_map = {}
+    # 单个目标角色只能被使用一次，如果有多个相同源角色，则应复制多份目标角色
+    used_target_characters = set()
+    # 未配对成功的源角色及其与最接近的目标角色之间的差异
+    mismatch_reports = []
     # 源角色与目标角色的网格number，网格数一致即可，网格number可（因未选中）缺省，可（因网格复制）冗余
-    for source_character, source_infos in source_character_map.items():
-        for target_character, target_infos in target_character_map.items():
-            # 单个目标角色只能被使用一次，如果有多个相同源角色，则应复制多份目标角色
-            if target_character in source_target_map.values():
-                continue
+    for source_character, source_index in source_indexes.items():
+        target_character = next((character for character in
+                                 target_signature_map.get(get_info_signature(source_index), [])
+                                 if character not in used_target_characters), None)
+        if target_character is None:
+            target_character = next((character for character, target_index in target_indexes.items()
+                                     if character not in used_target_characters
+                                     and not get_mismatched_numbers(source_index, target_index)), None)
+        if target_character is None:
+            mismatch_reports.append(get_mismatch_report(source_character, source_index, target_indexes))
+            continue
 
-            if match_info(source_infos, target_infos):
-                # 记录映射关系
-                source_target_map[source_character] = target_character
-                # 关联缓存
-                link_cache(source_infos, target_infos, target_obj_flag_map)
-                break
+        # 记录映射关系
+        source_target_map[source_character] = target_character
+        used_target_characters.add(target_character)
+        # 关联缓存
+        link_cache(source_character_map[source_character], target_character_map[target_character],
+                   target_obj_flag_map)
+    if mismatch_reports:
+        print('\n'.join(mismatch_reports))
 
     # 对未配对但和已配对对象拥有相同父级的对象进行优化
     # 如果执行后仍有未匹配的物体，那么可能是因为
@@ -581,46 +863,83 @@ def reset_cache_param(abc_filepath, selected_only, operator):
         false_keys = [key for key, value in target_obj_flag_map.items() if not value]
         if false_keys:
             msg = msg + f'以下物体配对失败，请检查网格顶点数或缓存文件名称：\n{false_keys}'
+        if mismatch_reports:
+            msg = msg + '\n以下缓存角色未能配对：\n' + '\n'.join(mismatch_reports)
         operator.report({'WARNING'}, msg)
         operator.report({'WARNING'}, f'存在未成功配对对象，点击查看报告↑↑↑')
 
 
 def match_info(source_infos, target_infos):
     """在number一致的情况下校验顶点数是否一致，以判断是否为同一角色"""
-    for source_info in source_infos:
-        for target_info in target_infos:
-            source_number = source_info[5]  # 网格顺序number
-            source_v_number = source_info[1]  # 顶点数
+    return not get_mismatched_numbers(index_infos(source_infos), index_infos(target_infos))
 
-            target_number = target_info[5]
-            target_v_number = target_info[1]
 
-            if source_number == target_number:
-                if source_v_number != target_v_number:
-                    return False
-    return True
+def index_infos(infos):
+    """网格顺序number -> 网格信息列表"""
+    index = {}
+    for info in infos:
+        index.setdefault(info[5], []).append(info)
+    return index
+
+
+def get_info_signature(index):
+    """由各个网格number及其顶点数组成的签名"""
+    return tuple(sorted((number, tuple(sorted({info[1] for info in infos}))) for number, infos in index.items()))
+
+
+def get_mismatched_numbers(source_index, target_index):
+    """number一致但顶点数不一致的网格number列表"""
+    mismatched_numbers = []
+    for number, source_infos in source_index.items():
+        target_infos = target_index.get(number)
+        if not target_infos:
+            continue
+        if len({info[1] for info in source_infos} | {info[1] for info in target_infos}) > 1:
+            mismatched_numbers.append(number)
+    return mismatched_numbers
+
+
+def get_mismatch_report(source_character, source_index, target_indexes):
+    """描述源角色与最接近（顶点数不一致的网格最少）的目标角色之间的差异"""
+    if not target_indexes:
+        return f'{source_character}：场景中没有可配对的角色'
+    target_character, mismatched_numbers = min(
+        ((character, get_mismatched_numbers(source_index, target_index))
+         for character, target_index in target_indexes.items()), key=lambda item: len(item[1]))
+    if not mismatched_numbers:
+        return f'{source_character}：最接近的角色{target_character}已被其它缓存角色使用'
+    details = '，'.join(
+        f'网格{number}顶点数{source_index[number][0][1]}≠{target_indexes[target_character][number][0][1]}'
+        for number in mismatched_numbers)
+    return f'{source_character}：最接近的角色{target_character}，{details}'
 
 
 def link_cache(source_infos, target_infos, target_obj_flag_map):
-    for source_info in source_infos:
-        for target_info in target_infos:
-            source_number = source_info[5]  # 网格顺序number
-            target_number = target_info[5]
+    source_index = index_infos(source_infos)
+    for target_info in target_infos:
+        # 网格顺序number一致的源网格中，以最后一个为准
+        source_candidates = source_index.get(target_info[5])
+        if not source_candidates:
+            continue
+        filepath, object_path = get_cache_path(source_candidates[-1])
 
-            if source_number != target_number:
-                continue
+        target_obj = bpy.data.objects.get(target_info[0])
 
-            source_obj = bpy.data.objects.get(source_info[0])
-            target_obj = bpy.data.objects.get(target_info[0])
+        target_obj_flag_map[target_info[0]] = True
 
-            target_obj_flag_map[target_info[0]] = True
+        target_mod = target_obj.modifiers.get(target_info[2])
 
-            source_mod = source_obj.modifiers.get(source_info[2])
-            target_mod = target_obj.modifiers.get(target_info[2])
+        # 仅修改cache_file.filepath，不修改cache_file，这样替换单一角色动作的时候，其它角色不会受到影响
+        target_mod.cache_file.filepath = filepath
+        target_mod.object_path = object_path
 
-            # 仅修改cache_file.filepath，不修改cache_file，这样替换单一角色动作的时候，其它角色不会受到影响
-            target_mod.cache_file.filepath = source_mod.cache_file.filepath
-            target_mod.object_path = source_mod.object_path
+
+def get_cache_path(info):
+    """获取网格信息对应的缓存文件路径与物体路径。场景中的网格读取修改器的当前值（共用的缓存文件可能已被修改）"""
+    if info[2] is None:
+        return info[6], info[7]
+    mod = bpy.data.objects.get(info[0]).modifiers.get(info[2])
+    return mod.cache_file.filepath, mod.object_path
 
 
 def get_character_map(objs):
@@ -643,28 +962,77 @@ def get_character_map(objs):
                 non_compliant_list.append(obj.name)
                 continue
 
-            cache_file_name = mod.cache_file.name
-            object_path = mod.object_path
-
-            pattern = r'/xform_(\d+)_material_(\d+)/mesh_(\d+)_material_(\d+)'
-            match = re.match(pattern, object_path)
-            if not match:
+            info = add_character_info(character_map, obj.name, len(obj.data.vertices), mod.name, cache_file.name,
+                                      cache_file.filepath, mod.object_path)
+            if info is None:
                 non_compliant_list.append(obj.name)
                 continue
-            numbers = match.groups()
-            character_number = numbers[0]  # 代表角色类别的部分
-            obj_number = numbers[1]  # 代表网格对象顺序的部分
 
             obj_flag_map[obj.name] = False
-
-            info = [obj.name, len(obj.data.vertices), mod.name, cache_file_name, character_number, obj_number]
             obj_info_map[obj.name] = info
-
-            key = f'CACHE_{cache_file_name}_NUMBER_{character_number}'  # 根据缓存名称和物体路径来决定角色
-            character_map.setdefault(key, []).append(info)
     return character_map, obj_info_map, obj_flag_map, non_compliant_list
 
 
+def add_character_info(character_map, name, vert_count, mod_name, cache_file_name, filepath, object_path):
+    """根据物体路径构建网格信息并按角色分组，路径不合规时返回None
+    网格信息：[名称, 顶点数, 修改器名称, 缓存名称, 角色number, 网格顺序number, 缓存文件路径, 物体路径]
+    """
+    match = ABC_OBJECT_PATH_PATTERN.match(object_path)
+    if not match:
+        return None
+    numbers = match.groups()
+    character_number = numbers[0]  # 代表角色类别的部分
+    obj_number = numbers[1]  # 代表网格对象顺序的部分
+
+    info = [name, vert_count, mod_name, cache_file_name, character_number, obj_number, filepath, object_path]
+    key = f'CACHE_{cache_file_name}_NUMBER_{character_number}'  # 根据缓存名称和物体路径来决定角色
+    character_map.setdefault(key, []).append(info)
+    return info
+
+
+def get_abc_character_map(filepath):
+    """不导入abc文件，获取其中各个网格的角色信息
+    通过缓存文件获取物体路径，再通过一个挂载网格序列缓存修改器的临时网格物体，逐个读取网格的顶点数，读取完成后删除临时数据
+    """
+    character_map = {}
+    # cachefile.open会新增一个缓存文件，通过前后对比找到它
+    old_names = {cache_file.name for cache_file in bpy.data.cache_files}
+    bpy.ops.cachefile.open(filepath=filepath)
+    cache_file = next((cache_file for cache_file in bpy.data.cache_files if cache_file.name not in old_names), None)
+    if cache_file is None:
+        return character_map
+
+    start_time = time.time()
+    probe_mesh = None
+    probe_obj = None
+    try:
+        object_paths = [object_path.path for object_path in cache_file.object_paths
+                        if ABC_OBJECT_PATH_PATTERN.match(object_path.path)]
+        if not object_paths:
+            return character_map
+        probe_mesh = bpy.data.meshes.new(ABC_PROBE_NAME)
+        probe_obj = bpy.data.objects.new(ABC_PROBE_NAME, probe_mesh)
+        bpy.context.scene.collection.objects.link(probe_obj)
+        probe_mod = probe_obj.modifiers.new(name=ABC_PROBE_NAME, type='MESH_SEQUENCE_CACHE')
+        probe_mod.cache_file = cache_file
+        for object_path in object_paths:
+            probe_mod.object_path = object_path
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            depsgraph.update()
+            probe_eval = probe_obj.evaluated_get(depsgraph)
+            vert_count = len(probe_eval.to_mesh().vertices)
+            probe_eval.to_mesh_clear()
+            add_character_info(character_map, object_path, vert_count, None, cache_file.name, filepath, object_path)
+    finally:
+        if probe_obj is not None:
+            bpy.data.objects.remove(probe_obj, do_unlink=True)
+        if probe_mesh is not None:
+            bpy.data.meshes.remove(probe_mesh)
+        bpy.data.batch_remove([cache_file])
+    print(f"缓存文件读取完成，网格数量：{len(object_paths)}，用时: {time.time() - start_time} 秒")
+    return character_map
+
+
 def main(operator, context):
     # pmx -> abc 操作频率较高，仅用名称配对即可
     # pmx -> pmx 在换头类角色上材质/网格顺序内容变动的情况下 能够很好地适应。
@@ -683,6 +1051,8 @@ def main(operator, context):
         return
     toon_shading_flag = props.toon_shading_flag
     face_locator = props.face_locator
+    # 三渲二会对面部定位器进行一次性的处理，不适用增量传递
+    incremental = props.incremental and not toon_shading_flag
 
     source_root = None
     source_armature = None
@@ -691,6 +1061,8 @@ def main(operator, context):
     target_armature = None
     target_objects = None
     source_target_map = {}
+    # 源物体 -> 坐标索引，各个传递阶段共用
+    coordinate_indexes = {}
 
     if direction in ['PMX2ABC', 'PMX2PMX']:
         if direction == 'PMX2ABC':
@@ -704,10 +1076,14 @@ def main(operator, context):
             target_objects = find_abc_objects()
             sort_pmx_objects(source_objects)
             sort_abc_objects(target_objects)
-            if len(source_objects) == len(target_objects):
-                source_target_map = dict(zip(source_objects, target_objects))
-            else:
-                source_target_map = matching(source_objects, target_objects, direction)
+            record = load_transfer_record(get_record_root(target_root, target_objects)) if incremental else {}
+            source_target_map = get_recorded_mapping(record, source_objects, target_objects)
+            if not source_target_map:
+                if len(source_objects) == len(target_objects):
+                    source_target_map = dict(zip(source_objects, target_objects))
+                else:
+                    source_target_map = matching(source_objects, target_objects, direction,
+                                                 coordinate_indexes=coordinate_indexes)
         elif direction == 'PMX2PMX':
             # 通过名称可以进行快速的配对，但是，如果pmx网格内容/顺序修改了，无法进行 abc -> pmx 的反向配对
             # 通过顶点数量进行配对，可能会出现顶点数相同但网格内容不同的情况，如左目右目（但几率非常低）
@@ -720,7 +1096,11 @@ def main(operator, context):
             target_root = find_pmx_root_with_child(props.target)
             target_armature = find_pmx_armature(target_root)
             target_objects = find_pmx_objects(target_armature)
-            source_target_map = matching(source_objects, target_objects, direction, tolerance=tolerance)
+            record = load_transfer_record(get_record_root(target_root, target_objects)) if incremental else {}
+            source_target_map = get_recorded_mapping(record, source_objects, target_objects)
+            if not source_target_map:
+                source_target_map = matching(source_objects, target_objects, direction, tolerance=tolerance,
+                                             coordinate_indexes=coordinate_indexes)
 
         # 源模型和目标模型如果没有完全匹配，仍可以继续执行，但如果完全不匹配，则停止继续执行
         if len(source_target_map) == 0:
@@ -741,44 +1121,64 @@ def main(operator, context):
             display_list.append(target_armature)
         visibility_map = show_objects(display_list)
 
+        # 各个阶段需要处理的物体，增量传递时仅处理输入内容发生变化的物体
+        default_vgs = set(get_default_vgs(source_armature)) | set(get_default_vgs(target_armature))
+        stage_maps = {}
+        for stage in TRANSFER_STAGES:
+            if not incremental:
+                stage_maps[stage] = source_target_map
+                continue
+            stage_maps[stage] = get_changed_mapping(record, stage, source_target_map, default_vgs)
+            print(f"增量传递，{stage}需处理物体数量：{len(stage_maps[stage])}/{len(source_target_map)}")
+
         uv_flag = props.uv_flag
         if uv_flag:
             # 关联源物体UV到目标物体上面
-            link_uv(operator, source_target_map, direction)
+            link_uv(operator, stage_maps['UV'], direction)
 
         material_flag = props.material_flag
         if material_flag:
             # 关联源物体材质到目标物体上面
-            link_material(source_target_map)
+            link_material(stage_maps['MATERIAL'])
             # 关联源物体材质到目标物体上面（多材质槽情况下）
-            link_multi_slot_materials(operator, source_target_map, direction)
+            link_multi_slot_materials(operator, stage_maps['MATERIAL'], direction,
+                                      coordinate_indexes=coordinate_indexes)
 
         # 关联源物体顶点组及顶点权重到目标物体上面（正序）
         vgs_flag = props.vgs_flag
         if vgs_flag:
-            link_vertices_group(source_armature, target_armature, source_target_map, direction)
-            link_vertices_weight(source_armature, target_armature, source_target_map, direction)
+            link_vertices_group(source_armature, target_armature, stage_maps['VGS'], direction)
+            link_vertices_weight(source_armature, target_armature, stage_maps['VGS'], direction,
+                                 coordinate_indexes=coordinate_indexes)
 
         # 复制pmx修改器到abc上面（同时保留网格序列缓存修改器，删除骨架修改器）
         modifiers_flag = props.modifiers_flag
         if modifiers_flag:
-            link_modifiers(source_target_map, direction)
+            link_modifiers(stage_maps['MODIFIERS'], direction)
 
         normal_flag = props.normal_flag
         if normal_flag:
-            link_normal(source_target_map, direction)
+            link_normal(stage_maps['NORMAL'], direction)
 
         face_object = props.face_object
         face_vg = props.face_vg
         auto_face_location = props.auto_face_location
         # 三渲二面部定位器处理
         if toon_shading_flag and direction == 'PMX2ABC':
-            process_locator(operator, source_target_map, face_locator, auto_face_location, face_object, face_vg)
+            process_locator(operator, source_target_map, face_locator, auto_face_location, face_object, face_vg,
+                            coordinate_indexes=coordinate_indexes)
 
         # 为abc模型创建父级物体，创建父级可以更好地操作与管理导入的abc模型
         if direction == 'PMX2ABC':
             create_abc_parent(source_root, source_target_map)
 
+        # 增量传递时，记录本次传递的配对关系及各阶段的签名，供下次增量传递使用
+        if incremental:
+            stage_flags = {'UV': uv_flag, 'MATERIAL': material_flag, 'VGS': vgs_flag, 'MODIFIERS': modifiers_flag,
+                           'NORMAL': normal_flag}
+            save_transfer_record(get_record_root(target_root, target_objects), record, source_target_map,
+                                 [stage for stage, flag in stage_flags.items() if flag], default_vgs)
+
         # 恢复原有可见性
         for obj, visibility in visibility_map.items():
             set_visibility(obj, visibility)
@@ -788,6 +1188,150 @@ def main(operator, context):
         reset_cache_param(abc_filepath, selected_only, operator)
 
 
+# 传递记录在目标根物体上保存时使用的自定义属性名称
+TRANSFER_RECORD_KEY = "mmd_kafei_tools_transfer_record"
+# 增量传递中，可以单独跳过的传递阶段
+TRANSFER_STAGES = ['UV', 'MATERIAL', 'VGS', 'MODIFIERS', 'NORMAL']
+
+
+def get_record_root(target_root, target_objects):
+    """保存传递记录的物体。pmx为目标模型的根物体，abc为目标物体的祖先（即create_abc_parent创建的父级）"""
+    if target_root is not None:
+        return target_root
+    if not target_objects:
+        return None
+    return find_ancestor(target_objects[0])
+
+
+def load_transfer_record(root):
+    """读取目标根物体上保存的传递记录"""
+    if root is None or TRANSFER_RECORD_KEY not in root:
+        return {}
+    try:
+        return json.loads(root[TRANSFER_RECORD_KEY])
+    except (TypeError, ValueError):
+        return {}
+
+
+def save_transfer_record(root, record, mapping, stages, default_vgs):
+    """将配对关系、物体网格统计信息、各阶段的签名保存到目标根物体上。未执行的阶段保留之前的记录"""
+    if root is None:
+        return
+    signatures = record.get('signatures', {})
+    for stage in stages:
+        stage_signatures = signatures.setdefault(stage, {})
+        for source, target in mapping.items():
+            stage_signatures[target.name] = get_stage_signature(stage, source, target, default_vgs)
+    record = {
+        'mapping': {source.name: target.name for source, target in mapping.items()},
+        'stats': {obj.name: list(get_mesh_stats(obj)) for pair in mapping.items() for obj in pair},
+        'signatures': signatures,
+    }
+    root[TRANSFER_RECORD_KEY] = json.dumps(record, ensure_ascii=False)
+
+
+def get_recorded_mapping(record, source_objects, target_objects):
+    """如果上次的配对关系中的物体均存在且网格统计信息未发生变化，则直接复用上次的配对关系，否则返回空字典"""
+    recorded_mapping = record.get('mapping')
+    if not recorded_mapping:
+        return {}
+    stats = record.get('stats', {})
+    sources = {obj.name: obj for obj in source_objects}
+    targets = {obj.name: obj for obj in target_objects}
+    mapping = {}
+    for source_name, target_name in recorded_mapping.items():
+        source = sources.get(source_name)
+        target = targets.get(target_name)
+        if source is None or target is None:
+            return {}
+        if stats.get(source_name) != list(get_mesh_stats(source)) or stats.get(target_name) != list(
+                get_mesh_stats(target)):
+            return {}
+        mapping[source] = target
+    print(f"增量传递，复用上次的配对结果，配对数量：{len(mapping)}")
+    return mapping
+
+
+def get_changed_mapping(record, stage, mapping, default_vgs):
+    """获取指定阶段中，签名与上次记录不一致（需要重新传递）的配对"""
+    stage_signatures = record.get('signatures', {}).get(stage)
+    if not stage_signatures:
+        return dict(mapping)
+    return {source: target for source, target in mapping.items()
+            if stage_signatures.get(target.name) != get_stage_signature(stage, source, target, default_vgs)}
+
+
+def get_stage_signature(stage, source, target, default_vgs):
+    """传递阶段的签名，由源物体的输入内容与目标物体的当前内容共同决定"""
+    if stage == 'UV':
+        content = [get_uv_signature(obj.data) for obj in (source, target)]
+    elif stage == 'MATERIAL':
+        content = [get_material_signature(obj) for obj in (source, target)]
+    elif stage == 'VGS':
+        content = [get_weights_signature(obj, default_vgs) for obj in (source, target)]
+    elif stage == 'MODIFIERS':
+        content = [get_modifiers_signature(obj) for obj in (source, target)]
+    elif stage == 'NORMAL':
+        content = [(obj.data.has_custom_normals, len(obj.data.loops)) for obj in (source, target)]
+    else:
+        raise ValueError(f"未知的传递阶段：{stage}")
+    return hashlib.md5(repr(content).encode('utf-8')).hexdigest()
+
+
+def get_uv_signature(mesh):
+    """UV层名称、活动UV层及各UV层的坐标数据"""
+    uv_hashes = []
+    for uv_layer in mesh.uv_layers:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uvs)
+        uv_hashes.append((uv_layer.name, hashlib.md5(uvs.tobytes()).hexdigest()))
+    return mesh.uv_layers.active_index, uv_hashes, len(mesh.loops)
+
+
+def get_weights_signature(obj, default_vgs):
+    """自定义顶点组名称及其权重数据（顶点索引、顶点组、权重）"""
+    names = [vg.name for vg in obj.vertex_groups]
+    custom_names = [name for name in names if name not in default_vgs]
+    # 顶点组索引 -> 在自定义顶点组中的位置，非自定义顶点组为-1
+    custom_positions = {name: position for position, name in enumerate(custom_names)}
+    positions = np.array([custom_positions.get(name, -1) for name in names] + [-1], dtype=np.int64)
+    vert_indexes, group_indexes, weights = get_vertex_weights(obj)
+    group_positions = positions[group_indexes] if len(group_indexes) else np.empty(0, dtype=np.int64)
+    custom = group_positions != -1
+    md5 = hashlib.md5()
+    for array in (vert_indexes[custom], group_positions[custom], weights[custom]):
+        md5.update(array.tobytes())
+    return custom_names, md5.hexdigest()
+
+
+def get_material_signature(obj):
+    mesh = obj.data
+    material_indexes = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_indexes)
+    return ([slot.material.name if slot.material else None for slot in obj.material_slots],
+            hashlib.md5(material_indexes.tobytes()).hexdigest())
+
+
+def get_modifiers_signature(obj):
+    return [(modifier.name, modifier.type,
+             [to_signature_value(getattr(modifier, prop)) for prop in get_modifier_properties(modifier)])
+            for modifier in obj.modifiers]
+
+
+def to_signature_value(value):
+    """将属性值转换为可稳定输出的内容"""
+    if isinstance(value, bpy.types.ID):
+        return value.name
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    try:
+        return [to_signature_value(item) for item in value]
+    except TypeError:
+        return repr(value)
+
+
 def create_abc_parent(source_root, source_target_map):
     create_flag = True
     for obj in source_target_map.values():
@@ -859,6 +1403,7 @@ def link_uv(operator, source_target_map, direction):
         for index in sorted(uvs_to_remove, reverse=True):
             target.data.uv_layers.remove(target.data.uv_layers[index])
 
+    start_time = time.time()
     for source, target in source_target_map.items():
         source_mesh = source.data
         target_mesh = target.data
@@ -866,12 +1411,14 @@ def link_uv(operator, source_target_map, direction):
             continue
         # 如果loop值不一致，则跳过本次循环，但这不意味着错误
         # 比如3.x导入abc复制uv出问题，用2.x导入并拷贝到当前工程，执行插件依然可以进行后续逻辑
+        # （join_uvs同样要求loop数量一致，所以这种情况下也没有退回到操作符的必要）
         if len(source_mesh.loops) != len(target_mesh.loops):
             operator.report(type={'WARNING'},
                             message=f'传递材质时未能成功复制UV，请检查。'
                                     f'源物体：{source.name}，loops：{len(source_mesh.loops)}，面数：{len(source_mesh.polygons)}。'
                                     f'目标物体：{target.name}，loops：{len(target_mesh.loops)}，面数：{len(target_mesh.polygons)}')
             continue
+        curr_time = time.time()
         # 记录源物体活动的UV、用于渲染的UV、原始uv数量
         source_uv_active_index = source_mesh.uv_layers.active_index
         source_uv_render_index = next(
@@ -885,9 +1432,9 @@ def link_uv(operator, source_target_map, direction):
             for layer in reversed(target.data.uv_layers):
                 target.data.uv_layers.remove(layer)
 
+        # loop数量一致，直接通过foreach_get/foreach_set复制面拐UV数据，无需切换选中状态和调用join_uvs。同一物体的各个UV共用一个缓冲区
+        uv_buffer = np.empty(len(source_mesh.loops) * 2, dtype=np.float32)
         for uv_layer in source.data.uv_layers:
-            # 复制UV时，复制的是活动状态的UV
-            uv_layer.active = True
             # 新建uv
             # blender 3.0以下（如2.93）导入abc，uv命名是"uv"，而不是"UVMap"
             # 所以除非刻意进行额外操作，否则出现"UV名称已存在（或者说UV命名冲突，不过实际名称会自动修改并不会冲突）"的问题的可能性很低，这里对此种情况暂不处理。
@@ -899,17 +1446,12 @@ def link_uv(operator, source_target_map, direction):
                                 message=f'传递材质时未能成功复制UV，请检查。目标物体：{target.name}，目标物体UV数量：{len(target.data.uv_layers)}。'
                                         f'源物体UV名称：{uv_layer.name}')
                 continue
-            target_mesh.uv_layers[uv_layer.name].active = True
-
-            deselect_all_objects()
-            select_and_activate(target)
-            select_and_activate(source)
             # 复制UV贴图
-            bpy.ops.object.join_uvs()
+            uv_layer.data.foreach_get("uv", uv_buffer)
+            new_uv.data.foreach_set("uv", uv_buffer)
+        target_mesh.update()
 
         # 恢复uv的激活状态
-        source_mesh.uv_layers[source_uv_active_index].active = True
-        source_mesh.uv_layers[source_uv_render_index].active_render = True
         target_current_uv_count = len(target_mesh.uv_layers)
         # 目标物体原始UV数量为0，且全部复制成功
         if target_original_uv_count == 0 and target_current_uv_count == source_original_uv_count:
@@ -923,6 +1465,8 @@ def link_uv(operator, source_target_map, direction):
         else:
             # 要么不复制，要么全部复制成功，其它情况，这里暂不考虑
             pass
+        print(f"物体 \"{target.name}\" UV传递完成，UV数量：{source_original_uv_count}，耗时{time.time() - curr_time:.6f}秒")
+    print(f"UV传递完成，总耗时: {time.time() - start_time:.6f} 秒")
 
 
 def link_material(source_target_map):
@@ -979,59 +1523,83 @@ def get_default_vgs(armature):
     return default_vgs
 
 
-def link_vertices_weight(source_armature, target_armature, mapping, direction):
+def link_vertices_weight(source_armature, target_armature, mapping, direction, coordinate_indexes=None):
     """将pmx物体自定义的顶点组权重传递到abc的对应物体上"""
+    if coordinate_indexes is None:
+        coordinate_indexes = {}
     # 获取pmx物体默认的顶点组
     default_vgs = get_default_vgs(source_armature)
     if direction == "PMX2ABC":
         default_vgs.update(get_default_vgs(target_armature))
 
     # 传递顶点组权重
-    # 预先获取所有顶点组信息，仅遍历一次全部target顶点 / 每有一个顶点组，遍历一次全部target顶点
+    # 源物体权重一次性读取，每组source/target的顶点对应关系仅计算一次，每个目标顶点组按不同的权重值批量写入
+    target_scale = get_key_scale(direction[-3:])
     for source, target in mapping.items():
-        deselect_all_objects()
-        source_vgs = source.vertex_groups
-        vg_name_infos = {}
-        for source_vg in source_vgs:
-            if source_vg.name in default_vgs:
-                continue
-            # 激活source对象当前顶点组
-            select_and_activate(source)
-            bpy.ops.object.vertex_group_set_active(group=source_vg.name)
-            # 获取source对象当前顶点组中的顶点、权重信息
-            vertices_and_weights = get_vertices_and_weights(source, source_vg)
-            if len(vertices_and_weights) == 0:
+        custom_vgs = {vg.index: vg.name for vg in source.vertex_groups if vg.name not in default_vgs}
+        if not custom_vgs:
+            continue
+        # 获取source对象自定义顶点组中的顶点、权重信息
+        source_index = get_coordinate_index(coordinate_indexes, source)
+        vert_indexes, group_indexes, weights = source_index.get_vertex_weights()
+        custom_mask = np.isin(group_indexes, list(custom_vgs))
+        if not custom_mask.any():
+            continue
+        vert_indexes = vert_indexes[custom_mask]
+        group_indexes = group_indexes[custom_mask]
+        weights = weights[custom_mask]
+
+        # 获取target顶点与其坐标误差范围内的source顶点
+        pair_targets, pair_sources = source_index.find_vertex_pairs(get_vertex_keys(target, target_scale))
+
+        # 将配对展开为（target顶点, source顶点, 顶点组, 权重）
+        source_vert_count = len(source.data.vertices)
+        entry_counts = np.bincount(vert_indexes, minlength=source_vert_count)
+        entry_starts = np.cumsum(entry_counts) - entry_counts
+        pair_entry_counts = entry_counts[pair_sources]
+        entries = concat_ranges(entry_starts[pair_sources], pair_entry_counts)
+        entry_targets = np.repeat(pair_targets, pair_entry_counts)
+        entry_sources = np.repeat(pair_sources, pair_entry_counts)
+        entry_groups = group_indexes[entries]
+        entry_weights = weights[entries]
+        if len(entries) == 0:
+            continue
+
+        # 同一target顶点、同一顶点组存在多个source顶点时，取索引最大的source顶点的权重
+        order = np.lexsort((entry_sources, entry_groups, entry_targets))
+        entry_targets = entry_targets[order]
+        entry_groups = entry_groups[order]
+        entry_weights = entry_weights[order]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = (entry_targets[1:] != entry_targets[:-1]) | (entry_groups[1:] != entry_groups[:-1])
+        entry_targets = entry_targets[is_last]
+        entry_groups = entry_groups[is_last]
+        entry_weights = entry_weights[is_last]
+
+        for group_index, vg_name in custom_vgs.items():
+            group_mask = entry_groups == group_index
+            if not group_mask.any():
                 continue
-            vg_name_infos[source_vg.name] = vertices_and_weights
-        # 获取target顶点
-        # 如果坐标值 in vertices_and_weights，则设置相应权重
-        for vert in target.data.vertices:
-            for vg_name, vg_info in vg_name_infos.items():
-                target_vg = target.vertex_groups[vg_name]
-                key = gen_key(vert, direction[-3:])
-                if key in vg_info:
-                    weight = vg_info[key]
-                    target_vg.add([vert.index], weight, 'REPLACE')
-
-
-def get_vertices_and_weights(obj, vertex_group):
-    """获取顶点组中的顶点及其权重map"""
-    vertices_and_weights = {}
-    mesh = obj.data
-    vertex_group_index = obj.vertex_groups.find(vertex_group.name)
-    if vertex_group_index != -1:
-        for vert in mesh.vertices:
-            for group_element in vert.groups:
-                if group_element.group == vertex_group_index:
-                    for i in range(-1, 2):
-                        for j in range(-1, 2):
-                            for k in range(-1, 2):
-                                key = (
-                                    truncate(vert.co.x) + i * 1,
-                                    truncate(vert.co.y) + j * 1,
-                                    truncate(vert.co.z) + k * 1)
-                                vertices_and_weights[key] = group_element.weight
-    return vertices_and_weights
+            target_vg = target.vertex_groups[vg_name]
+            group_targets = entry_targets[group_mask]
+            unique_weights, weight_inverse = np.unique(entry_weights[group_mask], return_inverse=True)
+            weight_inverse = weight_inverse.reshape(-1)
+            for weight_index, weight in enumerate(unique_weights.tolist()):
+                target_vg.add(group_targets[weight_inverse == weight_index].tolist(), weight, 'REPLACE')
+
+
+def get_vertex_weights(obj):
+    """遍历一次全部顶点，获取顶点权重信息，返回（顶点索引数组, 顶点组索引数组, 权重数组），按顶点索引升序"""
+    vert_indexes = []
+    group_indexes = []
+    weights = []
+    for vert in obj.data.vertices:
+        for group_element in vert.groups:
+            vert_indexes.append(vert.index)
+            group_indexes.append(group_element.group)
+            weights.append(group_element.weight)
+    return (np.array(vert_indexes, dtype=np.int64), np.array(group_indexes, dtype=np.int64),
+            np.array(weights, dtype=np.float32))
 
 
 def truncate(value):
@@ -1039,13 +1607,12 @@ def truncate(value):
     return math.floor(value / PRECISION)
 
 
-def link_multi_slot_materials(operator, mapping, direction):
+def link_multi_slot_materials(operator, mapping, direction, coordinate_indexes=None):
     """关联源物体材质到目标物体上面（多材质槽情况下）"""
+    if coordinate_indexes is None:
+        coordinate_indexes = {}
+    target_scale = get_key_scale(direction[-3:])
     for source, target in mapping.items():
-        # 没有active_object直接mode_set会报异常
-        deselect_all_objects()
-        select_and_activate(source)
-
         # 通过面的质心坐标（局部）来确定源和目标的映射关系，以此来关联材质
         # 模型可能会存在重合面，导致质心位置相同
         # 但是pmx模型的肌和体，要么分属不同的网格对象，要么属于同一网格对象的不同面
@@ -1053,122 +1620,126 @@ def link_multi_slot_materials(operator, mapping, direction):
 
         # 获取源物体网格数据
         source_mesh = source.data
-        # 源物体质心与面的map
-        source_center_poly_map = {}
-        # 源物体面与对应材质的map
-        source_poly_material_map = {}
-        for source_poly in source_mesh.polygons:
-            source_poly_material_map[source_poly.index] = source_poly.material_index
-
-            # 将质心坐标（局部）进行精度误差处理，得到的结果保存在map中。
-            # 如果不进行精度误差处理，直接将poly.center作为key，坐标值只会保留小数点后4位。（以四舍五入的方式）
-            # 首先想到的是增加精度，获取更后面的值，直到完整获取整个数值以避免四舍五入，但是这样会产生精度丢失的问题
-            # 实际的值非常不可控，所以才要四舍五入吧，但问题的原因不是四舍五入，而是存在误差
-            # 事实上，保留小数点后四位已经足够了，但个别面的质心坐标值依然存在误差。
-            # 这里对坐标值 / PRECISION后的结果进行截断，保留整数，误差为±1。
-            for i in range(-1, 2):
-                for j in range(-1, 2):
-                    for k in range(-1, 2):
-                        key = (
-                            truncate(source_poly.center.x) + i * 1,
-                            truncate(source_poly.center.y) + j * 1,
-                            truncate(source_poly.center.z) + k * 1)
-                        source_center_poly_map[key] = source_poly.index
+        # 源物体各个面对应的材质
+        source_material_indexes = np.empty(len(source_mesh.polygons), dtype=np.int32)
+        source_mesh.polygons.foreach_get("material_index", source_material_indexes)
+
+        # 将质心坐标（局部）进行精度误差处理，以此构建索引。
+        # 如果不进行精度误差处理，直接将poly.center作为key，坐标值只会保留小数点后4位。（以四舍五入的方式）
+        # 首先想到的是增加精度，获取更后面的值，直到完整获取整个数值以避免四舍五入，但是这样会产生精度丢失的问题
+        # 实际的值非常不可控，所以才要四舍五入吧，但问题的原因不是四舍五入，而是存在误差
+        # 事实上，保留小数点后四位已经足够了，但个别面的质心坐标值依然存在误差。
+        # 这里对坐标值 / PRECISION后的结果进行截断，保留整数，查询时允许±1的误差。
+        source_index = get_coordinate_index(coordinate_indexes, source)
 
-        deselect_all_objects()
-        select_and_activate(target)
         # 获取目标物体网格数据
         target_mesh = target.data
-        match_count = 0
-        for target_poly in target_mesh.polygons:
-            # target_poly的质心坐标要乘上0.08，但是质心坐标不会随着缩放比例的变化而变化
-            key = None
-            if direction[-3:] == 'ABC':
-                key = (
-                    truncate(target_poly.center.x * 0.08),
-                    truncate(target_poly.center.y * 0.08),
-                    truncate(target_poly.center.z * 0.08))
-            elif direction[-3:] == 'PMX':
-                key = (
-                    truncate(target_poly.center.x),
-                    truncate(target_poly.center.y),
-                    truncate(target_poly.center.z))
-            if key in source_center_poly_map:
-                match_count += 1
-                source_poly = source_center_poly_map[key]
-                material_index = source_poly_material_map[source_poly]
-                target_poly.material_index = material_index
+        target_material_indexes = np.empty(len(target_mesh.polygons), dtype=np.int32)
+        target_mesh.polygons.foreach_get("material_index", target_material_indexes)
+        # target_poly的质心坐标要乘上0.08，但是质心坐标不会随着缩放比例的变化而变化
+        source_polys = source_index.find_faces(get_face_keys(target, target_scale))
+        matched = source_polys >= 0
+        match_count = int(np.count_nonzero(matched))
+        target_material_indexes[matched] = source_material_indexes[source_polys[matched]]
+        target_mesh.polygons.foreach_set("material_index", target_material_indexes)
+        target_mesh.update()
         if match_count != len(source_mesh.polygons):
             # 如果出现特殊情况给予提示
             operator.report(type={'WARNING'},
                             message=f'未能完整传递多材质，请检查。'
                                     f'源物体：{source.name}，面数：{len(source_mesh.polygons)}。'
-                                    f'目标物体：{target.name}，面数：{len(source_mesh.polygons)}，匹配成功面数：{match_count}')
+                                    f'目标物体：{target.name}，面数：{len(target_mesh.polygons)}，匹配成功面数：{match_count}')
+
+
+# 无法移动至其之上的修改器（需要原始数据的修改器）、由目标物体自身决定的修改器，均不进行复制
+MODIFIER_TYPES_NOT_COPIED = {'SOFT_BODY', 'MULTIRES', 'ARMATURE'}
+# 绑定数据、模拟设置、曲线映射（衰减曲线、轮廓曲线）、钩挂顶点索引等内容无法通过属性复制的修改器，仍然通过操作符复制
+MODIFIER_TYPES_COPIED_BY_OPERATOR = {'SURFACE_DEFORM', 'MESH_DEFORM', 'LAPLACIANDEFORM', 'CORRECTIVE_SMOOTH', 'CLOTH',
+                                     'COLLISION', 'DYNAMIC_PAINT', 'FLUID', 'PARTICLE_SYSTEM', 'OCEAN', 'HOOK', 'WARP',
+                                     'VERTEX_WEIGHT_EDIT', 'BEVEL'}
+# 修改器类型 -> 可写属性名称列表
+modifier_properties_cache = {}
 
 
 def link_modifiers(mapping, direction):
     """复制pmx修改器到abc上面（同时保留网格序列缓存修改器，删除骨架修改器）"""
+    # 目标物体需要保留的修改器类型
+    keep_type = 'MESH_SEQUENCE_CACHE' if direction[-3:] == 'ABC' else 'ARMATURE'
     for source, target in mapping.items():
-        deselect_all_objects()
-        # 备份目标物体的修改器（不进行这一步的话目标物体的修改器会丢失）
-        # 创建一个临时网格对象（立方体）
-        bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, align='WORLD', location=(0, 0, 0))
-        temp_mesh_object = bpy.context.active_object
-        select_and_activate(temp_mesh_object)
-        select_and_activate(target)
-        # 将目标物体修改器关联到临时网格对象上面
-        bpy.ops.object.make_links_data(type='MODIFIERS')
-
-        # 复制源物体修改器到目标物体上面
-        deselect_all_objects()
-        select_and_activate(target)
-        select_and_activate(source)
-        bpy.ops.object.make_links_data(type='MODIFIERS')
-
-        # 增强健壮性 无法移动至一个需要原始数据的修改器之上
-        for i in range(len(target.modifiers) - 1, -1, -1):
-            modifier = target.modifiers[i]
-            if modifier.type in ['SOFT_BODY', 'MULTIRES']:
+        # 仅保留目标物体自身的网格序列缓存修改器（abc）或骨架修改器（pmx），记录其原始位置
+        kept_modifiers = []
+        for index, modifier in reversed(list(enumerate(target.modifiers))):
+            if modifier.type == keep_type:
+                kept_modifiers.insert(0, (index, modifier.name))
+            else:
                 target.modifiers.remove(modifier)
 
-        # 删除骨架修改器
-        for armature_modifier in modifiers_by_type(target, 'ARMATURE'):
-            target.modifiers.remove(armature_modifier)
-
-        # 将临时网格对象的修改器名称、类型、属性复制到目标物体的新建修改器上面
+        # 复制源物体修改器到目标物体上面
         # 因为默认顶点组并没有关联到target中，所以可能存在target修改器属性值为红的情况，但这里暂不处理（可能性较低）
-        deselect_all_objects()
-        select_and_activate(temp_mesh_object)
-        for index, modifier in enumerate(temp_mesh_object.modifiers):
-            if direction[-3:] == 'ABC' and modifier.type != 'MESH_SEQUENCE_CACHE':
+        copied_names = []
+        for modifier in source.modifiers:
+            if modifier.type in MODIFIER_TYPES_NOT_COPIED:
                 continue
-            if direction[-3:] == 'PMX' and modifier.type != 'ARMATURE':
-                continue
-            select_and_activate(target)
-            m_dst = target.modifiers.new(modifier.name, modifier.type)
-            properties = [p.identifier for p in modifier.bl_rna.properties
-                          if not p.is_readonly]
-            for prop in properties:
-                setattr(m_dst, prop, getattr(modifier, prop))
+            copied_names.append(copy_modifier(source, target, modifier).name)
 
-            while target.modifiers.find(modifier.name) != index:
-                bpy.ops.object.modifier_move_up(modifier=modifier.name)
+        # 将保留的修改器移动回原始位置，其余修改器的顺序与源物体一致
+        order = list(copied_names)
+        for index, name in kept_modifiers:
+            order.insert(min(index, len(order)), name)
+        for index, name in enumerate(order):
+            move_modifier(target, name, index)
 
         # 如果修改器涉及到source对象的引用，则将其修改为target的引用
-        for target_modifier in target.modifiers:
-            properties = [p.identifier for p in target_modifier.bl_rna.properties
-                          if not p.is_readonly]
-            for prop in properties:
+        for name in copied_names:
+            target_modifier = target.modifiers[name]
+            for prop in get_modifier_properties(target_modifier):
                 value = getattr(target_modifier, prop)
                 if isinstance(value, bpy.types.Object):
                     target_ref = mapping.get(value, None)
                     if target_ref:
                         setattr(target_modifier, prop, target_ref)
 
-        # 删除临时网格对象
+
+def get_modifier_properties(modifier):
+    """获取修改器的可写属性名称列表（按修改器类型缓存）"""
+    properties = modifier_properties_cache.get(modifier.type)
+    if properties is None:
+        properties = [p.identifier for p in modifier.bl_rna.properties
+                      if not p.is_readonly and p.identifier not in ('name', 'type')]
+        modifier_properties_cache[modifier.type] = properties
+    return properties
+
+
+def copy_modifier(source, target, modifier):
+    """将source的修改器复制到target修改器栈的末尾，返回新建的修改器"""
+    if modifier.type in MODIFIER_TYPES_COPIED_BY_OPERATOR:
         deselect_all_objects()
-        select_and_activate(temp_mesh_object)
-        bpy.ops.object.delete()
+        select_and_activate(target)
+        select_and_activate(source)
+        bpy.ops.object.modifier_copy_to_selected(modifier=modifier.name)
+        return target.modifiers[-1]
+
+    m_dst = target.modifiers.new(modifier.name, modifier.type)
+    for prop in get_modifier_properties(modifier):
+        setattr(m_dst, prop, getattr(modifier, prop))
+    # 几何节点修改器的输入值以自定义属性的形式保存
+    if modifier.type == 'NODES':
+        for key in modifier.keys():
+            m_dst[key] = modifier[key]
+    return m_dst
+
+
+def move_modifier(obj, name, index):
+    """将修改器移动到指定索引处"""
+    from_index = obj.modifiers.find(name)
+    if from_index == index:
+        return
+    # ObjectModifiers.move在较新的版本中才提供
+    if hasattr(obj.modifiers, "move"):
+        obj.modifiers.move(from_index, index)
+    else:
+        select_and_activate(obj)
+        bpy.ops.object.modifier_move_to_index(modifier=name, index=index)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,4 @@
+import numpy as np
 
 from ..utils import *
 
@@ -5,7 +6,7 @@ from ..utils import *
 class TransferVgWeightOperator(bpy.types.Operator):
     bl_idname = "mmd_kafei_tools.transfer_vg_weight"  # 引用时的唯一标识符
     bl_label = "执行"  # 显示名称（F3搜索界面，不过貌似需要注册，和panel中显示的内容区别开）
-    bl_description = "将选中对象的源顶点组的权重，转移到目标顶点组"
+    bl_description = "将选中对象的源顶点组（可以有多个）的权重，转移到目标顶点组"
     bl_options = {'REGISTER', 'UNDO'}  # 启用撤销功能
 
     def execute(self, context):
@@ -19,52 +20,16 @@ class TransferVgWeightOperator(bpy.types.Operator):
         if self.check_props(props) is False:
             return
 
-        source_vg_name = props.source_vg_name
+        source_vg_names = parse_vg_names(props.source_vg_name)
         target_vg_name = props.target_vg_name
         selected_v_only = props.selected_v_only
 
         if bpy.context.active_object and bpy.context.active_object.mode != "OBJECT":
             bpy.ops.object.mode_set(mode='OBJECT')
 
-        # 记录选择状态
-        active_object = bpy.context.active_object
         objs = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
-
-        for index, obj in enumerate(objs):
-            deselect_all_objects()
-            select_and_activate(obj)
-            vgs = obj.vertex_groups
-
-            # 如果源顶点组不存在，则跳过；如果目标顶点组不存在，则新建
-            if source_vg_name not in vgs:
-                continue
-            if target_vg_name not in vgs:
-                obj.vertex_groups.new(name=target_vg_name)
-
-            source_vg = vgs[source_vg_name]
-            target_vg = vgs[target_vg_name]
-            source_vg_index = source_vg.index
-            target_vg_index = target_vg.index
-
-            for vert in obj.data.vertices:
-                if selected_v_only and not vert.select:
-                    continue
-                v_index = vert.index
-                groups = [vgs.group for vgs in vert.groups]  # vert.groups 返回顶点组id和对应权重（只读）
-                if source_vg_index in groups:
-                    weight_s = source_vg.weight(v_index)    # 顶点在源顶点组中的顶点权重
-                    if target_vg_index in groups:
-                        weight_t = target_vg.weight(v_index)    # 顶点在目标顶点组中的顶点权重
-                        target_vg.add([v_index], weight_s + weight_t, 'REPLACE')
-                    else:
-                        target_vg.add([v_index], weight_s, 'ADD')
-                    source_vg.remove([v_index])
-
-        # 恢复选择状态
-        deselect_all_objects()
         for obj in objs:
-            select_and_activate(obj)
-        select_and_activate(active_object)
+            transfer_vg_weight(obj, source_vg_names, target_vg_name, selected_v_only)
         self.report({'INFO'}, "权重转移完成")
 
     def check_props(self, props):
@@ -72,15 +37,79 @@ class TransferVgWeightOperator(bpy.types.Operator):
         if len(objs) == 0:
             self.report(type={'ERROR'}, message=f'请选择至少一个网格物体！')
             return False
-        source_vg_name = props.source_vg_name
-        if source_vg_name is None or source_vg_name == '':
+        source_vg_names = parse_vg_names(props.source_vg_name)
+        if not source_vg_names:
             self.report(type={'ERROR'}, message=f'请输入源顶点组名称！')
             return False
         target_vg_name = props.target_vg_name
         if target_vg_name is None or target_vg_name == '':
             self.report(type={'ERROR'}, message=f'请输入目标顶点组名称！')
             return False
-        if source_vg_name == target_vg_name:
+        if target_vg_name in source_vg_names:
             self.report(type={'ERROR'}, message=f'源顶点组与目标顶点组名称相同！')
             return False
         return True
+
+
+def parse_vg_names(text):
+    """解析以逗号分隔的顶点组名称，去除首尾空格及重复项"""
+    if not text:
+        return []
+    names = []
+    for name in text.replace("，", ",").split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def transfer_vg_weight(obj, source_vg_names, target_vg_name, selected_v_only):
+    """将物体的多个源顶点组的权重累加到目标顶点组（上限为1），并从源顶点组中移除
+    只遍历一次顶点读取权重，计算在数组上完成，写回时按权重值分组，每个不同的权重值只调用一次vertex_group.add
+    结果与逐个源顶点组、逐个顶点转移一致
+    """
+    vgs = obj.vertex_groups
+    # 如果源顶点组不存在，则跳过；如果目标顶点组不存在，则新建
+    source_vgs = [vgs[name] for name in source_vg_names if name in vgs]
+    if not source_vgs:
+        return
+    if target_vg_name not in vgs:
+        vgs.new(name=target_vg_name)
+    target_vg = vgs[target_vg_name]
+
+    weights, contains = get_vg_weights(obj, [vg.index for vg in source_vgs] + [target_vg.index])
+    mask = contains[:, :-1].any(axis=1)
+    if selected_v_only:
+        selected = np.zeros(len(obj.data.vertices), dtype=bool)
+        obj.data.vertices.foreach_get("select", selected)
+        mask &= selected
+    rows = np.flatnonzero(mask)
+    if len(rows) == 0:
+        return
+
+    # 目标顶点组权重 + 各源顶点组权重（不属于顶点组时为0）
+    new_weights = np.minimum(weights[rows].sum(axis=1), 1.0)
+    unique_weights, inverse = np.unique(new_weights, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    splits = np.cumsum(np.bincount(inverse, minlength=len(unique_weights)))[:-1]
+    for weight, weight_rows in zip(unique_weights, np.split(rows[order], splits)):
+        target_vg.add(weight_rows.tolist(), float(weight), 'REPLACE')
+    for column, source_vg in enumerate(source_vgs):
+        source_rows = rows[contains[rows, column]]
+        if len(source_rows):
+            source_vg.remove(source_rows.tolist())
+
+
+def get_vg_weights(obj, vg_indexes):
+    """遍历一次顶点，获取各顶点在指定顶点组上的权重（顶点数×顶点组数），以及顶点是否属于该顶点组"""
+    mesh = obj.data
+    columns = {vg_index: column for column, vg_index in enumerate(vg_indexes)}
+    weights = np.zeros((len(mesh.vertices), len(vg_indexes)), dtype=np.float64)
+    contains = np.zeros(weights.shape, dtype=bool)
+    for vert in mesh.vertices:
+        for group_element in vert.groups:  # vert.groups 返回顶点组id和对应权重（只读）
+            column = columns.get(group_element.group)
+            if column is not None:
+                weights[vert.index, column] = group_element.weight
+                contains[vert.index, column] = True
+    return weights, contains
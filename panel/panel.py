@@ -79,6 +79,9 @@ class TransferPresetPanel(bpy.types.Panel):
                 tolerance_col = common_param_box.column()
                 tolerance_col.prop(props, "tolerance")
 
+            incremental_col = common_param_box.column()
+            incremental_col.prop(props, "incremental")
+
             if direction == 'PMX2ABC':
                 normal_flag_col = common_param_box.column()
                 normal_flag_col.prop(props, "normal_flag")
@@ -105,12 +108,14 @@ class TransferPresetPanel(bpy.types.Panel):
                     vgs_col.enabled = False
                     modifiers_col.enabled = False
                     normal_flag_col.enabled = False
+                    incremental_col.enabled = False
                 else:
                     material_flag_col.enabled = True
                     uv_flag_col.enabled = True
                     vgs_col.enabled = True
                     modifiers_col.enabled = True
                     normal_flag_col.enabled = True
+                    incremental_col.enabled = True
 
         if direction == 'ABC2ABC':
             abc_filepath_col = common_param_box.column()
@@ -463,6 +468,8 @@ class ChangeTexLocPanel(bpy.types.Panel):
         new_folder_col.prop(props, "new_folder")
         remove_empty_col = col.column()
         remove_empty_col.prop(props, "remove_empty")
+        direct_col = col.column()
+        direct_col.prop(props, "direct")
 
         show_batch_props(col, False, True, batch)
 
@@ -674,10 +681,14 @@ class RenderPreviewPanel(bpy.types.Panel):
         align_col = col.column()
         align_col.prop(props, "align")
 
-        batch_box = show_batch_props(col, True, True, batch)
+        batch_box = show_batch_props(col, True, True, batch, False)
         if batch_box:
             force_center_col = batch_box.column()
             force_center_col.prop(props, "force_center")
+            batch_size_col = batch_box.column()
+            batch_size_col.prop(props, "batch_size")
+            thumbnail_sizes_col = batch_box.column()
+            thumbnail_sizes_col.prop(props, "thumbnail_sizes")
 
         load_render_preset_row = col.row()
         load_render_preset_row.operator(LoadRenderPresetOperator.bl_idname, text=LoadRenderPresetOperator.bl_label)
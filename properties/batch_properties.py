@@ -42,3 +42,10 @@ class BatchProperty(bpy.types.PropertyGroup):
             ("OVERWRITE", "覆盖", "继续对这些文件进行后续处理，产生的新文件会覆盖原文件")],
         default="SKIP"
     )
+    workers: bpy.props.IntProperty(
+        name="并行进程数",
+        description="大于1时，启动相应数量的后台blender进程并行处理文件（进程中会加载当前已启用的插件）",
+        default=1,
+        min=1,
+        max=64
+    )
@@ -16,6 +16,11 @@ class ChangeTexLocProperty(bpy.types.PropertyGroup):
         description="贴图路径修改后，是否删除模型目录下空文件夹",
         default=True
     )
+    direct: bpy.props.BoolProperty(
+        name="直接修改",
+        description="直接读写pmx文件中的贴图路径，不经过导入导出，速度快且不会因导出产生差异。pmd文件仍通过导入导出处理",
+        default=True
+    )
 
     @staticmethod
     def register():
@@ -70,6 +70,20 @@ class RenderPreviewProperty(bpy.types.PropertyGroup):
         description="受隐藏部位的影响，某些角色渲染的结果可能不会居中。此选项可使角色强制居中，但会花费更多的时间",
         default=False
     )
+    batch_size: bpy.props.IntProperty(
+        name="每次渲染数量",
+        description="每次渲染时同时导入的模型数量。大于1时，多个模型在同一场景中错开排列，通过多视图一次渲染出全部预览图，"
+                    "以减少重复的渲染初始化开销",
+        default=1,
+        min=1,
+        max=16
+    )
+    thumbnail_sizes: bpy.props.StringProperty(
+        name="缩略图尺寸",
+        description="批量渲染时，根据预览图额外输出的缩略图尺寸（长边像素数，以逗号分隔，如512,256,128），"
+                    "并在目录中生成汇总最小一级缩略图的图集及其JSON索引。为空时不输出",
+        default=""
+    )
     # 如何在其它视角对齐角色？
     # 方案1
     # 添加shift_x，shift_y
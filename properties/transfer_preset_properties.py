@@ -136,6 +136,13 @@ class TransferPresetProperty(bpy.types.PropertyGroup):
         max=1
     )
 
+    incremental: bpy.props.BoolProperty(
+        name="增量",
+        description="仅对上次传递后发生变化的物体重新执行对应的传递内容（根据目标模型根物体上保存的传递记录判断）。\n"
+                    "不适用于三渲二",
+        default=False,
+    )
+
     @staticmethod
     def register():
         bpy.types.Scene.mmd_kafei_tools_transfer_preset = bpy.props.PointerProperty(type=TransferPresetProperty)
@@ -4,7 +4,7 @@ import bpy
 class TransferVgWeightProperty(bpy.types.PropertyGroup):
     source_vg_name: bpy.props.StringProperty(
         name="源顶点组",
-        description="源顶点组名称，必填项，如果不存在，则跳过处理"
+        description="源顶点组名称，必填项，如果不存在，则跳过处理。多个源顶点组以逗号分隔，权重会一并转移到目标顶点组"
     )
     target_vg_name: bpy.props.StringProperty(
         name="目标顶点组",
@@ -29,6 +29,7 @@
 
 import bpy, math
 import time
+import numpy as np
 from bpy.utils import register_class
 from bpy.props import *
 
@@ -56,7 +57,93 @@ from bpy.props import *
 #     - delete temporaryObject
 # - Delete copyObject.
 
+# 只改变顶点坐标（不改变拓扑及其它网格数据）的修改器
+DEFORM_ONLY_MODIFIER_TYPES = {
+    'ARMATURE', 'CAST', 'CORRECTIVE_SMOOTH', 'CURVE', 'DISPLACE', 'HOOK', 'LAPLACIANDEFORM', 'LAPLACIANSMOOTH',
+    'LATTICE', 'MESH_CACHE', 'MESH_DEFORM', 'SHRINKWRAP', 'SIMPLE_DEFORM', 'SMOOTH', 'SURFACE_DEFORM', 'WARP', 'WAVE',
+}
+
+
+def canApplyByEvaluation(obj, selectedModifiers):
+    """选中的修改器均为形变类修改器，且按修改器堆栈的顺序选择时，可以逐形态键求值后直接写回坐标"""
+    if obj.type != 'MESH' or not obj.data.shape_keys:
+        return False
+    stackOrder = [modifier.name for modifier in obj.modifiers if modifier.name in selectedModifiers]
+    if stackOrder != list(selectedModifiers):
+        return False
+    return all(obj.modifiers[name].type in DEFORM_ONLY_MODIFIER_TYPES for name in selectedModifiers)
+
+
+def applyModifierByEvaluation(context, selectedModifiers):
+    """只启用选中的修改器，借助“仅显示形态键”逐个形态键求值，读取求值后的顶点坐标写回该形态键，最后移除修改器
+    物体只会被求值（形态键数量）次，不需要复制物体，结果与原有方式一致。求值后顶点数量发生变化时返回None
+    """
+    obj = context.object
+    mesh = obj.data
+    keyBlocks = mesh.shape_keys.key_blocks
+    shapesCount = len(keyBlocks)
+    vertCount = len(mesh.vertices)
+    startTime = time.time()
+
+    # 记录状态：求值时禁用其它修改器；原有方式中每个形态键会被单独取出，不受静音与顶点组的影响
+    modifierStates = {modifier.name: modifier.show_viewport for modifier in obj.modifiers}
+    keyStates = [(key_b.mute, key_b.vertex_group) for key_b in keyBlocks]
+    showOnlyShapeKey = obj.show_only_shape_key
+    activeShapeKeyIndex = obj.active_shape_key_index
+    results = []
+    try:
+        for modifier in obj.modifiers:
+            modifier.show_viewport = modifier.name in selectedModifiers
+        for key_b in keyBlocks:
+            key_b.mute = False
+            key_b.vertex_group = ""
+        obj.show_only_shape_key = True
+        depsgraph = context.evaluated_depsgraph_get()
+        for i in range(shapesCount):
+            keyTime = time.time()
+            obj.active_shape_key_index = i
+            depsgraph.update()
+            evalObject = obj.evaluated_get(depsgraph)
+            evalMesh = evalObject.to_mesh()
+            try:
+                if len(evalMesh.vertices) != vertCount:
+                    return None
+                co = np.empty(vertCount * 3, dtype=np.float32)
+                evalMesh.vertices.foreach_get("co", co)
+            finally:
+                evalObject.to_mesh_clear()
+            results.append(co)
+            print("applyModifierForObjectWithShapeKeys: Evaluated shape key %d/%d ('%s', %0.4f seconds, %0.2f seconds since start)" % (
+                i + 1, shapesCount, keyBlocks[i].name, time.time() - keyTime, time.time() - startTime))
+    finally:
+        for modifier in obj.modifiers:
+            modifier.show_viewport = modifierStates[modifier.name]
+        for key_b, (mute, vertexGroup) in zip(keyBlocks, keyStates):
+            key_b.mute = mute
+            key_b.vertex_group = vertexGroup
+        obj.show_only_shape_key = showOnlyShapeKey
+        obj.active_shape_key_index = activeShapeKeyIndex
+
+    # 写回各形态键，网格坐标与基础形态保持一致
+    for key_b, co in zip(keyBlocks, results):
+        key_b.data.foreach_set("co", co)
+    mesh.vertices.foreach_set("co", results[keyBlocks.find(mesh.shape_keys.reference_key.name)])
+    mesh.update()
+    for modifierName in selectedModifiers:
+        obj.modifiers.remove(obj.modifiers[modifierName])
+    print("applyModifierForObjectWithShapeKeys: Applied %d shape keys by evaluation (%0.2f seconds)" % (
+        shapesCount, time.time() - startTime))
+    return (True, None)
+
+
 def applyModifierForObjectWithShapeKeys(context, selectedModifiers, disable_armatures):
+    # 形变类修改器不改变拓扑，无需为每个形态键复制物体；其余情况（可能改变拓扑）使用原有方式
+    if canApplyByEvaluation(context.object, selectedModifiers):
+        result = applyModifierByEvaluation(context, selectedModifiers)
+        if result is not None:
+            return result
+        print("applyModifierForObjectWithShapeKeys: Vertex count changed after evaluation, fall back to duplicating")
+
     list_properties = []
     properties = ["interpolation", "mute", "name", "relative_key", "slider_max", "slider_min", "value", "vertex_group"]
     shapesCount = 0
@@ -1,5 +1,9 @@
+import hashlib
 import importlib.util
+import json
 import math
+import subprocess
+import tempfile
 import time
 
 import bpy
@@ -205,26 +209,143 @@ def get_collection(collection_name):
     return collection
 
 
+# 目录 → 上次遍历该目录的结果（修改时间、子目录名称、文件名称），在当前会话中共享
+scan_cache = {}
+# 已从磁盘加载过遍历缓存的目录
+loaded_scan_cache_roots = set()
+
+
+def scan_directory(directory, stat_filter=None, persist=False):
+    """以os.scandir遍历目录树，逐个目录生成（目录, 子目录名称列表, 文件名称列表, 文件状态）
+    顺序与os.walk一致，由调用方按需消费，无需等待整个目录树遍历完成
+    目录中增删文件会改变目录的修改时间，修改时间未变化的目录直接复用上次的遍历结果，每个目录只需一次stat
+    文件状态为 文件名称 → (大小, 修改时间)，仅包含满足stat_filter的文件。
+    遍历目录时直接取自DirEntry（Windows下无需额外的系统调用），复用遍历结果时重新获取（文件可能被原地覆盖）
+    persist为True时，遍历结果会保存到磁盘，供之后的会话使用
+    """
+    directory = os.path.normpath(directory)
+    if persist:
+        load_scan_cache(directory)
+    visited = []
+    stack = [directory]
+    while stack:
+        root = stack.pop()
+        try:
+            mtime = os.stat(root).st_mtime_ns
+        except OSError:
+            continue
+        stats = {}
+        entry = scan_cache.get(root)
+        if entry is not None and entry["mtime"] == mtime:
+            for name in entry["files"]:
+                if stat_filter is None or not stat_filter(name):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                stats[name] = (stat.st_size, stat.st_mtime)
+        else:
+            dirs = []
+            files = []
+            try:
+                with os.scandir(root) as it:
+                    for dir_entry in it:
+                        try:
+                            is_dir = dir_entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if not is_dir:
+                            files.append(dir_entry.name)
+                            if stat_filter is not None and stat_filter(dir_entry.name):
+                                try:
+                                    stat = dir_entry.stat()
+                                except OSError:
+                                    continue
+                                stats[dir_entry.name] = (stat.st_size, stat.st_mtime)
+                        elif not dir_entry.is_symlink():  # 同os.walk，不进入指向目录的符号链接
+                            dirs.append(dir_entry.name)
+            except OSError:
+                continue
+            entry = {"mtime": mtime, "dirs": dirs, "files": files}
+            scan_cache[root] = entry
+        visited.append(root)
+        yield root, entry["dirs"], entry["files"], stats
+        stack.extend(os.path.join(root, name) for name in reversed(entry["dirs"]))
+    if persist:
+        save_scan_cache(directory, visited)
+
+
+def get_scan_cache_path(directory):
+    name = hashlib.md5(directory.encode("utf-8")).hexdigest()
+    return os.path.join(tempfile.gettempdir(), "kafei_scan_cache", name + ".json")
+
+
+def load_scan_cache(directory):
+    """加载上次会话中保存的遍历结果"""
+    if directory in loaded_scan_cache_roots:
+        return
+    loaded_scan_cache_roots.add(directory)
+    cache_path = get_scan_cache_path(directory)
+    if not os.path.exists(cache_path):
+        return
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"目录遍历缓存读取失败：{cache_path}，{e}")
+        return
+    for root, entry in entries.items():
+        scan_cache.setdefault(root, entry)
+
+
+def save_scan_cache(directory, roots):
+    cache_path = get_scan_cache_path(directory)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({root: scan_cache[root] for root in roots}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"目录遍历缓存保存失败：{cache_path}，{e}")
+
+
+def is_model_file(file):
+    return file.endswith('.pmx') or file.endswith('.pmd')
+
+
 def recursive_search(directory, suffix, threshold, search_strategy, conflict_strategy):
     """寻找指定路径下各个子目录中，时间最新且未进行处理的那个模型 todo 之后看看能不能更通用些"""
-    file_list = []
-    pmx_count = 0
-    for root, dirs, files in os.walk(directory):
+    counter = {}
+    file_list = list(iter_recursive_search(directory, suffix, threshold, search_strategy, conflict_strategy,
+                                           counter))
+    print_search_summary(len(file_list), counter)
+    return file_list
+
+
+def iter_recursive_search(directory, suffix, threshold, search_strategy, conflict_strategy, counter=None):
+    """同recursive_search，边遍历目录树边生成待处理的文件，调用方无需等待遍历完成即可开始处理
+    遍历过程中的模型文件总数记录在counter["model_count"]中
+    """
+    if counter is None:
+        counter = {}
+    counter["model_count"] = 0
+    for root, dirs, files, stats in scan_directory(directory, is_model_file, persist=True):
         flag = False
 
         for file in files:
-            if file.endswith('.pmx') or file.endswith('.pmd'):
+            if is_model_file(file):
                 flag = True
-                pmx_count += 1
+                counter["model_count"] += 1
         if flag:
             curr_list = []  # 当前目录下符合条件的文件
             model_files = [f for f in files
-                           if (f.endswith('.pmx') or f.endswith('.pmd'))
-                           and os.path.getsize(os.path.join(root, f)) > threshold * 1024]  # 排除掉已被排除的文件的影响
+                           if f in stats and stats[f][0] > threshold * 1024]  # 排除掉已被排除的文件的影响
 
             # 如果满足条件的model_files有多个，取最新的还是取全部
             if search_strategy == 'LATEST':
-                most_recent_file = max(model_files, key=lambda x: os.path.getmtime(os.path.join(root, x)))
+                most_recent_file = max(model_files, key=lambda x: stats[x][1])
                 curr_list.append(most_recent_file)
             elif search_strategy == 'ALL':
                 for model_file in model_files:
@@ -253,46 +374,72 @@ def recursive_search(directory, suffix, threshold, search_strategy, conflict_str
                 curr_list.remove(file)
 
             for file in curr_list:
-                file_list.append(os.path.join(root, file))
-    print(f"实际待处理数量：{len(file_list)}。文件总数：{pmx_count}，跳过数量：{pmx_count - len(file_list)}")
-    return file_list
+                yield os.path.join(root, file)
 
 
-def recursive_search_img(directory, suffix, threshold, search_strategy, conflict_strategy, ext):
-    """寻找指定路径下各个子目录中，时间最新且未进行处理的那个模型"""
-    file_list = []
-    pmx_count = 0
-    for root, dirs, files in os.walk(directory):
+def iter_recursive_search_img(directory, suffix, threshold, search_strategy, conflict_strategy, ext, counter=None):
+    """寻找指定路径下各个子目录中，时间最新且未进行处理的那个模型，边遍历目录树边生成待处理的文件"""
+    if counter is None:
+        counter = {}
+    counter["model_count"] = 0
+    for root, dirs, files, stats in scan_directory(directory, is_model_file, persist=True):
         flag = False
         for file in files:
-            if file.endswith('.pmx') or file.endswith('.pmd'):
+            if is_model_file(file):
                 flag = True
-                pmx_count += 1
+                counter["model_count"] += 1
         if flag:
             model_files = [f for f in files
-                           if (f.endswith('.pmx') or f.endswith('.pmd'))
-                           and os.path.getsize(os.path.join(root, f)) > threshold * 1024]  # 排除掉已被排除的文件的影响
+                           if f in stats and stats[f][0] > threshold * 1024]  # 排除掉已被排除的文件的影响
+            # 目录中已有的文件，用于判断图像是否存在
+            existing_files = set(files)
 
             # 如果满足条件的model_files有多个，取最新的还是取全部
             if search_strategy == 'LATEST':
-                most_recent_file = max(model_files, key=lambda x: os.path.getmtime(os.path.join(root, x)))
-                if is_render(root, most_recent_file, suffix, ext, conflict_strategy):
-                    file_list.append(os.path.join(root, most_recent_file))
+                most_recent_file = max(model_files, key=lambda x: stats[x][1])
+                if is_render(root, most_recent_file, suffix, ext, conflict_strategy, existing_files):
+                    yield os.path.join(root, most_recent_file)
             elif search_strategy == 'ALL':
                 for model_file in model_files:
-                    if is_render(root, model_file, suffix, ext, conflict_strategy):
-                        file_list.append(os.path.join(root, model_file))
-    print(f"实际待处理数量：{len(file_list)}。文件总数：{pmx_count}，跳过数量：{pmx_count - len(file_list)}")
-    return file_list
+                    if is_render(root, model_file, suffix, ext, conflict_strategy, existing_files):
+                        yield os.path.join(root, model_file)
+
+
+def print_search_summary(file_count, counter):
+    model_count = counter.get("model_count", 0)
+    print(f"实际待处理数量：{file_count}。文件总数：{model_count}，跳过数量：{model_count - file_count}")
+
 
+def get_progress_text(index, file_count=None):
+    """进度文本，边遍历边处理时文件总数未知，只显示已处理的数量"""
+    if file_count is None:
+        return f"{index + 1}"
+    return f"{index + 1}/{file_count}"
 
-def is_render(root, file, suffix, ext, conflict_strategy):
+
+def iter_chunks(iterable, size):
+    """将可迭代对象按size个一组生成列表"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def is_render(root, file, suffix, ext, conflict_strategy, existing_files=None):
     # 构建图像名称
     image_name = os.path.splitext(file)[0] + suffix + ext
-    # 构建图像路径
-    image_path = os.path.join(root, image_name)
     # 如果图像在 pmx 目录中存在，则跳过，否则添加 pmx 文件路径到列表
-    if not os.path.exists(image_path):
+    if existing_files is not None:
+        image_exists = image_name in existing_files
+    else:
+        # 构建图像路径
+        image_path = os.path.join(root, image_name)
+        image_exists = os.path.exists(image_path)
+    if not image_exists:
         return True
 
     if conflict_strategy == 'SKIP':
@@ -392,6 +539,45 @@ def clean_scene():
     bpy.ops.outliner.orphans_purge(do_recursive=True)
 
 
+# 批量处理时追踪的数据块类型
+TRACKED_DATA_TYPES = ('objects', 'meshes', 'materials', 'images', 'textures', 'texts', 'armatures', 'node_groups',
+                      'collections', 'actions', 'cameras', 'lights', 'curves', 'worlds')
+
+
+def snapshot_data():
+    """记录当前各类数据块的session_uid（数据块被移除后，其内存地址可能被新数据块复用，所以不直接记录数据块）"""
+    return {data_type: {id_data.session_uid for id_data in getattr(bpy.data, data_type)}
+            for data_type in TRACKED_DATA_TYPES}
+
+
+def get_new_data(snapshot):
+    """获取snapshot之后新建的数据块"""
+    new_data = []
+    for data_type, uids in snapshot.items():
+        new_data.extend(id_data for id_data in getattr(bpy.data, data_type) if id_data.session_uid not in uids)
+    return new_data
+
+
+def clean_batch_data(snapshot, imported_uids):
+    """批量处理完一个文件后，移除导入时新建的数据块、临时集合及其中的物体，以及此后新建且已无人使用的数据块
+    只涉及本次新建的数据块，代替clean_scene中的orphans_purge，耗时不会随着批量处理的进行而增加
+    """
+    to_remove = {id_data.session_uid: id_data for id_data in get_new_data(snapshot)
+                 if id_data.session_uid in imported_uids}
+    if TMP_COLLECTION_NAME in bpy.data.collections:
+        collection = bpy.data.collections[TMP_COLLECTION_NAME]
+        to_remove[collection.session_uid] = collection
+        for obj in collection.objects:
+            to_remove[obj.session_uid] = obj
+    bpy.data.batch_remove(list(to_remove.values()))
+    # 移除数据块后会有新的数据块失去使用者（如材质转换时生成的材质及其贴图），循环移除直到不再产生
+    while True:
+        orphans = [id_data for id_data in get_new_data(snapshot) if id_data.users == 0]
+        if not orphans:
+            break
+        bpy.data.batch_remove(orphans)
+
+
 def find_ancestor(obj):
     ancestor = obj
     while ancestor.parent is not None:
@@ -419,7 +605,157 @@ def is_plugin_enabled(plugin_name):
     return False
 
 
-def batch_process(func, props, f_flag=False):
+class BatchManifest:
+    """批量任务清单，按任务记录各文件的处理状态、输入文件的大小与修改时间、耗时与异常信息
+    清单保存在批量处理的目录中，中断后再次执行时，跳过已完成且输入文件未发生变化的文件
+    任务参数发生变化时，该任务此前的记录全部作废
+    传入log_path时，每个文件处理完成后将耗时追加到该文件中（制表符分隔）
+    """
+
+    def __init__(self, directory, props, log_path=None):
+        self.directory = directory
+        self.log_path = log_path
+        self.path = os.path.join(directory, BATCH_MANIFEST_NAME)
+        self.task = props.path_from_id()
+        values = get_property_values(props)
+        # 并行进程数不影响处理结果
+        values.get("batch", {}).pop("workers", None)
+        self.signature = hashlib.md5(json.dumps(values, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+        self.data = {"tasks": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"批量任务清单读取失败，将重新记录：{self.path}，{e}")
+        task = self.data["tasks"].get(self.task)
+        if task is None or task.get("signature") != self.signature:
+            task = {"signature": self.signature, "files": {}}
+            self.data["tasks"][self.task] = task
+        self.files = task["files"]
+        self.start_time = time.time()
+        self.done_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+
+    def get_key(self, filepath):
+        return os.path.relpath(filepath, self.directory)
+
+    def filter_pending(self, file_list):
+        """排除已完成且输入文件未发生变化的文件"""
+        pending = list(self.iter_pending(file_list))
+        if self.skipped_count:
+            print(f"批量任务清单中已完成且未发生变化的文件：{self.skipped_count}个，本次跳过")
+        return pending
+
+    def iter_pending(self, files):
+        """同filter_pending，逐个判断，files可以是边遍历边生成的文件"""
+        for filepath in files:
+            record = self.files.get(self.get_key(filepath))
+            if record is None:
+                yield filepath
+                continue
+            if record["status"] == "DONE" and record["stamp"] == get_file_stamp(filepath):
+                self.skipped_count += 1
+                continue
+            if record["status"] == "RUNNING":
+                print(f"上次处理时中断，重新处理：{filepath}")
+            yield filepath
+
+    def start(self, filepath):
+        self.files[self.get_key(filepath)] = {"status": "RUNNING", "started_at": time.time()}
+        self.save()
+
+    def finish(self, filepath, duration, error=None):
+        # 输出文件可能覆盖输入文件，所以在处理完成后记录输入文件的状态
+        self.files[self.get_key(filepath)] = {
+            "status": "FAILED" if error else "DONE",
+            "stamp": get_file_stamp(filepath),
+            "duration": duration,
+            "error": error,
+            "finished_at": time.time(),
+        }
+        if error:
+            self.failed_count += 1
+        else:
+            self.done_count += 1
+        self.save()
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                status = "FAILED" if error else "DONE"
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{status}\t{duration:.3f}\t{filepath}\n")
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def print_summary(self):
+        total_time = time.time() - self.start_time
+        throughput = self.done_count / total_time * 60 if total_time > 0 else 0
+        print(f"批量任务清单：完成{self.done_count}个，失败{self.failed_count}个，跳过{self.skipped_count}个，"
+              f"吞吐量{throughput:.2f}个/分钟，清单：{self.path}")
+
+
+# 文件内容哈希的缓存，路径 -> (大小, 修改时间, 哈希)
+file_hash_cache = {}
+
+
+def get_file_hash(filepath, chunk_size=1024 * 1024):
+    """分块计算文件内容的md5，文件大小与修改时间未变化时直接返回缓存的结果"""
+    stat = os.stat(filepath)
+    key = os.path.normcase(os.path.abspath(filepath))
+    cached = file_hash_cache.get(key)
+    if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    md5 = hashlib.md5()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            md5.update(chunk)
+    file_hash = md5.hexdigest()
+    file_hash_cache[key] = (stat.st_size, stat.st_mtime_ns, file_hash)
+    return file_hash
+
+
+def set_file_hash(filepath, file_hash):
+    """记录已知的文件哈希（如文件被移动后），避免再次读取文件内容"""
+    stat = os.stat(filepath)
+    file_hash_cache[os.path.normcase(os.path.abspath(filepath))] = (stat.st_size, stat.st_mtime_ns, file_hash)
+
+
+def get_file_stamp(filepath):
+    """文件大小与修改时间，用于判断文件是否发生变化"""
+    if not os.path.exists(filepath):
+        return None
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# 以后台进程执行批量任务时，由run_batch_worker设置，包含分配给当前进程的文件列表与进度文件路径
+batch_worker_job = None
+
+
+def is_batch_worker():
+    """当前进程是否为执行批量任务的后台进程"""
+    return batch_worker_job is not None
+
+
+def get_batch_output_path(filepath, suffix):
+    """批量处理后输出的pmx文件路径"""
+    ext = os.path.splitext(filepath)[1]
+    if ".pmd" == ext:
+        ext = ".pmx"  # 再导出的时候是pmx格式的，如果依然以pmd为后缀，导入PE会报错
+
+    # 如果新文件名已经包含指定后缀，则对原文件进行覆盖
+    if os.path.splitext(filepath)[0].endswith(suffix):
+        return os.path.splitext(filepath)[0] + ext
+    else:
+        return os.path.splitext(filepath)[0] + suffix + ext
+
+
+def batch_process(func, props, f_flag=False, operator=None, file_list=None):
+    """逐个导入文件，执行func后导出。传入file_list时处理指定的文件，否则在批量处理的目录中检索"""
     batch = props.batch
     directory = batch.directory
     search_strategy = batch.search_strategy
@@ -428,44 +764,214 @@ def batch_process(func, props, f_flag=False):
     suffix = batch.suffix
     conflict_strategy = batch.conflict_strategy
     start_time = time.time()
-    file_list = recursive_search(abs_path, suffix, threshold, search_strategy, conflict_strategy)
-    file_count = len(file_list)
+    manifest = None
+    file_count = None
+    if batch_worker_job is not None:
+        file_list = batch_worker_job["files"]
+        file_count = len(file_list)
+    else:
+        manifest = BatchManifest(abs_path, props)
+        use_workers = batch.workers > 1 and operator is not None and not bpy.app.background
+        if file_list is None and not use_workers:
+            # 单进程处理时边遍历边处理，无需等待整个目录树遍历完成
+            file_list = manifest.iter_pending(
+                iter_recursive_search(abs_path, suffix, threshold, search_strategy, conflict_strategy))
+        else:
+            if file_list is None:
+                file_list = recursive_search(abs_path, suffix, threshold, search_strategy, conflict_strategy)
+            file_list = manifest.filter_pending(file_list)
+            file_count = len(file_list)
+            # 多个文件之间互不影响，交给多个后台进程并行处理，分配文件前需要完整的文件列表
+            worker_count = min(batch.workers, file_count)
+            if worker_count > 1 and use_workers:
+                run_batch_workers(operator, props, file_list, worker_count, manifest)
+                manifest.print_summary()
+                return
     for index, filepath in enumerate(file_list):
+        # 记录处理前的数据块，处理完成后只移除本次新建的数据块
+        snapshot = snapshot_data()
         get_collection(TMP_COLLECTION_NAME)
         file_base_name = os.path.basename(filepath)
-        ext = os.path.splitext(filepath)[1]
-        if ".pmd" == ext:
-            ext = ".pmx"  # 再导出的时候是pmx格式的，如果依然以pmd为后缀，导入PE会报错
-
-        # 如果新文件名已经包含指定后缀，则对原文件进行覆盖
-        if os.path.splitext(filepath)[0].endswith(suffix):
-            new_filepath = os.path.splitext(filepath)[0] + ext
-        else:
-            new_filepath = os.path.splitext(filepath)[0] + suffix + ext
+        new_filepath = get_batch_output_path(filepath, suffix)
 
         curr_time = time.time()
-        import_pmx(filepath)
-        pmx_root = bpy.context.active_object
-        if f_flag:
-            func(pmx_root, props, filepath)
-        else:
-            func(pmx_root, props)
-
-        deselect_all_objects()
-        select_and_activate(pmx_root)
-        export_pmx(new_filepath)
+        if manifest is not None:
+            manifest.start(filepath)
+        try:
+            import_pmx(filepath)
+            imported_uids = {id_data.session_uid for id_data in get_new_data(snapshot)}
+            pmx_root = bpy.context.active_object
+            if f_flag:
+                func(pmx_root, props, filepath)
+            else:
+                func(pmx_root, props)
+
+            deselect_all_objects()
+            select_and_activate(pmx_root)
+            export_pmx(new_filepath)
+        except Exception as e:
+            record_batch_result(manifest, filepath, time.time() - curr_time, str(e))
+            raise
 
         current_time = time.time() - curr_time
         total_time = time.time() - start_time
         print(
-            f"文件 \"{file_base_name}\" 处理完成，进度{index + 1}/{file_count}，耗时{current_time:.6f}秒，总耗时: {total_time:.6f} 秒")
-        clean_scene()
+            f"文件 \"{file_base_name}\" 处理完成，进度{get_progress_text(index, file_count)}，耗时{current_time:.6f}秒，总耗时: {total_time:.6f} 秒")
+        record_batch_result(manifest, filepath, current_time)
+        clean_batch_data(snapshot, imported_uids)
 
     total_time = time.time() - start_time
     print(f"目录\"{abs_path}\" 处理完成，总耗时: {total_time:.6f} 秒")
+    if manifest is not None:
+        manifest.print_summary()
+
+
+def record_batch_result(manifest, filepath, duration, error=None):
+    """记录单个文件的处理结果，后台进程中写入进度文件，由主进程汇总到批量任务清单"""
+    if manifest is not None:
+        manifest.finish(filepath, duration, error)
+    if batch_worker_job is not None:
+        with open(batch_worker_job["progress"], "a", encoding="utf-8") as f:
+            record = {"filepath": filepath, "duration": duration, "error": error}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def run_batch_workers(operator, props, file_list, worker_count, manifest):
+    """启动多个后台blender进程，各自以相同的参数执行operator，处理文件列表中的一部分，并汇总进度"""
+    start_time = time.time()
+    file_count = len(file_list)
+    job_dir = tempfile.mkdtemp(prefix="kafei_batch_")
+    # 交错分配，避免大文件集中在同一进程中
+    shards = [file_list[i::worker_count] for i in range(worker_count)]
+    job = {
+        "operator": operator.bl_idname,
+        "props_path": props.path_from_id(),
+        "props": get_property_values(props),
+        "shards": shards,
+    }
+    job_path = os.path.join(job_dir, "job.json")
+    with open(job_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False)
+
+    workers = []
+    for index in range(worker_count):
+        log_path = os.path.join(job_dir, f"worker_{index}.log")
+        progress_path = os.path.join(job_dir, f"progress_{index}.jsonl")
+        expr = f"import importlib; importlib.import_module({__name__!r}).run_batch_worker({job_path!r}, {index})"
+        with open(log_path, "w", encoding="utf-8") as log:
+            process = subprocess.Popen(
+                [bpy.app.binary_path, "-b", "--python-exit-code", "1", "--python-expr", expr],
+                stdout=log, stderr=subprocess.STDOUT)
+        workers.append((process, progress_path, log_path))
+    print(f"已启动{worker_count}个后台进程处理{file_count}个文件，任务目录：{job_dir}")
+
+    window_manager = bpy.context.window_manager
+    window_manager.progress_begin(0, file_count)
+    finished_count = 0
+    read_counts = [0] * worker_count
+    # 各进程进度文件已读取的字节偏移，仅读取以换行结尾的完整行，未写完的行留到下次读取
+    read_offsets = [0] * worker_count
+    try:
+        while True:
+            running = any(process.poll() is None for process, _, _ in workers)
+            # 读取各进程新完成的文件
+            for index, (_, progress_path, _) in enumerate(workers):
+                if not os.path.exists(progress_path):
+                    continue
+                with open(progress_path, "rb") as f:
+                    f.seek(read_offsets[index])
+                    data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end == 0:
+                    continue
+                read_offsets[index] += end
+                for line in data[:end].decode("utf-8").splitlines():
+                    if not line:
+                        continue
+                    read_counts[index] += 1
+                    record = json.loads(line)
+                    manifest.finish(record["filepath"], record["duration"], record["error"])
+                    finished_count += 1
+                    total_time = time.time() - start_time
+                    if record["error"]:
+                        print(f"文件 \"{os.path.basename(record['filepath'])}\" 处理失败，{record['error']}")
+                        continue
+                    print(f"文件 \"{os.path.basename(record['filepath'])}\" 处理完成，进度{finished_count}/{file_count}，"
+                          f"耗时{record['duration']:.6f}秒，总耗时: {total_time:.6f} 秒")
+            window_manager.progress_update(finished_count)
+            if not running:
+                break
+            time.sleep(0.5)
+    finally:
+        # 汇总过程中出现异常时，结束仍在运行的后台进程，避免残留
+        for process, _, _ in workers:
+            if process.poll() is None:
+                process.terminate()
+        for process, _, _ in workers:
+            process.wait()
+        window_manager.progress_end()
+
+    for index, (process, _, log_path) in enumerate(workers):
+        if process.returncode != 0:
+            unfinished_count = len(shards[index]) - read_counts[index]
+            operator.report(type={'WARNING'},
+                            message=f'后台进程{index + 1}异常退出，{unfinished_count}个文件未处理，详见日志：{log_path}')
+    total_time = time.time() - start_time
+    print(f"批量处理完成，{finished_count}/{file_count}个文件，总耗时: {total_time:.6f} 秒")
+
+
+def run_batch_worker(job_path, index):
+    """后台进程入口，恢复参数后执行operator，只处理分配给当前进程的文件"""
+    global batch_worker_job
+    with open(job_path, "r", encoding="utf-8") as f:
+        job = json.load(f)
+    props = bpy.context.scene.path_resolve(job["props_path"])
+    set_property_values(props, job["props"])
+    batch_worker_job = {
+        "files": job["shards"][index],
+        "progress": os.path.join(os.path.dirname(job_path), f"progress_{index}.jsonl"),
+    }
+    try:
+        category, name = job["operator"].split(".")
+        getattr(getattr(bpy.ops, category), name)()
+    finally:
+        batch_worker_job = None
+
+
+def get_property_values(props):
+    """将PropertyGroup的属性值转换为可序列化的dict（忽略指向数据块的属性与集合属性）"""
+    values = {}
+    for prop in props.bl_rna.properties:
+        identifier = prop.identifier
+        if identifier == "rna_type" or prop.is_readonly and prop.type != 'POINTER':
+            continue
+        if prop.type == 'POINTER':
+            value = getattr(props, identifier)
+            if isinstance(value, bpy.types.PropertyGroup):
+                values[identifier] = get_property_values(value)
+        elif prop.type == 'COLLECTION':
+            continue
+        elif prop.type == 'ENUM' and prop.is_enum_flag:
+            values[identifier] = list(getattr(props, identifier))
+        elif getattr(prop, "array_length", 0) > 0:
+            values[identifier] = list(getattr(props, identifier))
+        else:
+            values[identifier] = getattr(props, identifier)
+    return values
+
+
+def set_property_values(props, values):
+    """将get_property_values得到的dict写回PropertyGroup"""
+    for identifier, value in values.items():
+        if isinstance(value, dict):
+            set_property_values(getattr(props, identifier), value)
+        elif props.bl_rna.properties[identifier].type == 'ENUM' and isinstance(value, list):
+            setattr(props, identifier, set(value))
+        else:
+            setattr(props, identifier, value)
 
 
-def show_batch_props(col, show_flag, create_box, batch):
+def show_batch_props(col, show_flag, create_box, batch, show_workers=True):
     if show_flag:
         batch_col = col.column()
         batch_col.prop(batch, "flag")
@@ -487,6 +993,9 @@ def show_batch_props(col, show_flag, create_box, batch):
     suffix_col.prop(batch, "suffix")
     conflict_strategy_col = batch_ui.column()
     conflict_strategy_col.prop(batch, "conflict_strategy")
+    if show_workers:
+        workers_col = batch_ui.column()
+        workers_col.prop(batch, "workers")
     return batch_ui
 
 